@@ -0,0 +1,117 @@
+# scripts.benchmark_reads
+"""Measures how fast songs are read from the database.
+
+Compares the previous read path (SELECT * and validation of every row) with
+find_many, with trusted or fully validated rows (see DatabaseRepository.validate_reads),
+and with trusted rows read while the garbage collector is paused (see gc_paused).
+
+Usage: python -m scripts.benchmark_reads [--songs 300000] [--repeat 3]
+"""
+
+import argparse
+import json
+import sqlite3
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from src.common.database import initialize_database
+from src.common.repository import gc_paused
+from src.features.library.repository import SongsRepository
+from src.features.library.schemas import Song
+
+
+def create_library(path: Path, song_count: int) -> sqlite3.Connection:
+    """Creates a database of song_count songs with realistic tags."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    initialize_database(conn)
+    rows = (
+        (
+            f"/music/Artist {i % 500}/Album {i % 3000}/{i:06d} - Song {i}.flac",
+            json.dumps(
+                {
+                    "size": 30_000_000 + i,
+                    "bitrate": 900,
+                    "sample_rate": 44100,
+                    "channels": 2,
+                    "length": 180.0 + i % 240,
+                    "mtime": 1_700_000_000.0 + i,
+                    "fingerprint": f"{i:032x}",
+                }
+            ),
+            json.dumps(
+                {
+                    "TITLE": [f"Song {i}"],
+                    "ARTIST": [f"Artist {i % 500}"],
+                    "ALBUM": [f"Album {i % 3000}"],
+                    "ALBUM_ARTIST": [f"Artist {i % 500}"],
+                    "GENRE": ["Rock"],
+                    "TRACK_NUM": [f"{i % 12 + 1}/12"],
+                    "RELEASE_TIME": [str(1960 + i % 60)],
+                }
+            ),
+            json.dumps({"play_count": i % 50, "added_date": 1_700_000_000.0}),
+        )
+        for i in range(song_count)
+    )
+    with conn:
+        conn.executemany(
+            "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+    return conn
+
+
+def baseline_find_many(conn: sqlite3.Connection) -> list[Song]:
+    """Reads every song the way find_many did before trusted reads."""
+    songs = []
+    for row in conn.execute("SELECT * FROM songs").fetchall():
+        row_dict = dict(zip(row.keys(), row))
+        for key in ("fileprops", "tags", "app_data"):
+            if row_dict[key] is not None:
+                row_dict[key] = json.loads(row_dict[key])
+        songs.append(Song.model_validate(row_dict))
+    return songs
+
+
+def measure(read: Callable[[], list], repeat: int) -> float:
+    """Returns the best rows/sec of read over repeat runs."""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        songs = read()
+        elapsed = time.perf_counter() - start
+        best = max(best, len(songs) / elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=300_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = create_library(Path(directory) / "benchmark.db", args.songs)
+        repository = SongsRepository(conn)
+
+        baseline = measure(lambda: baseline_find_many(conn), args.repeat)
+        repository.validate_reads = True
+        validated = measure(repository.find_many, args.repeat)
+        repository.validate_reads = False
+        trusted = measure(repository.find_many, args.repeat)
+        with gc_paused():
+            paused = measure(repository.find_many, args.repeat)
+        conn.close()
+
+    print(f"songs:     {args.songs}")
+    print(f"baseline:  {baseline:>10,.0f} rows/s")
+    print(f"validated: {validated:>10,.0f} rows/s ({validated / baseline:.1f}x)")
+    print(f"trusted:   {trusted:>10,.0f} rows/s ({trusted / baseline:.1f}x)")
+    print(f"gc paused: {paused:>10,.0f} rows/s ({paused / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,9 @@ ApplicationWindow {
     ErrorDialog {
         id: errorDialog
     }
+    PruneLibraryDialog {
+        id: pruneLibraryDialog
+    }
     SettingsDialog {
         id: settingsDialog
     }
@@ -39,6 +42,10 @@ ApplicationWindow {
                     backend.scan_library();
                 }
             }
+            Action {
+                text: qsTr("Remove Songs Outside Library Folder")
+                onTriggered: pruneLibraryDialog.open()
+            }
             Action {
                 text: qsTr("Settings")
                 onTriggered: {
@@ -1,3 +1,4 @@
+import QtQuick
 import QtQuick.Dialogs
 import QtCore
 
@@ -5,4 +6,12 @@ FolderDialog {
     id: libraryDirectoryRoot
     currentFolder: StandardPaths.standardLocations(StandardPaths.HomeLocation)[0]
     onAccepted: directoryHandler.handleDirectorySelected(selectedFolder)
+
+    Connections {
+        target: directoryHandler
+        function onDirectoryError(errorMessage) {
+            errorDialog.text = errorMessage;
+            errorDialog.open();
+        }
+    }
 }
@@ -0,0 +1,20 @@
+import QtQuick
+import QtQuick.Controls
+
+Dialog {
+    id: pruneLibraryDialogRoot
+    title: "Remove Songs Outside Library Folder"
+    modal: true
+    parent: Overlay.overlay
+    anchors.centerIn: parent
+
+    Text {
+        text: "Songs whose file is not inside a library folder will be removed, along with their playlist entries and play history. Are you sure?"
+        width: 300
+        wrapMode: Text.WordWrap
+    }
+
+    standardButtons: Dialog.Yes | Dialog.No
+
+    onAccepted: backend.prune_library()
+}
@@ -9,6 +9,7 @@ Rectangle {
     property int songCount: backend.library.songModel.rowCount()
     property bool isScanning: false
     property string scanningMessage: "Scanning library files..."
+    property string currentDirectory: ""
 
     // Repeat mode constants (mirroring PlaybackService)
     readonly property int repeatOff: 0
@@ -65,14 +66,32 @@ Rectangle {
         }
     }
 
+    function formatDuration(seconds) {
+        let minutes = Math.floor(seconds / 60);
+        let secs = seconds % 60;
+        return minutes + ":" + (secs < 10 ? "0" : "") + secs;
+    }
+
     Connections {
         target: backend
         function onScanStarted() {
+            statusBar.scanningMessage = "Scanning library files...";
             statusBar.isScanning = true;
         }
+        function onScanProgress(progress) {
+            let message = "Scanning: " + progress.files_processed + "/" + progress.files_discovered + " files (" + progress.files_per_second + " files/s, " + (progress.bytes_per_second / 1048576).toFixed(1) + " MB/s)";
+            if (progress.eta_seconds !== null && progress.eta_seconds !== undefined) {
+                message += ", " + formatDuration(progress.eta_seconds) + " left";
+            }
+            statusBar.scanningMessage = message;
+            statusBar.currentDirectory = progress.current_directory;
+        }
         function onScanFinished() {
             statusBar.isScanning = false;
         }
+        function onScanCancelled() {
+            statusBar.isScanning = false;
+        }
         function onScanError(errorMessage) {
             statusBar.isScanning = false;
             errorDialog.text = errorMessage;
@@ -207,6 +226,22 @@ Rectangle {
             Text {
                 text: statusBar.scanningMessage
                 font.italic: true
+                ToolTip.text: statusBar.currentDirectory
+                ToolTip.visible: scanningMouseArea.containsMouse && statusBar.currentDirectory !== ""
+
+                MouseArea {
+                    id: scanningMouseArea
+                    anchors.fill: parent
+                    hoverEnabled: true
+                }
+            }
+
+            ToolButton {
+                text: qsTr("Cancel")
+                onClicked: {
+                    statusBar.scanningMessage = "Cancelling scan...";
+                    backend.cancel_scan();
+                }
             }
         }
     }
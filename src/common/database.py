@@ -1,17 +1,153 @@
 # src.common.database
+import atexit
+import queue
 import re
 import sqlite3
 import logging
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from src.common.profiler import ProfiledConnection, profiler
 from src.common.utils.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Expressions of the duplicate detection indexes, queries must use them verbatim
+# for SQLite to pick the index
+FINGERPRINT_EXPRESSION = "json_extract(fileprops, '$.fingerprint')"
+SIGNATURE_EXPRESSION = (
+    "lower(json_extract(tags, '$.ARTIST[0]')) || '|' || "
+    "lower(json_extract(tags, '$.TITLE[0]')) || '|' || "
+    "CAST(round(json_extract(fileprops, '$.length')) AS INTEGER)"
+)
 
-def get_db_connection() -> sqlite3.Connection:
-    """Creates a database connection to the SQLite database."""
+# Tag and file property fields promoted to generated columns of the songs table:
+# {column: (type, expression)}. Tags hold lists, the first value is used.
+# ID3 numbers are strings like '3/12' (CAST keeps the leading integer), MP4 ones
+# are [number, total] pairs.
+PROMOTED_COLUMNS: dict[str, tuple[str, str]] = {
+    "title": ("TEXT", "json_extract(tags, '$.TITLE[0]')"),
+    "artist": ("TEXT", "json_extract(tags, '$.ARTIST[0]')"),
+    "album": ("TEXT", "json_extract(tags, '$.ALBUM[0]')"),
+    "album_artist": ("TEXT", "json_extract(tags, '$.ALBUM_ARTIST[0]')"),
+    "genre": ("TEXT", "json_extract(tags, '$.GENRE[0]')"),
+    "year": (
+        "INTEGER",
+        (
+            "NULLIF(CAST(substr(coalesce(json_extract(tags, '$.RELEASE_TIME[0]'), "
+            "json_extract(tags, '$.YEAR[0]')), 1, 4) AS INTEGER), 0)"
+        ),
+    ),
+    "track_number": (
+        "INTEGER",
+        (
+            "coalesce(CAST(json_extract(tags, '$.TRACK_NUM[0]') AS INTEGER), "
+            "json_extract(tags, '$.TRACK_NUMBER[0][0]'))"
+        ),
+    ),
+    "disc_number": (
+        "INTEGER",
+        (
+            "coalesce(CAST(json_extract(tags, '$.DISC_NUM[0]') AS INTEGER), "
+            "json_extract(tags, '$.DISC_NUMBER[0][0]'))"
+        ),
+    ),
+    "length": ("REAL", "json_extract(fileprops, '$.length')"),
+    "bitrate": ("INTEGER", "json_extract(fileprops, '$.bitrate')"),
+}
+
+# Tags indexed by the songs_fts full-text table: {fts column: tag key}
+FULL_TEXT_COLUMNS: dict[str, str] = {
+    "title": "TITLE",
+    "artist": "ARTIST",
+    "album": "ALBUM",
+    "album_artist": "ALBUM_ARTIST",
+    "genre": "GENRE",
+}
+
+# {index name: indexed promoted columns}
+PROMOTED_INDEXES: dict[str, tuple[str, ...]] = {
+    "idx_songs_title": ("title",),
+    "idx_songs_artist": ("artist",),
+    "idx_songs_album": ("album", "disc_number", "track_number"),
+    "idx_songs_album_artist": ("album_artist",),
+    "idx_songs_genre": ("genre",),
+    "idx_songs_year": ("year",),
+    "idx_songs_length": ("length",),
+    "idx_songs_bitrate": ("bitrate",),
+}
+
+
+def apply_connection_profile(conn: sqlite3.Connection):
+    """Applies the performance settings (settings.database_*) to a connection.
+
+    WAL journaling lets readers (e.g. searches) run while a scan writes,
+    synchronous=NORMAL is durable enough with WAL and avoids a sync per
+    transaction. journal_mode is persistent, the other pragmas are per connection.
+
+    New database files use incremental auto_vacuum, so that maintenance can give
+    the pages freed by prunes back to the file system in small steps (see
+    MaintenanceService). It has to be set before WAL journaling initializes the
+    file, existing databases keep their mode.
+    """
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    journal_mode = conn.execute(
+        f"PRAGMA journal_mode = {settings.database_journal_mode}"
+    ).fetchone()[0]
+    if journal_mode != settings.database_journal_mode:
+        # e.g. in-memory databases only support the memory journal
+        logger.debug(
+            f"Journal mode {settings.database_journal_mode} not applied, using {journal_mode}"
+        )
+    conn.execute(f"PRAGMA synchronous = {settings.database_synchronous}")
+    conn.execute(f"PRAGMA temp_store = {settings.database_temp_store}")
+    conn.execute(f"PRAGMA mmap_size = {int(settings.database_mmap_size)}")
+    conn.execute(f"PRAGMA cache_size = {int(settings.database_cache_size)}")
+    conn.execute(f"PRAGMA busy_timeout = {int(settings.database_busy_timeout * 1000)}")
+
+
+_profile_report_registered = False
+
+
+def _enable_profiling():
+    """Reports the profiled statements at exit, once."""
+    global _profile_report_registered
+    if not _profile_report_registered:
+        _profile_report_registered = True
+        atexit.register(profiler.log_report, settings.database_profile_limit)
+
+
+def get_db_connection(
+    read_only: bool = False, check_same_thread: bool = True
+) -> sqlite3.Connection:
+    """Creates a database connection to the SQLite database.
+
+    The connection profile of the settings is applied, see apply_connection_profile.
+    With settings.database_echo, statements are printed. With
+    settings.database_profile, they are timed by the profiler, whose report
+    is logged at exit.
+
+    Args:
+        read_only: If True, statements writing to the database fail.
+        check_same_thread: If False, the connection can be used from other
+            threads than the one that created it, one at a time.
+    """
     try:
-        conn = sqlite3.connect(settings.database_filename)
-        conn.set_trace_callback(print)
+        factory = sqlite3.Connection
+        if settings.database_profile:
+            factory = ProfiledConnection
+            _enable_profiling()
+        conn = sqlite3.connect(
+            settings.database_filename,
+            timeout=settings.database_busy_timeout,
+            factory=factory,
+            check_same_thread=check_same_thread,
+        )
+        apply_connection_profile(conn)
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        if settings.database_echo:
+            conn.set_trace_callback(print)
         conn.row_factory = (
             sqlite3.Row
         )  # SQLite returns results as Row objects with named-field access
@@ -33,21 +169,333 @@ def get_db_connection() -> sqlite3.Connection:
         raise
 
 
+def get_promoted_columns(conn: sqlite3.Connection) -> set[str]:
+    """Returns the promoted (generated) columns present in the songs table."""
+    # table_xinfo rows: cid, name, type, notnull, dflt_value, pk, hidden
+    # hidden is 2 for virtual and 3 for stored generated columns
+    rows = conn.execute("PRAGMA table_xinfo(songs)").fetchall()
+    return {row[1] for row in rows if row[6] in (2, 3) and row[1] in PROMOTED_COLUMNS}
+
+
+def _promote_columns(cursor: sqlite3.Cursor, table_exists: bool):
+    """Adds the promoted columns missing from an existing songs table, and their indexes.
+
+    SQLite can only add VIRTUAL generated columns to an existing table: their
+    values are computed on read, but the indexes on them are stored so lookups
+    and sorts are as fast as with the STORED columns of new tables.
+    """
+    existing = get_promoted_columns(cursor.connection) if table_exists else set()
+    if table_exists:
+        for column, (column_type, expression) in PROMOTED_COLUMNS.items():
+            if column not in existing:
+                cursor.execute(
+                    f"ALTER TABLE songs ADD COLUMN {column} {column_type} "
+                    f"GENERATED ALWAYS AS ({expression}) VIRTUAL"
+                )
+    for index, columns in PROMOTED_INDEXES.items():
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {index} ON songs ({', '.join(columns)})"
+        )
+
+
+def has_full_text_index(conn: sqlite3.Connection) -> bool:
+    """Returns True if the songs_fts full-text table exists."""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'songs_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def _full_text_values(row: str) -> str:
+    """SQL expressions of the full-text columns for a songs row (new or old)."""
+    # Every value of multi-valued tags is indexed
+    return ", ".join(
+        f"(SELECT group_concat(value, ' ') FROM json_each({row}.tags, '$.{key}'))"
+        for key in FULL_TEXT_COLUMNS.values()
+    )
+
+
+def _create_full_text_index(cursor: sqlite3.Cursor):
+    """Creates the songs_fts table and the triggers keeping it in sync with songs.
+
+    songs_fts rowids are song IDs. Existing songs are indexed when the table
+    is created. Skipped with a warning if SQLite was built without FTS5.
+    """
+    if has_full_text_index(cursor.connection):
+        return
+    columns = ", ".join(FULL_TEXT_COLUMNS)
+    try:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE songs_fts USING fts5({columns}, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Full-text search disabled, FTS5 is not available: {e}")
+        return
+
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS songs_fts_insert AFTER INSERT ON songs BEGIN
+            INSERT INTO songs_fts (rowid, {columns})
+            VALUES (new.id, {_full_text_values("new")});
+        END
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS songs_fts_update AFTER UPDATE OF tags ON songs BEGIN
+            DELETE FROM songs_fts WHERE rowid = old.id;
+            INSERT INTO songs_fts (rowid, {columns})
+            VALUES (new.id, {_full_text_values("new")});
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS songs_fts_delete AFTER DELETE ON songs BEGIN
+            DELETE FROM songs_fts WHERE rowid = old.id;
+        END
+    """
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO songs_fts (rowid, {columns})
+        SELECT songs.id, {_full_text_values("songs")} FROM songs
+    """
+    )
+
+
+def has_tag_index(conn: sqlite3.Connection) -> bool:
+    """Returns True if the song_tags table exists."""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'song_tags'"
+    ).fetchone()
+    return row is not None
+
+
+def _song_tags_select(row: str) -> str:
+    """SQL selecting the song_tags rows of a songs row (new, old or songs).
+
+    Keys are uppercased. value_num is set for numbers, for texts starting with
+    a number (e.g. '3/12' or '1999-05-01', cast like CAST(... AS REAL)) and for
+    [number, total] pairs of MP4 tags.
+    """
+    return f"""
+        SELECT {row}.id, upper(tag.key), item.value,
+            CASE
+                WHEN item.type IN ('integer', 'real') THEN item.value
+                WHEN item.type = 'text' AND (
+                    item.value GLOB '[0-9]*' OR item.value GLOB '-[0-9]*'
+                ) THEN CAST(item.value AS REAL)
+                WHEN item.type = 'array'
+                    AND json_type(item.value, '$[0]') IN ('integer', 'real')
+                THEN json_extract(item.value, '$[0]')
+            END
+        FROM {"songs, " if row == "songs" else ""}json_each({row}.tags) AS tag,
+            json_each(tag.value) AS item
+        WHERE tag.type = 'array'
+    """
+
+
+def _create_tag_index(cursor: sqlite3.Cursor):
+    """Creates the song_tags table and the triggers keeping it in sync with songs.
+
+    song_tags holds one row per tag value, so that any tag can be queried
+    through an index instead of extracting it from the JSON of every song.
+    Existing songs are indexed when the table is created.
+    """
+    if has_tag_index(cursor.connection):
+        return
+    cursor.execute(
+        """
+        CREATE TABLE song_tags (
+            song_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            value_num REAL
+        )
+    """
+    )
+    # Covering indexes: queries on a key read only the index entries of that key
+    cursor.execute(
+        "CREATE INDEX idx_song_tags_key_value ON song_tags (key, value, song_id)"
+    )
+    cursor.execute(
+        "CREATE INDEX idx_song_tags_key_num ON song_tags (key, value_num, song_id)"
+    )
+    cursor.execute("CREATE INDEX idx_song_tags_song ON song_tags (song_id)")
+
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS song_tags_insert AFTER INSERT ON songs BEGIN
+            INSERT INTO song_tags (song_id, key, value, value_num)
+            {_song_tags_select("new")};
+        END
+    """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS song_tags_update AFTER UPDATE OF tags ON songs BEGIN
+            DELETE FROM song_tags WHERE song_id = old.id;
+            INSERT INTO song_tags (song_id, key, value, value_num)
+            {_song_tags_select("new")};
+        END
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS song_tags_delete AFTER DELETE ON songs BEGIN
+            DELETE FROM song_tags WHERE song_id = old.id;
+        END
+    """
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO song_tags (song_id, key, value, value_num)
+        {_song_tags_select("songs")}
+    """
+    )
+
+
+# Periods of the play history rollups, numbered from the UNIX epoch (UTC):
+# days, and weeks starting on Monday (the epoch was a Thursday)
+PLAY_DAY_EXPRESSION = "CAST(timestamp / 86400 AS INTEGER)"
+PLAY_WEEK_EXPRESSION = f"(({PLAY_DAY_EXPRESSION} + 3) / 7)"
+
+# Play history rollups: {table: (subject column, period column, period expression)}
+PLAY_HISTORY_TABLES: dict[str, tuple[str, str, str]] = {
+    "song_plays_daily": ("song_id", "day", PLAY_DAY_EXPRESSION),
+    "song_plays_weekly": ("song_id", "week", PLAY_WEEK_EXPRESSION),
+    "artist_plays_daily": ("artist", "day", PLAY_DAY_EXPRESSION),
+    "artist_plays_weekly": ("artist", "week", PLAY_WEEK_EXPRESSION),
+}
+
+
+def play_day(timestamp: float) -> int:
+    """Returns the number of the day of a UNIX time, see PLAY_DAY_EXPRESSION."""
+    return int(timestamp // 86400)
+
+
+def play_week(timestamp: float) -> int:
+    """Returns the number of the week of a UNIX time, see PLAY_WEEK_EXPRESSION."""
+    return (play_day(timestamp) + 3) // 7
+
+
+def play_history_rollups() -> list[str]:
+    """SQL adding the play events of an ID range (two parameters, exclusive
+    start and inclusive end) to each play history rollup.
+
+    Songs are aggregated by ID, artists by their first ARTIST tag ('' without
+    one) at the time of the rollup.
+    """
+    statements = []
+    for table, (subject, period, period_expression) in PLAY_HISTORY_TABLES.items():
+        if subject == "song_id":
+            subject_expression = "play_events.song_id"
+            source = "play_events"
+        else:
+            subject_expression = f"coalesce({PROMOTED_COLUMNS['artist'][1]}, '')"
+            source = "play_events JOIN songs ON songs.id = play_events.song_id"
+        statements.append(
+            f"""
+            INSERT INTO {table} ({subject}, {period}, plays, skips)
+            SELECT
+                {subject_expression},
+                {period_expression},
+                sum(event = 'play'),
+                sum(event = 'skip')
+            FROM {source}
+            WHERE play_events.id > ? AND play_events.id <= ?
+            GROUP BY 1, 2
+            ON CONFLICT ({subject}, {period}) DO UPDATE SET
+                plays = plays + excluded.plays,
+                skips = skips + excluded.skips
+        """
+        )
+    return statements
+
+
+def _create_play_history(cursor: sqlite3.Cursor):
+    """Creates the play history rollups, see PlayEventsRepository.rollup.
+
+    Each table holds the plays and skips per song or artist and per day or
+    week, so that time-windowed queries (e.g. most played this month) read a
+    few aggregate rows instead of every play event. Events already rolled up
+    are added when the tables are created.
+    """
+    created = False
+    for table, (subject, period, _) in PLAY_HISTORY_TABLES.items():
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        if exists:
+            continue
+        created = True
+        subject_type = "INTEGER" if subject == "song_id" else "TEXT"
+        cursor.execute(
+            f"""
+            CREATE TABLE {table} (
+                {subject} {subject_type} NOT NULL,
+                {period} INTEGER NOT NULL,
+                plays INTEGER NOT NULL DEFAULT 0,
+                skips INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY ({period}, {subject})
+            ) WITHOUT ROWID
+        """
+        )
+        # Clustered by period, time windows read the rows of their periods only
+        cursor.execute(
+            f"CREATE INDEX idx_{table}_{subject} ON {table} ({subject}, {period})"
+        )
+    if not created:
+        return
+    last_event_id = cursor.execute(
+        "SELECT last_event_id FROM play_events_rollup WHERE id = 1"
+    ).fetchone()[0]
+    if last_event_id:
+        for table in PLAY_HISTORY_TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+        for statement in play_history_rollups():
+            cursor.execute(statement, (0, last_event_id))
+
+
 def initialize_database(conn: sqlite3.Connection):
-    """Initializes the database (creates tables and indexes)."""
+    """Initializes the database (creates tables and indexes).
+
+    With settings.database_promoted_columns, the fields of PROMOTED_COLUMNS are
+    also exposed as typed, indexed generated columns of the songs table.
+    The tags of FULL_TEXT_COLUMNS are indexed in the songs_fts FTS5 table,
+    every tag value is indexed in the song_tags table. Play events are
+    aggregated in the PLAY_HISTORY_TABLES.
+    """
     try:
         cursor = conn.cursor()
+        songs_exists = (
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'songs'"
+            ).fetchone()
+            is not None
+        )
+        promoted_columns = ""
+        if settings.database_promoted_columns:
+            promoted_columns = "".join(
+                f",\n                {column} {column_type} "
+                f"GENERATED ALWAYS AS ({expression}) STORED"
+                for column, (column_type, expression) in PROMOTED_COLUMNS.items()
+            )
         cursor.execute(
-            """
+            f"""
             CREATE TABLE IF NOT EXISTS songs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 path TEXT UNIQUE NOT NULL,
                 fileprops TEXT NOT NULL,
                 tags TEXT NOT NULL,
-                app_data TEXT NOT NULL
+                app_data TEXT NOT NULL{promoted_columns}
             )
         """
         )
+        if settings.database_promoted_columns:
+            _promote_columns(cursor, songs_exists)
         cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS playlists (
@@ -72,7 +520,88 @@ def initialize_database(conn: sqlite3.Connection):
         """
         )
 
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS library_roots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT UNIQUE NOT NULL,
+                added_date REAL NOT NULL
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scan_checkpoints (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                root TEXT UNIQUE NOT NULL,
+                started_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                last_batch INTEGER NOT NULL DEFAULT 0
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scan_checkpoint_directories (
+                checkpoint_id INTEGER NOT NULL,
+                directory TEXT NOT NULL,
+                PRIMARY KEY (checkpoint_id, directory),
+                FOREIGN KEY (checkpoint_id) REFERENCES scan_checkpoints(id)
+            ) WITHOUT ROWID
+        """
+        )
+        # Append-only log of plays and skips, rolled up into the app_data of
+        # songs in batches, see PlayEventsRepository.rollup
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS play_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                song_id INTEGER NOT NULL,
+                event TEXT NOT NULL CHECK (event IN ('play', 'skip')),
+                timestamp REAL NOT NULL,
+                FOREIGN KEY (song_id) REFERENCES songs(id)
+            )
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS play_events_rollup (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_event_id INTEGER NOT NULL,
+                updated_at REAL
+            )
+        """
+        )
+        cursor.execute(
+            "INSERT OR IGNORE INTO play_events_rollup (id, last_event_id) VALUES (1, 0)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_play_events_song ON play_events (song_id)"
+        )
+        _create_play_history(cursor)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS maintenance_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task TEXT UNIQUE NOT NULL,
+                started_at REAL NOT NULL,
+                duration REAL NOT NULL,
+                complete BOOLEAN NOT NULL,
+                result TEXT
+            )
+        """
+        )
+
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_path ON songs (path)")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_fileprops_size ON songs (json_extract(fileprops, '$.size'))"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_fileprops_fingerprint ON songs ({FINGERPRINT_EXPRESSION})"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_songs_signature ON songs ({SIGNATURE_EXPRESSION})"
+        )
         cursor.execute(
             "CREATE INDEX IF NOT EXISTS idx_tags_artist ON songs (json_extract(tags, '$.ARTIST'))"
         )
@@ -104,6 +633,9 @@ def initialize_database(conn: sqlite3.Connection):
             "CREATE INDEX IF NOT EXISTS idx_app_data_rating ON songs (json_extract(app_data, '$.rating'))"
         )
 
+        _create_full_text_index(cursor)
+        _create_tag_index(cursor)
+
         conn.commit()
         logger.info("Database initialized successfully.")
     except sqlite3.Error as e:
@@ -116,3 +648,133 @@ def close_db_connection(conn: sqlite3.Connection):
     if conn:
         conn.close()
         logger.info("Database connection closed.")
+
+
+class ConnectionManager:
+    """Hands out the database connections of the application.
+
+    - connection(): one connection per thread, opened on first use and reused
+      afterwards, for threads running repositories (GUI, worker, scans).
+    - reader(): a read-only connection borrowed from a small pool, for
+      background queries of any thread. With WAL journaling they run while
+      another connection writes.
+    - writer(): the single writer connection, serialized by a lock, each use is
+      a transaction.
+
+    Every connection is closed by close_all, e.g. at shutdown. Connections are
+    opened with check_same_thread=False so that close_all can run from any
+    thread; the manager still never uses one from two threads at once.
+
+    Attributes:
+        _read_pool_size: Maximum number of read-only connections.
+        _local: Connection of each thread.
+        _connections: Every open connection, for close_all.
+        _readers: Idle read-only connections.
+        _reader_count: Number of read-only connections opened.
+        _writer: The writer connection, opened on first use.
+        _writer_lock: Serializes uses of the writer connection.
+        _lock: Protects the bookkeeping of the connections.
+    """
+
+    def __init__(self, read_pool_size: int | None = None):
+        """Initializes the ConnectionManager.
+
+        Args:
+            read_pool_size: Maximum number of read-only connections.
+                Defaults to settings.database_read_pool_size.
+        """
+        self._read_pool_size = read_pool_size or settings.database_read_pool_size
+        self._local = threading.local()
+        self._connections: set[sqlite3.Connection] = set()
+        self._readers: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._reader_count = 0
+        self._writer: sqlite3.Connection | None = None
+        self._writer_lock = threading.RLock()
+        self._lock = threading.Lock()
+
+    def _open(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = get_db_connection(read_only=read_only, check_same_thread=False)
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the connection of the calling thread, opening it if needed."""
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = self._local.connection = self._open()
+        return conn
+
+    def release(self):
+        """Closes the connection of the calling thread, e.g. before it exits."""
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            return
+        self._local.connection = None
+        with self._lock:
+            self._connections.discard(conn)
+        conn.close()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrows a read-only connection, waiting for one if the pool is exhausted.
+
+        A connection closed by close_all while borrowed is not returned to the
+        pool, which belongs to the connections opened afterwards.
+        """
+        readers = self._readers
+        try:
+            conn = readers.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._reader_count < self._read_pool_size
+                if can_open:
+                    self._reader_count += 1
+            if not can_open:
+                conn = readers.get()
+            else:
+                try:
+                    conn = self._open(read_only=True)
+                except Exception:
+                    # Give the slot back, the pool would wait for it forever
+                    with self._lock:
+                        if readers is self._readers:
+                            self._reader_count -= 1
+                    raise
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                owned = conn in self._connections and readers is self._readers
+            if owned:
+                if conn.in_transaction:
+                    conn.rollback()
+                readers.put(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Uses the writer connection in a transaction, committed on success.
+
+        Writes of other threads wait until the transaction ends.
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._open()
+            with self._writer:
+                yield self._writer
+
+    def close_all(self):
+        """Closes every connection, the manager can still open new ones afterwards."""
+        with self._lock:
+            connections = list(self._connections)
+            self._connections.clear()
+            self._readers = queue.LifoQueue()
+            self._reader_count = 0
+            self._writer = None
+            self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to close database connection: {e}")
+        logger.info(f"Closed {len(connections)} database connections")
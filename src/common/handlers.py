@@ -1,5 +1,5 @@
 # src.common.services.handlers
-from PySide6.QtCore import QObject, Slot
+from PySide6.QtCore import QObject, Signal, Slot
 import logging
 
 from src.common.services.backend import BackendServices
@@ -8,6 +8,8 @@ logger = logging.getLogger(__name__)
 
 
 class DirectoryHandler(QObject):
+    directoryError = Signal(str)  # Why the selected directory was not used
+
     def __init__(self, backend_services: BackendServices):
         super(DirectoryHandler, self).__init__()
         self.backend = backend_services
@@ -24,6 +26,7 @@ class DirectoryHandler(QObject):
 
         try:
             self.backend.set_library_path(library_path)
-            logger.info(f"Library path set to: {library_path}")
+            logger.info(f"Library folder set to: {library_path}")
         except Exception as e:
             logger.exception(e, stack_info=True)
+            self.directoryError.emit(str(e))
@@ -0,0 +1,255 @@
+# src.common.profiler
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+# Latencies kept per statement shape for percentiles, memory stays bounded
+# however long the application runs
+LATENCY_SAMPLES = 1000
+
+
+def statement_shape(sql: str) -> str:
+    """Returns the shape of a statement, statements differing only by values share it.
+
+    Literals become '?' and lists of placeholders (e.g. IN (?, ?, ?) or
+    multi-row VALUES) are collapsed, whitespace is normalized.
+    """
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(...)", shape)
+    shape = _VALUES_LIST.sub(r"\1", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class StatementStats:
+    """Timings of the executions of a statement shape.
+
+    Count, totals and maximum cover every execution, percentiles the last
+    `samples` ones. Fetches are timed apart from executions: a cursor's rows
+    may be fetched while other threads execute the same statement.
+
+    Attributes:
+        shape: The statement shape, see statement_shape.
+        count: Number of executions.
+        rows: Number of rows fetched from the results.
+        total: Seconds spent executing and fetching, over every execution.
+        fetch_total: Seconds spent fetching, over every execution.
+        max_latency: Seconds taken by the slowest execution.
+        latencies: Seconds spent executing, per recent execution.
+    """
+
+    def __init__(self, shape: str, samples: int = LATENCY_SAMPLES):
+        """Initializes the StatementStats.
+
+        Args:
+            shape: The statement shape, see statement_shape.
+            samples: Number of recent latencies kept for percentiles.
+        """
+        self.shape = shape
+        self.count = 0
+        self.rows = 0
+        self.total = 0.0
+        self.fetch_total = 0.0
+        self.max_latency = 0.0
+        self.latencies: deque[float] = deque(maxlen=samples)
+
+    def add_execution(self, seconds: float, rows: int = 0):
+        """Records an execution that took the given time."""
+        self.count += 1
+        self.rows += rows
+        self.total += seconds
+        self.max_latency = max(self.max_latency, seconds)
+        self.latencies.append(seconds)
+
+    def add_fetch(self, seconds: float, rows: int):
+        """Records a fetch of rows produced by an execution."""
+        self.rows += rows
+        self.total += seconds
+        self.fetch_total += seconds
+
+    def percentile(self, percent: float) -> float:
+        """Returns the latency under which percent % of the recent executions ran."""
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        index = min(round(percent / 100 * (len(latencies) - 1)), len(latencies) - 1)
+        return latencies[index]
+
+
+class QueryProfiler:
+    """Collects the latency and row count of every statement of profiled connections.
+
+    Statements are grouped by shape so that a search typed key by key, or a
+    scan inserting thousands of songs, shows up as one line of the report.
+    The time spent fetching rows is added to the statement that produced them.
+
+    Connections are profiled when created with ProfiledConnection as factory,
+    see get_db_connection and settings.database_profile.
+
+    Attributes:
+        enabled: If False, executions are not recorded.
+        _stats: Stats of each statement shape.
+        _lock: Protects the stats, connections of several threads record them.
+    """
+
+    def __init__(self, enabled: bool = True):
+        """Initializes the QueryProfiler.
+
+        Args:
+            enabled: If False, executions are not recorded.
+        """
+        self.enabled = enabled
+        self._stats: dict[str, StatementStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, seconds: float, rows: int = 0) -> StatementStats | None:
+        """Records an execution of a statement.
+
+        Returns:
+            The stats of the statement shape, None if the profiler is disabled.
+        """
+        if not self.enabled:
+            return None
+        shape = statement_shape(sql)
+        with self._lock:
+            stats = self._stats.get(shape)
+            if stats is None:
+                stats = self._stats[shape] = StatementStats(shape)
+            stats.add_execution(seconds, rows)
+        return stats
+
+    def add_fetch(self, stats: StatementStats | None, seconds: float, rows: int):
+        """Adds rows fetched from an execution of a statement to its stats."""
+        if stats is None:
+            return
+        with self._lock:
+            stats.add_fetch(seconds, rows)
+
+    def reset(self):
+        """Forgets every recorded execution."""
+        with self._lock:
+            self._stats = {}
+
+    def get_stats(self) -> list[StatementStats]:
+        """Returns the stats of each statement shape, slowest total time first."""
+        with self._lock:
+            stats = list(self._stats.values())
+        return sorted(stats, key=lambda s: s.total, reverse=True)
+
+    def report(self, limit: int | None = 20) -> str:
+        """Formats the statements that took the most total time as a table.
+
+        Args:
+            limit: Number of statement shapes to include, all of them if None.
+        """
+        stats = self.get_stats()[:limit]
+        lines = [
+            (
+                f"{'count':>8} {'total ms':>10} {'fetch ms':>10} {'mean ms':>9} "
+                f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'rows':>9}  statement"
+            )
+        ]
+        for s in stats:
+            lines.append(
+                f"{s.count:>8} {s.total * 1000:>10.1f} {s.fetch_total * 1000:>10.1f} "
+                f"{s.total / s.count * 1000:>9.3f} {s.percentile(50) * 1000:>8.3f} "
+                f"{s.percentile(95) * 1000:>8.3f} {s.max_latency * 1000:>8.3f} "
+                f"{s.rows:>9}  {s.shape[:200]}"
+            )
+        return "\n".join(lines)
+
+    def log_report(self, limit: int | None = 20):
+        """Logs the report, see report."""
+        if not self._stats:
+            logger.info("No SQL statement profiled")
+            return
+        logger.info(f"SQL statement profile:\n{self.report(limit)}")
+
+
+profiler = QueryProfiler()
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor recording its executions and fetches in the profiler."""
+
+    _stats: StatementStats | None = None
+
+    def execute(self, sql: str, parameters: Any = (), /):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._stats = profiler.record(sql, time.perf_counter() - start)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable, /):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._stats = profiler.record(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script: str, /):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._stats = profiler.record(sql_script, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        profiler.add_fetch(
+            self._stats, time.perf_counter() - start, 0 if row is None else 1
+        )
+        return row
+
+    def fetchmany(self, size: int | None = None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        profiler.add_fetch(self._stats, time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        profiler.add_fetch(self._stats, time.perf_counter() - start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        row = super().__next__()
+        profiler.add_fetch(self._stats, time.perf_counter() - start, 1)
+        return row
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose statements are recorded in the profiler.
+
+    Connection.execute and friends bypass overridden cursor methods, so they
+    are routed through a ProfiledCursor explicitly.
+    """
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters: Any = (), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable, /):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script: str, /):
+        return self.cursor().executescript(sql_script)
@@ -1,9 +1,16 @@
 # src.common.repository
+import base64
+import gc
 import sqlite3
 import logging
 import json
-from typing import Generic, TypeVar, Any, Type, cast
-from pydantic import BaseModel
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from itertools import islice
+from typing import Generic, NamedTuple, TypeVar, Any, Type, cast
+from pydantic import BaseModel, ValidationInfo
+
+from src.common.schemas import MaintenanceRun
 
 # Generic type for Pydantic models
 T = TypeVar("T", bound=BaseModel)
@@ -11,8 +18,196 @@ T = TypeVar("T", bound=BaseModel)
 logger = logging.getLogger(__name__)
 
 
+# Columns holding JSON documents
+JSON_FIELDS = ("fileprops", "tags", "app_data")
+
+# Validation context of rows read back from the database, see is_trusted
+TRUSTED_CONTEXT = {"trusted": True}
+
+
+def is_trusted(info: ValidationInfo) -> bool:
+    """Returns True when validating data the application already validated.
+
+    Validators that only normalize values (e.g. make paths absolute) return
+    trusted values as is.
+    """
+    return bool(info.context and info.context.get("trusted"))
+
+
+class _Removed:
+    """Type of REMOVED."""
+
+    def __repr__(self) -> str:
+        return "REMOVED"
+
+
+# Value of a JSON path removed from its document, see DatabaseRepository.update_fields
+REMOVED = _Removed()
+
+
+def diff_fields(old: BaseModel, new: BaseModel) -> dict[str, Any]:
+    """Returns the fields changed from old to new, for DatabaseRepository.update_fields.
+
+    Columns holding JSON documents are compared key by key, a changed key is
+    returned as a "column.key" path (REMOVED if the key disappeared) so that
+    only this key is written. Documents with keys that cannot be written as a
+    path (see _json_path) are returned whole.
+    """
+    old_data = old.model_dump(exclude={"id"})
+    new_data = new.model_dump(exclude={"id"})
+    changes: dict[str, Any] = {}
+    for field, value in new_data.items():
+        old_value = old_data.get(field)
+        if value == old_value:
+            continue
+        if (
+            field in JSON_FIELDS
+            and isinstance(value, dict)
+            and isinstance(old_value, dict)
+            and all(_is_path_key(key) for key in value.keys() | old_value.keys())
+        ):
+            for key, key_value in value.items():
+                if key not in old_value or old_value[key] != key_value:
+                    changes[f"{field}.{key}"] = key_value
+            for key in old_value.keys() - value.keys():
+                changes[f"{field}.{key}"] = REMOVED
+        else:
+            changes[field] = value
+    return changes
+
+
+def _is_path_key(key: str) -> bool:
+    """Returns True if a JSON object key can be part of a field path, see _json_path."""
+    return not any(character in key for character in '."\\')
+
+
+def _json_path(keys: Sequence[str]) -> str:
+    """Returns the SQLite JSON path of nested object keys, e.g. $."rating".
+
+    SQLite reads quoted keys verbatim, there is no way to escape a '"' and a
+    '\\' would not match the (escaped) key of the document.
+
+    Raises:
+        ValueError: If a key contains '"' or '\\'.
+    """
+    for key in keys:
+        if '"' in key or "\\" in key:
+            raise ValueError(f"Unsupported character in JSON key: {key!r}")
+    return "$" + "".join(f'."{key}"' for key in keys)
+
+
+class Page(NamedTuple, Generic[T]):
+    """A page of records, see DatabaseRepository.find_page."""
+
+    items: list[T]
+    cursor: str | None  # Token of the next page, None after the last page
+
+
+def _encode_cursor(sort: list[tuple[str, str]], values: Sequence[Any]) -> str:
+    """Encodes the sort keys of the last record of a page as an opaque token."""
+    document = json.dumps({"sort": sort, "values": list(values)})
+    return base64.urlsafe_b64encode(document.encode()).decode()
+
+
+def _decode_cursor(token: str, sort: list[tuple[str, str]]) -> list[Any]:
+    """Returns the sort keys encoded in a cursor token.
+
+    Raises:
+        ValueError: If the token is invalid or was made for another sort order.
+    """
+    try:
+        document = json.loads(base64.urlsafe_b64decode(token.encode()))
+        cursor_sort = [tuple(item) for item in document["sort"]]
+        values = document["values"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+    if cursor_sort != sort or len(values) != len(sort):
+        raise ValueError("Cursor does not match the sort order")
+    return values
+
+
+def _seek_condition(
+    sort: list[tuple[str, str]], values: Sequence[Any]
+) -> tuple[str, list[Any]]:
+    """Builds the WHERE condition of the records sorted after the given keys.
+
+    NULLs sort first in ascending order and last in descending order, as in
+    SQLite. The condition starts with a bound on the first key so that SQLite
+    seeks into an index on the sort keys instead of scanning it from the start.
+    """
+    terms = []
+    params: list[Any] = []
+    for depth, (expression, direction) in enumerate(sort):
+        value = values[depth]
+        equal_prefix = [f"{sort[i][0]} IS ?" for i in range(depth)]
+        prefix_params = list(values[:depth])
+        if direction == "ASC":
+            after = (
+                f"{expression} IS NOT NULL" if value is None else f"{expression} > ?"
+            )
+        elif value is None:
+            continue  # Nothing sorts after NULL in descending order
+        else:
+            after = f"({expression} < ? OR {expression} IS NULL)"
+        terms.append(" AND ".join(equal_prefix + [after]))
+        params.extend(prefix_params)
+        if value is not None:
+            params.append(value)
+
+    if not terms:
+        return "0", []
+    condition = "(" + " OR ".join(f"({term})" for term in terms) + ")"
+
+    first_expression, first_direction = sort[0]
+    first_value = values[0]
+    if first_value is not None:
+        if first_direction == "ASC":
+            bound = f"{first_expression} >= ?"
+        else:
+            bound = f"({first_expression} <= ? OR {first_expression} IS NULL)"
+        condition = f"{bound} AND {condition}"
+        params = [first_value] + params
+    return condition, params
+
+
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """Pauses the cyclic garbage collector, e.g. while building many models.
+
+    Each model allocates several tracked objects, which triggers collections
+    that walk every object built so far: about half the time of reading a large
+    table. Models hold no reference cycles, reference counting frees them.
+
+    The collector is paused for the whole process, not only the calling thread,
+    so repositories never do it themselves: it is up to the caller of a large
+    read (e.g. a one-off export or a benchmark) to opt in.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
 class DatabaseRepository(Generic[T]):
-    """Base repository for SQLite database operations."""
+    """Base repository for SQLite database operations.
+
+    Rows read from the table are trusted: models were validated when written,
+    so reads are validated with TRUSTED_CONTEXT, which skips the Python
+    validators that normalize values (e.g. Song.normalize_path). Set
+    validate_reads to run them anyway, e.g. for a table written by other
+    applications.
+
+    Attributes:
+        validate_reads: If True, rows are fully validated when converted to models.
+        select_columns: The columns read into models.
+        default_sort: Sort order of find_page.
+    """
+
+    validate_reads: bool = False
+    default_sort: Sequence[tuple[str, str]] = (("id", "ASC"),)
 
     def __init__(self, conn: sqlite3.Connection, model_class: Type[T], table_name: str):
         self.conn = conn
@@ -20,6 +215,10 @@ class DatabaseRepository(Generic[T]):
         self.table_name = table_name
         self.logger = logging.getLogger(f"{__name__}.{table_name}")
         self.logger.debug(f"Repository initialized for table: {table_name}")
+        # Model fields are columns, other columns (e.g. generated ones) are not read
+        self._read_fields = tuple(model_class.model_fields)
+        self._json_fields = [name for name in self._read_fields if name in JSON_FIELDS]
+        self.select_columns = ", ".join(self._read_fields)
 
     def _execute_query(self, query: str, params: tuple = ()) -> int | None:
         """Executes a SQL query that doesn't return rows (e.g., INSERT, UPDATE, DELETE)."""
@@ -32,6 +231,17 @@ class DatabaseRepository(Generic[T]):
             self.logger.exception(e, stack_info=True)
             raise
 
+    def _execute_many(self, query: str, params_seq: Iterable[Sequence]) -> int:
+        """Executes a SQL query once per parameter set, in a single transaction."""
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                cursor.executemany(query, params_seq)
+                return cursor.rowcount
+        except sqlite3.Error:
+            self.logger.exception("Failed to execute statement", stack_info=True)
+            raise
+
     def _execute_select_query(
         self, query: str, params: tuple = (), fetchone=False
     ) -> sqlite3.Row | list[sqlite3.Row] | None:
@@ -48,14 +258,36 @@ class DatabaseRepository(Generic[T]):
             self.logger.exception(e, stack_info=True)
             raise
 
+    def _iter_select_query(
+        self, query: str, params: tuple = (), batch_size: int = 500
+    ) -> Iterator[list[sqlite3.Row]]:
+        """Executes a SQL query that returns rows, yielding them in batches.
+
+        Rows are fetched batch_size at a time with fetchmany, so that only one
+        batch is held in memory whatever the size of the result.
+        """
+        try:
+            cursor = self.conn.execute(query, params)
+            while rows := cursor.fetchmany(batch_size):
+                yield rows
+        except sqlite3.Error:
+            self.logger.exception("Failed to iterate query results", stack_info=True)
+            raise
+
+    def _iter_models(
+        self, query: str, params: tuple = (), batch_size: int = 500
+    ) -> Iterator[T]:
+        """Yields the models of the rows of a query, see _iter_select_query."""
+        for rows in self._iter_select_query(query, params, batch_size):
+            yield from self._rows_to_models(rows)
+
     def _row_to_model(self, row: sqlite3.Row | tuple) -> T:
         """Converts a database row to a Pydantic model instance."""
         if isinstance(row, sqlite3.Row):
-            row_dict = {key: row[key] for key in row.keys()}
-            # Do not forget to add json fields here
-            # Todo: maybe have a single 'json_data' field in models
-            for key in ("fileprops", "tags", "app_data"):
-                if key in row_dict and row_dict[key] is not None:
+            keys = row.keys()
+            row_dict = {key: row[key] for key in self._read_fields if key in keys}
+            for key in self._json_fields:
+                if row_dict.get(key) is not None:
                     row_dict[key] = json.loads(row_dict[key])
         elif isinstance(row, tuple):
             # Handle cases where the query might return a tuple (e.g., count)
@@ -67,30 +299,37 @@ class DatabaseRepository(Generic[T]):
                 ).fetchall()
             ]
             row_dict = dict(zip(column_names, row))
-        return self.model_class.model_validate(row_dict)
+        context = None if self.validate_reads else TRUSTED_CONTEXT
+        return self.model_class.model_validate(row_dict, context=context)
+
+    def _rows_to_models(self, rows: Iterable[sqlite3.Row | tuple] | None) -> list[T]:
+        """Converts rows to models, see _row_to_model."""
+        if not rows:
+            return []
+        return [self._row_to_model(row) for row in rows]
 
     def find_by_id(self, id: int) -> T | None:
-        query = f"SELECT * FROM {self.table_name} WHERE id = ?"
+        query = f"SELECT {self.select_columns} FROM {self.table_name} WHERE id = ?"
         row = self._execute_select_query(query, (id,), fetchone=True)
         return self._row_to_model(row) if row else None  # type: ignore
 
     def find_one(self, query_dict: dict[str, Any]) -> T | None:
         """Finds a single record matching criteria."""
         where_clauses = " AND ".join(f"{key} = ?" for key in query_dict)
-        query = f"SELECT * FROM {self.table_name} WHERE {where_clauses} LIMIT 1"
+        query = f"SELECT {self.select_columns} FROM {self.table_name} WHERE {where_clauses} LIMIT 1"
         params = tuple(query_dict.values())
         row = self._execute_select_query(query, params, fetchone=True)
         return self._row_to_model(row) if row else None  # type: ignore
 
-    def find_many(
+    def _find_query(
         self,
         query_dict: dict[str, Any] | None = None,
         sort: list[tuple] | None = None,
         limit: int | None = None,
         skip: int | None = None,
-    ) -> list[T]:
-        """Finds multiple records matching criteria, with sorting, limit, and skip."""
-        query = f"SELECT * FROM {self.table_name}"
+    ) -> tuple[str, tuple]:
+        """Builds the query of find_many and iter_many."""
+        query = f"SELECT {self.select_columns} FROM {self.table_name}"
         params: list[Any] = []
 
         if query_dict:
@@ -114,8 +353,98 @@ class DatabaseRepository(Generic[T]):
             query += " OFFSET ?"
             params.append(skip)
 
-        rows = self._execute_select_query(query, tuple(params))  # Use the select query
-        return [self._row_to_model(row) for row in rows] if rows else []  # type: ignore
+        return query, tuple(params)
+
+    def find_many(
+        self,
+        query_dict: dict[str, Any] | None = None,
+        sort: list[tuple] | None = None,
+        limit: int | None = None,
+        skip: int | None = None,
+    ) -> list[T]:
+        """Finds multiple records matching criteria, with sorting, limit, and skip."""
+        query, params = self._find_query(query_dict, sort, limit, skip)
+        rows = self._execute_select_query(query, params)  # Use the select query
+        return self._rows_to_models(rows)  # type: ignore
+
+    def iter_many(
+        self,
+        query_dict: dict[str, Any] | None = None,
+        sort: list[tuple] | None = None,
+        batch_size: int = 500,
+    ) -> Iterator[T]:
+        """Yields the records matching criteria, reading batch_size rows at a time.
+
+        Unlike find_many, memory use does not grow with the number of records.
+        The rows are read lazily: consume the iterator before writing to the
+        table through the same connection.
+        """
+        query, params = self._find_query(query_dict, sort)
+        return self._iter_models(query, params, batch_size)
+
+    def find_page(
+        self,
+        sort: list[tuple[str, str]] | None = None,
+        cursor: str | None = None,
+        limit: int = 100,
+        query_dict: dict[str, Any] | None = None,
+    ) -> Page[T]:
+        """Finds a page of records, continuing after the page of the cursor.
+
+        Keyset pagination: instead of an OFFSET, which reads and skips every
+        previous record, the page starts right after the sort keys of the last
+        record of the previous page, seeking into the index on the sort keys.
+
+        Args:
+            sort: (column or expression, "ASC" or "DESC") pairs, defaults to
+                default_sort. The id is added as last key, to sort records with
+                equal keys.
+            cursor: The cursor of the previous page, None for the first page.
+            limit: Maximum number of records of the page.
+            query_dict: Criteria of the records, see find_many.
+
+        Returns:
+            The records and the cursor of the next page.
+
+        Raises:
+            ValueError: If the cursor was made for another sort order.
+        """
+        sort = [
+            (expression, direction.upper())
+            for expression, direction in sort or self.default_sort
+        ]
+        if not any(expression == "id" for expression, _ in sort):
+            sort.append(("id", "ASC"))
+
+        keys = ", ".join(
+            f"{expression} AS _key{i}" for i, (expression, _) in enumerate(sort)
+        )
+        query = f"SELECT {self.select_columns}, {keys} FROM {self.table_name}"
+        conditions = []
+        params: list[Any] = []
+        if query_dict:
+            conditions.extend(f"{key} = ?" for key in query_dict)
+            params.extend(query_dict.values())
+        if cursor is not None:
+            seek, seek_params = _seek_condition(sort, _decode_cursor(cursor, sort))
+            conditions.append(seek)
+            params.extend(seek_params)
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        order = ", ".join(f"{expression} {direction}" for expression, direction in sort)
+        query += f" ORDER BY {order} LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._execute_select_query(query, tuple(params)) or []
+        has_more = len(rows) > limit  # type: ignore
+        rows = rows[:limit]  # type: ignore
+        next_cursor = None
+        if has_more:
+            last = rows[-1]  # type: ignore
+            next_cursor = _encode_cursor(
+                sort, [last[f"_key{i}"] for i in range(len(sort))]
+            )
+        return Page(self._rows_to_models(rows), next_cursor)
 
     def count(self, query_dict: dict[str, Any] | None = None) -> int:
         query = f"SELECT COUNT(*) FROM {self.table_name}"
@@ -128,8 +457,8 @@ class DatabaseRepository(Generic[T]):
         row = self._execute_select_query(query, tuple(params), fetchone=True)
         return cast(int, row[0]) if row else 0
 
-    def insert(self, model: T) -> int | None:
-        """Inserts a new record."""
+    def _model_to_row(self, model: T) -> dict[str, Any]:
+        """Converts a Pydantic model instance to column values, without the ID."""
         data = model.model_dump(exclude={"id"})  # Exclude auto-incrementing ID
 
         # Serialize JSON fields
@@ -138,6 +467,11 @@ class DatabaseRepository(Generic[T]):
         for key in ("fileprops", "tags", "app_data"):
             if key in data and data[key] is not None:
                 data[key] = json.dumps(data[key])
+        return data
+
+    def insert(self, model: T) -> int | None:
+        """Inserts a new record."""
+        data = self._model_to_row(model)
 
         fields = ", ".join(data.keys())
         placeholders = ", ".join("?" * len(data))
@@ -145,16 +479,27 @@ class DatabaseRepository(Generic[T]):
         last_row_id = self._execute_query(query, tuple(data.values()))
         return last_row_id
 
-    def update(self, id: int, model: T) -> bool:
-        """Updates an existing record by ID."""
-        data = model.model_dump(exclude={"id"})
+    def insert_many(self, models: Iterable[T], chunk_size: int | None = None) -> int:
+        """Inserts many records with executemany.
 
-        # Serialize JSON fields
-        # Do not forget to add json fields here
-        # Todo: maybe have a single 'json_data' field in models or 'json' prefix
-        for key in ("fileprops", "tags", "app_data"):
-            if key in data and data[key] is not None:
-                data[key] = json.dumps(data[key])
+        Each chunk of `chunk_size` records is written in its own transaction,
+        all records are written in a single transaction if no chunk size is given.
+        Returns the number of inserted records.
+        """
+        models_iter = iter(models)
+        inserted = 0
+        while chunk := list(islice(models_iter, chunk_size)):
+            rows = [self._model_to_row(model) for model in chunk]
+            fields = ", ".join(rows[0].keys())
+            placeholders = ", ".join("?" * len(rows[0]))
+            query = f"INSERT INTO {self.table_name} ({fields}) VALUES ({placeholders})"
+            self._execute_many(query, [tuple(row.values()) for row in rows])
+            inserted += len(rows)
+        return inserted
+
+    def update(self, id: int, model: T) -> bool:
+        """Updates an existing record by ID, rewriting every column (see update_fields)."""
+        data = self._model_to_row(model)
 
         set_clauses = ", ".join(f"{key} = ?" for key in data)
         query = f"UPDATE {self.table_name} SET {set_clauses} WHERE id = ?"
@@ -162,8 +507,98 @@ class DatabaseRepository(Generic[T]):
         self._execute_query(query, params)
         return True  # SQLite doesn't easily give us rows affected
 
+    def _update_fields_query(self, fields: dict[str, Any]) -> tuple[str, list[Any]]:
+        """Compiles partial updates into SET clauses, see update_fields."""
+        values: dict[str, Any] = {}
+        paths: dict[str, list[tuple[list[str], Any]]] = {}
+        for name, value in fields.items():
+            column, *keys = name.split(".")
+            if column not in self._read_fields or column == "id":
+                raise ValueError(f"Unknown field for {self.table_name}: {name}")
+            if keys and column not in JSON_FIELDS:
+                raise ValueError(f"{column} is not a JSON column: {name}")
+            if keys:
+                paths.setdefault(column, []).append((keys, value))
+            else:
+                values[column] = value
+        if values.keys() & paths.keys():
+            raise ValueError("A column cannot be both replaced and partially updated")
+
+        set_clauses: list[str] = []
+        params: list[Any] = []
+        for column, value in values.items():
+            set_clauses.append(f"{column} = ?")
+            if column in JSON_FIELDS and value is not None:
+                value = json.dumps(value)
+            params.append(value)
+        for column, changes in paths.items():
+            # json_set and json_remove rewrite the document inside SQLite,
+            # the other keys are not serialized, sent, nor validated again
+            expression = column
+            set_paths = [(keys, v) for keys, v in changes if v is not REMOVED]
+            removed_paths = [keys for keys, v in changes if v is REMOVED]
+            if set_paths:
+                expression = f"json_set({expression}, {', '.join(['?, json(?)'] * len(set_paths))})"
+                for keys, value in set_paths:
+                    params.extend((_json_path(keys), json.dumps(value)))
+            if removed_paths:
+                expression = (
+                    f"json_remove({expression}, {', '.join('?' * len(removed_paths))})"
+                )
+                params.extend(_json_path(keys) for keys in removed_paths)
+            set_clauses.append(f"{column} = {expression}")
+        return ", ".join(set_clauses), params
+
+    def update_fields(self, id: int, fields: dict[str, Any]) -> bool:
+        """Updates only the given fields of a record.
+
+        Unlike update, which rewrites every column, a field of a JSON column is
+        written in place with json_set: changing a rating does not rewrite the
+        tags, and writes far less to the WAL.
+
+        Args:
+            id: The ID of the record.
+            fields: New values by column name, or by path inside a JSON column
+                (e.g. "app_data.rating" or "tags.GENRE"). A path set to REMOVED
+                is removed from its document. See diff_fields.
+
+        Returns:
+            True if the record exists.
+
+        Raises:
+            ValueError: If a field is not a column of the table.
+        """
+        if not fields:
+            return self.find_by_id(id) is not None
+        set_clauses, params = self._update_fields_query(fields)
+        query = f"UPDATE {self.table_name} SET {set_clauses} WHERE id = ?"
+        try:
+            with self.conn:
+                cursor = self.conn.execute(query, (*params, id))
+                return cursor.rowcount > 0
+        except sqlite3.Error:
+            self.logger.exception("Failed to update fields", stack_info=True)
+            raise
+
+    def update_changed(self, id: int, old: T, new: T) -> bool:
+        """Updates a record with the fields that differ between old and new.
+
+        Nothing is written if the models are equal.
+
+        Returns:
+            True if the record was written.
+        """
+        changes = diff_fields(old, new)
+        if not changes:
+            return False
+        return self.update_fields(id, changes)
+
     def upsert(self, query_dict: dict[str, Any], model: T) -> int | None:
-        """Updates if exists or inserts if not."""
+        """Updates if exists or inserts if not.
+
+        Works without a unique index on the criteria, but takes two statements:
+        prefer upsert_on_conflict when the columns are unique.
+        """
         existing_record = self.find_one(query_dict)
         if existing_record:
             self.update(existing_record.id, model)  # type: ignore
@@ -171,6 +606,84 @@ class DatabaseRepository(Generic[T]):
         else:
             return self.insert(model)
 
+    def _upsert_query(
+        self,
+        fields: Sequence[str],
+        conflict_columns: Sequence[str],
+        exclude: Iterable[str] = (),
+    ) -> str:
+        """Builds an INSERT ... ON CONFLICT DO UPDATE statement.
+
+        On conflict, every inserted column is updated but the conflict columns
+        and the excluded ones.
+        """
+        excluded = set(exclude) | set(conflict_columns)
+        placeholders = ", ".join("?" * len(fields))
+        query = (
+            f"INSERT INTO {self.table_name} ({', '.join(fields)}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({', '.join(conflict_columns)}) DO "
+        )
+        updated = [field for field in fields if field not in excluded]
+        if not updated:
+            return query + "NOTHING"
+        set_clauses = ", ".join(f"{field} = excluded.{field}" for field in updated)
+        return query + f"UPDATE SET {set_clauses}"
+
+    def upsert_on_conflict(
+        self,
+        model: T,
+        conflict_columns: Sequence[str],
+        exclude: Iterable[str] = (),
+    ) -> int | None:
+        """Inserts a record, or updates the record with the same conflict columns.
+
+        A single statement, so there is no race between the lookup and the
+        write. The conflict columns need a unique index.
+
+        Args:
+            model: The record.
+            conflict_columns: The unique columns identifying the record, e.g. ("path",).
+            exclude: Columns kept as they are when the record exists, e.g. ("app_data",).
+
+        Returns:
+            The ID of the inserted or updated record, None if it existed and no
+            column was updated.
+        """
+        data = self._model_to_row(model)
+        query = self._upsert_query(list(data), conflict_columns, exclude)
+        try:
+            with self.conn:
+                row = self.conn.execute(
+                    f"{query} RETURNING id", tuple(data.values())
+                ).fetchone()
+        except sqlite3.Error:
+            self.logger.exception("Failed to upsert records", stack_info=True)
+            raise
+        return row[0] if row else None
+
+    def upsert_many(
+        self,
+        models: Iterable[T],
+        conflict_columns: Sequence[str],
+        exclude: Iterable[str] = (),
+        chunk_size: int | None = None,
+    ) -> int:
+        """Upserts many records with executemany, see upsert_on_conflict.
+
+        Each chunk of `chunk_size` records is written in its own transaction,
+        all records are written in a single transaction if no chunk size is given.
+        Returns the number of upserted records.
+        """
+        exclude = tuple(exclude)
+        models_iter = iter(models)
+        upserted = 0
+        while chunk := list(islice(models_iter, chunk_size)):
+            rows = [self._model_to_row(model) for model in chunk]
+            query = self._upsert_query(list(rows[0]), conflict_columns, exclude)
+            self._execute_many(query, [tuple(row.values()) for row in rows])
+            upserted += len(rows)
+        return upserted
+
     def delete(self, id: int) -> bool:
         """Deletes a record by ID."""
         query = f"DELETE FROM {self.table_name} WHERE id = ?"
@@ -188,3 +701,18 @@ class DatabaseRepository(Generic[T]):
     def aggregate(self, pipeline: list[dict[str, Any]]):
         """Not implemented for SQLite repository."""
         raise NotImplementedError("Aggregation not implemented for SQLite")
+
+
+class MaintenanceRunsRepository(DatabaseRepository[MaintenanceRun]):
+    """Repository for the last run of each database maintenance task."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        super().__init__(connection, MaintenanceRun, "maintenance_runs")
+
+    def record(self, run: MaintenanceRun) -> int | None:
+        """Replaces the last run of the task."""
+        return self.upsert_on_conflict(run, ("task",))
+
+    def last_runs(self) -> dict[str, MaintenanceRun]:
+        """Returns the last run of each task that ran, by task name."""
+        return {run.task: run for run in self.find_many()}
@@ -0,0 +1,16 @@
+# src.common.schemas
+from pydantic import BaseModel, Field
+
+
+class MaintenanceRun(BaseModel):
+    """Last run of a database maintenance task, see MaintenanceService"""
+
+    id: int | None = Field(default=None)
+    task: str = Field(description="Name of the task, e.g. optimize")
+    started_at: float = Field(description="Start time of the run (UNIX time)")
+    duration: float = Field(description="Seconds the run took")
+    complete: bool = Field(
+        default=True,
+        description="False if the task ran out of time, it runs again at the next check",
+    )
+    result: str | None = Field(default=None, description="Outcome of the run")
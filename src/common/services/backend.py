@@ -1,15 +1,32 @@
 # src.common.services.backend
 import logging
+import time
 from pathlib import Path
 from sqlite3 import Connection
 
-from PySide6.QtCore import Property, QObject, QThread, Signal, Slot
+from PySide6.QtCore import (
+    Property,
+    QMetaObject,
+    QObject,
+    Qt,
+    QThread,
+    QTimer,
+    Signal,
+    Slot,
+)
 
+from src.common.database import ConnectionManager
 from src.features.player.services.playback import PlaybackService
 from src.features.library.models import MusicLibrary
-from src.features.library.repository import SongsRepository
-from src.features.library.services.library import LibraryServices
+from src.features.library.repository import (
+    LibraryRootsRepository,
+    PlayEventBuffer,
+    SongsRepository,
+)
 from src.common.services.backend_worker import BackendWorker
+from src.common.services.maintenance import MaintenanceService
+from src.common.services.watcher import LibraryWatcher
+from src.common.utils.settings import settings
 from src.features.playlists.repository import (
     PlaylistSongRepository,
     PlaylistsRepository,
@@ -23,39 +40,64 @@ class BackendServices(QObject):
 
     Signals:
         scanStarted: Emitted when the library scan starts.
-        scanProgress: Emitted during the scan to indicate progress (int: number of files added).
+        scanProgress: Emitted during the scan to indicate progress (dict: files
+            discovered and parsed, files/sec, bytes/sec, current directory, ETA).
         scanFinished: Emitted when the scan finishes (list: list of non-critical error paths).
+        scanCancelled: Emitted when the scan stops after a call to cancel_scan.
         scanError: Emitted if a critical error occurs during the scan (str: error message).
-        _startScan: Internal signal to trigger scan in worker thread (object: library path).
+        libraryChanged: Emitted when file changes were applied to the library
+            outside of a scan, or songs outside of it were deleted
+            (object: ScanSummary).
+        libraryRootsChanged: Emitted when a library folder is added or removed.
+        _startScan: Internal signal to trigger scan in worker thread
+            (object: list of library roots).
+        _startWatching: Internal signal to watch the library from the worker thread
+            (object: list of library roots).
+        _startPrune: Internal signal to delete the songs outside of the library
+            from the worker thread (object: list of library roots).
+        _flushPlayEvents: Internal signal to write play counts from the worker thread.
+        _startMaintenance: Internal signal to schedule database maintenance in
+            the worker thread.
 
     Attributes:
-        library_path: The path to the music library.
+        library_roots_repository: Repository for the directories of the library.
         songs_repository: Repository for song database operations.
         playlists_repository: Repository for playlist database operations.
         playlist_song_repository: Repository for playlist_song database operations.
-        library_services: Service for song-related logic.
         playback_service: Service for audio playback.
         worker_thread: The worker thread for long-running operations.
         worker: The worker object that runs in the worker thread.
+        watcher: Keeps the library in sync with file changes, runs in the worker thread.
+        play_events: Plays and skips of the player, written by the worker thread.
+        play_events_timer: Triggers the periodic writes of play events.
+        maintenance: Runs database maintenance when idle, in the worker thread.
     """
 
     scanStarted = Signal()
-    scanProgress = Signal(int)
+    scanProgress = Signal(dict)
     scanFinished = Signal(list)
+    scanCancelled = Signal()
     scanError = Signal(str)
+    libraryChanged = Signal(object)
+    libraryRootsChanged = Signal()
     _startScan = Signal(object)
+    _startWatching = Signal(object)
+    _startPrune = Signal(object)
+    _flushPlayEvents = Signal()
+    _startMaintenance = Signal()
 
-    def __init__(self, connection: Connection):
+    def __init__(self, connection: Connection, connections: ConnectionManager):
         """Initializes the BackendServices.
 
         Sets up the worker thread, connects signals, and initializes
         repositories and services.
 
         Args:
-            connection: The database connection.
+            connection: The database connection of the GUI thread.
+            connections: Provides the database connections of the worker threads.
         """
         super().__init__()
-        self._library_path: Path | None = None
+        self._library_roots_repository = LibraryRootsRepository(connection)
         self._songs_repository: SongsRepository = SongsRepository(connection)
         self._playlists_repository: PlaylistsRepository = PlaylistsRepository(
             connection
@@ -63,50 +105,97 @@ class BackendServices(QObject):
         self._playlist_song_repository: PlaylistSongRepository = PlaylistSongRepository(
             connection, self._playlists_repository, self._songs_repository
         )
+        self._play_events = PlayEventBuffer()
         self._library = MusicLibrary(
             self._songs_repository,
             self._playlists_repository,
             self._playlist_song_repository,
+            self._play_events,
         )
-        self._library_services: LibraryServices | None = None
         self._playback_service: PlaybackService = PlaybackService(self._library)
 
         # Setup worker thread
         self._worker_thread = QThread()
-        self._worker = BackendWorker()
+        self._worker = BackendWorker(connections, self._play_events)
         self._worker.moveToThread(self._worker_thread)
 
         # Connect worker signals to local signals for forwarding
         self._worker.scanStarted.connect(self.scanStarted)
         self._worker.scanProgress.connect(self.scanProgress)
         self._worker.scanFinished.connect(self.scanFinished)
+        self._worker.scanCancelled.connect(self.scanCancelled)
         self._worker.scanError.connect(self.scanError)
+        self._worker.libraryChanged.connect(self.libraryChanged)
 
         # Connect scan start signal to worker slot
         self._startScan.connect(self._worker.scan_library)
+        self._startPrune.connect(self._worker.prune_library)
+
+        # Setup library watcher, sharing the worker thread
+        self._watcher = LibraryWatcher(connections)
+        self._watcher.moveToThread(self._worker_thread)
+        self._watcher.libraryChanged.connect(self.libraryChanged)
+        self._startWatching.connect(self._watcher.watch)
+        # Directories created by a scan need to be watched as well
+        self._worker.scanFinished.connect(self._watch_library)
+
+        # Play counts are written in batches, away from the playback path
+        self._flushPlayEvents.connect(self._worker.flush_play_events)
+        self._play_events_timer = QTimer(self)
+        self._play_events_timer.setInterval(
+            int(settings.play_events_flush_interval * 1000)
+        )
+        self._play_events_timer.timeout.connect(self._flushPlayEvents)
+        self._play_events_timer.start()
+
+        # Database maintenance, postponed while a scan runs
+        self._maintenance = MaintenanceService(
+            connections, is_busy=lambda: self._worker.is_running
+        )
+        self._maintenance.moveToThread(self._worker_thread)
+        self._startMaintenance.connect(self._maintenance.start)
 
         self._worker_thread.start()
+        self._watch_library()
+        if settings.maintenance_enabled:
+            self._startMaintenance.emit()
 
     def __del__(self):
         """Clean up the worker thread."""
-        if hasattr(self, "worker_thread") and self._worker_thread.isRunning():
+        if hasattr(self, "_worker_thread") and self._worker_thread.isRunning():
             self._worker_thread.quit()
             self._worker_thread.wait()
 
-    def _initialize_services(self):
-        """Initialize services with the current library path."""
-        if self._library_path:
-            self._library_services = LibraryServices(
-                self._library_path,
-                self._songs_repository,
-            )
+    def close(self):
+        """Stops the background work and writes the plays still buffered, e.g. at exit.
+
+        The running scan is cancelled, the maintenance timer and the watcher are
+        stopped in the worker thread, and the worker thread is waited for. Once
+        this returns, no thread uses the database connections anymore, so they
+        can be closed.
+        """
+        self._play_events_timer.stop()
+        self._worker.cancel_scan()
+        if self._worker_thread.isRunning():
+            # Timers and watchers can only be stopped from their own thread
+            for service in (self._maintenance, self._watcher):
+                QMetaObject.invokeMethod(
+                    service,
+                    "stop",
+                    Qt.ConnectionType.BlockingQueuedConnection,  # type: ignore
+                )
+            self._worker_thread.quit()
+            self._worker_thread.wait()
+        self._worker.flush_play_events()
 
     @Slot(str)  # type: ignore
     def set_library_path(self, library_path: str):
-        """Sets the library path.
+        """Sets the library directory, replacing every library folder.
+
+        Songs of the replaced folders are not deleted, see prune_library.
 
         Args:
-            library_path: The path to the music library.
+            library_path: The path to the music directory.
 
         Raises:
             ValueError: If the provided path is not a valid directory.
@@ -114,23 +203,95 @@ class BackendServices(QObject):
         path = Path(library_path)
         if not path.is_dir():
             raise ValueError(f"Invalid library path: {path}")
-        self._library_path = path
-        self._initialize_services()
+        self._library_roots_repository.replace_roots(path, time.time())
+        self.libraryRootsChanged.emit()
+        self._watch_library()
+
+    @Slot(str)  # type: ignore
+    def add_library_root(self, library_path: str):
+        """Adds a directory to the library.
+
+        Library folders inside the new one are merged into it.
+
+        Args:
+            library_path: The path to the music directory.
+
+        Raises:
+            ValueError: If the provided path is not a valid directory, or is
+                already part of the library.
+        """
+        path = Path(library_path)
+        if not path.is_dir():
+            raise ValueError(f"Invalid library path: {path}")
+        self._library_roots_repository.add_root(path, time.time())
+        self.libraryRootsChanged.emit()
+        self._watch_library()
+
+    @Slot(str)  # type: ignore
+    def remove_library_root(self, library_path: str):
+        """Removes a directory from the library.
+
+        Its songs are not deleted, see prune_library.
+
+        Args:
+            library_path: The path to the music directory.
+        """
+        if self._library_roots_repository.remove_root(library_path):
+            self.libraryRootsChanged.emit()
+            self._watch_library()
+
+    @Slot(result=list)  # type: ignore
+    def get_library_roots(self) -> list[str]:
+        """Returns the directories of the library."""
+        return [str(root) for root in self._library_roots_repository.get_roots()]
+
+    @Slot()
+    def _watch_library(self):
+        """Starts watching the library roots for file changes, if enabled."""
+        if settings.library_watch:
+            self._startWatching.emit(self._library_roots_repository.get_roots())
 
     @Slot()
     def scan_library(self):
         """Starts a library scan in the background thread.
 
-        Emits scanError if the library path is not set. Otherwise,
+        Emits scanError if no library folder was added. Otherwise,
         emits the _startScan signal to trigger the scan in the worker thread.
         """
-        if not self._library_path:
+        library_roots = self._library_roots_repository.get_roots()
+        if not library_roots:
+            self.scanError.emit(
+                "Library path not set. Please add a library folder first."
+            )
+            return
+
+        self._startScan.emit(library_roots)
+
+    @Slot()
+    def prune_library(self):
+        """Deletes the songs outside of every library folder in the background thread.
+
+        Songs of removed or replaced library folders are kept until the user
+        asks for this, since their playlist entries and play history are
+        deleted with them. Emits libraryChanged once the songs are deleted.
+        """
+        library_roots = self._library_roots_repository.get_roots()
+        if not library_roots:
             self.scanError.emit(
-                "Library path not set. Please set a library path first."
+                "Library path not set. Please add a library folder first."
             )
             return
 
-        self._startScan.emit(self._library_path)
+        self._startPrune.emit(library_roots)
+
+    @Slot()
+    def cancel_scan(self):
+        """Cancels the running library scan.
+
+        The worker is called directly since its thread is busy scanning. The next
+        scan resumes from the directories completed so far.
+        """
+        self._worker.cancel_scan()
 
     def get_library(self):
         return self._library
@@ -1,12 +1,18 @@
 # src.common.services.backend_worker
 import logging
+import threading
 from pathlib import Path
 from PySide6.QtCore import QObject, Signal, Slot
 
-from src.common.database import get_db_connection
+from src.common.database import ConnectionManager
 from src.features.library.models import MusicLibrary
-from src.features.library.repository import SongsRepository
-from src.features.library.services.library import LibraryServices
+from src.features.library.repository import (
+    PlayEventBuffer,
+    PlayEventsRepository,
+    SongsRepository,
+)
+from src.features.library.schemas import ScanSummary
+from src.features.library.services.scheduler import ScanScheduler
 from src.features.playlists.repository import (
     PlaylistSongRepository,
     PlaylistsRepository,
@@ -20,48 +26,67 @@ class BackendWorker(QObject):
 
     Signals:
         scanStarted: Emitted when the library scan starts.
-        scanProgress: Emitted during the scan to indicate progress.
+        scanProgress: Emitted during the scan to indicate progress (files discovered
+            and parsed, throughput, current directory, ETA).
         scanFinished: Emitted when the scan finishes.
+        scanCancelled: Emitted instead of scanFinished when the scan was cancelled.
         scanError: Emitted if an error occurs during the scan.
+        libraryChanged: Emitted when songs outside of the library roots were
+            deleted by prune_library (ScanSummary: counts).
 
     Attributes:
         songs_repository: Repository for song database operations.
         playlists_repository: Repository for playlist database operations.
         playlist_song_repository: Repository for playlist_song database operations.
         library: Library model
-        library_services: Service for library-related logic.
+        scan_scheduler: Scans the library roots concurrently.
+        connections: Provides the database connections of the worker and scan threads.
+        play_events: Plays and skips recorded by the player, see flush_play_events.
         is_running: A boolean, True if scan is running
+        _cancel_event: Set from the GUI thread to cancel the running scan.
     """
 
     scanStarted = Signal()
-    scanProgress = Signal(int)  # Number of audio files added
+    scanProgress = Signal(dict)  # Rate-limited progress report, see ScanProgressTracker
     scanFinished = Signal(list)  # List of non-critical errors when scanning files
+    scanCancelled = Signal()
     scanError = Signal(str)
+    libraryChanged = Signal(object)
+
+    def __init__(
+        self, connections: ConnectionManager, play_events: PlayEventBuffer | None = None
+    ):
+        """Initializes the BackendWorker.
 
-    def __init__(self):
-        """Initializes the BackendWorker."""
+        Args:
+            connections: Provides the database connections of the worker and scan threads.
+            play_events: Plays and skips recorded by the player.
+        """
         super().__init__()
+        self.connections = connections
+        self.play_events = play_events or PlayEventBuffer()
         self.songs_repository = None
-        self.library_services = None
+        self.scan_scheduler = None
         self.is_running = False
+        self._cancel_event = threading.Event()
 
-    def initialize_services(self, library_path: Path) -> bool:
-        """Initialize services with the given library path.
+    def initialize_services(self, library_roots: list[Path]) -> bool:
+        """Initialize services with the given library roots.
 
         Args:
-            library_path (Path): The path to the music library.
+            library_roots (list[Path]): The directories of the music library.
 
         Returns:
-            bool: True if initialization was successful. False if library_path is invalid
-                or if there was an exception.
+            bool: True if initialization was successful. False if there are no
+                library roots or if there was an exception.
         """
-        if not library_path.is_dir():
-            self.scanError.emit(f"Invalid library path: {library_path}")
+        if not library_roots:
+            self.scanError.emit("No library folder to scan")
             return False
 
         try:
             # Using thread-specific connection (and repository) because sqlite is not thread-safe
-            connection = get_db_connection()
+            connection = self.connections.connection()
             self.songs_repository = SongsRepository(connection)
             self.playlists_repository = PlaylistsRepository(connection)
             self.playlist_song_repository = PlaylistSongRepository(
@@ -71,10 +96,13 @@ class BackendWorker(QObject):
                 self.songs_repository,
                 self.playlists_repository,
                 self.playlist_song_repository,
+                self.play_events,
             )
-            self.library_services = LibraryServices(
-                library_path,
-                self.songs_repository,
+            # Each root is scanned in its own thread, with its own connection
+            self.scan_scheduler = ScanScheduler(
+                self.connections,
+                progress_callback=self.scanProgress.emit,
+                cancel_event=self._cancel_event,
             )
             return True
         except Exception as e:
@@ -82,39 +110,49 @@ class BackendWorker(QObject):
             logger.exception(e, stack_info=True)
             return False
 
-    @Slot(Path)  # type: ignore
-    def scan_library(self, library_path: Path):
-        """Scans the library and populates the database with song information.
+    @Slot(object)  # type: ignore
+    def scan_library(self, library_roots: list[Path]):
+        """Scans the library roots and populates the database with song information.
+
+        Roots are scanned concurrently, see ScanScheduler.
 
         Emits `scanStarted` when the scan begins.
-        Emits 'scanProgress' with number of audio files added.
+        Emits 'scanProgress' a few times per second with a progress report.
         Emits `scanFinished` when the scan is complete, along with a list of
         any non-critical errors encountered.
+        Emits `scanCancelled` instead if cancel_scan was called meanwhile.
         Emits `scanError` if a critical error occurs.
 
+        A scan that did not complete resumes from its checkpoint: files of the
+        directories it completed are not parsed again.
+
         Args:
-            library_path (Path): The path to the music library.
+            library_roots (list[Path]): The directories of the music library.
         """
         if self.is_running:
             logger.warning("Already running a scan operation")
             return
 
         self.is_running = True
+        self._cancel_event.clear()
         self.scanStarted.emit()
 
         try:
-            if not self.initialize_services(library_path):
+            if not self.initialize_services(library_roots):
                 self.is_running = False
                 return
 
-            if not self.library_services:
+            if not self.scan_scheduler:
                 self.scanError.emit("Songs services not initialized")
                 self.is_running = False
                 return
 
             # Execute the scan
-            error_paths = self.library_services.populate_database()
-            self.scanFinished.emit(error_paths)
+            error_paths, _ = self.scan_scheduler.scan(library_roots)
+            if self.scan_scheduler.is_cancelled():
+                self.scanCancelled.emit()
+            else:
+                self.scanFinished.emit(error_paths)
             return
 
         except Exception as e:
@@ -123,3 +161,60 @@ class BackendWorker(QObject):
             return
         finally:
             self.is_running = False
+
+    @Slot(object)  # type: ignore
+    def prune_library(self, library_roots: list[Path]):
+        """Deletes the songs outside of the library roots, e.g. of a removed folder.
+
+        Their playlist entries and play history are deleted as well, see
+        ScanScheduler.prune_outside. Nothing is done while a scan runs.
+
+        Emits `libraryChanged` with the deleted songs.
+        Emits `scanError` if the songs could not be deleted.
+
+        Args:
+            library_roots (list[Path]): The directories of the music library.
+        """
+        if self.is_running:
+            logger.warning("Already running a scan operation")
+            return
+
+        self.is_running = True
+        try:
+            pruned = ScanScheduler(self.connections).prune_outside(library_roots)
+        except Exception as e:
+            self.scanError.emit(f"Error pruning library: {e}")
+            logger.exception("Failed to prune the library")
+            return
+        finally:
+            self.is_running = False
+
+        logger.info(f"Pruned {len(pruned)} songs outside of the library folders")
+        self.libraryChanged.emit(ScanSummary(removed=len(pruned), pruned=pruned))
+
+    @Slot()
+    def flush_play_events(self):
+        """Logs the buffered plays and skips, then rolls them up into the songs.
+
+        Runs periodically in the worker thread, through the writer connection,
+        so the player never waits for these commits. Events that could not be
+        written stay buffered for the next flush.
+        """
+        try:
+            with self.connections.writer() as connection:
+                repository = PlayEventsRepository(connection)
+                self.play_events.flush(repository)
+                repository.rollup()
+        except Exception:
+            logger.exception("Failed to write play events")
+
+    def cancel_scan(self):
+        """Cancels the running scan, if any.
+
+        Meant to be called directly from another thread: a queued slot would only
+        run after the scan, since the scan blocks the worker thread event loop.
+        Files parsed so far are committed along with the scan checkpoint.
+        """
+        if self.is_running:
+            logger.info("Cancelling library scan")
+            self._cancel_event.set()
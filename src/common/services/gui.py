@@ -37,7 +37,9 @@ class GuiServices:
         self.directory_handler = DirectoryHandler(self.backend)
 
         self.backend.scanFinished.connect(self._on_scan_finished)
+        self.backend.scanCancelled.connect(self._on_scan_cancelled)
         self.backend.scanError.connect(self._on_scan_error)
+        self.backend.libraryChanged.connect(self._on_library_changed)
 
         QQuickStyle.setStyle(settings.qt_style)
         self._setup_context_properties()
@@ -64,11 +66,20 @@ class GuiServices:
             logger.error(f"Failed to scan: {path} - {error}")
         self.backend.get_library().loadAllSongs()
 
+    def _on_scan_cancelled(self):
+        """Handles the scanCancelled signal from the backend."""
+        logger.info("Library scan cancelled, refreshing database")
+        self.backend.get_library().loadAllSongs()
+
     def _on_scan_error(self):
         """Handles the scanError signal from the backend."""
         logger.info("Library scan suspended, refreshing database")
         self.backend.get_library().loadAllSongs()
 
+    def _on_library_changed(self):
+        """Handles the libraryChanged signal from the backend."""
+        self.backend.get_library().loadAllSongs()
+
     def run(self):
         """Loads the QML file, starts the event loop, and handles exit."""
         self.engine.load(Path(SRC_PATH) / "Main.qml")
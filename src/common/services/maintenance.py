@@ -0,0 +1,214 @@
+# src.common.services.maintenance
+import logging
+import time
+from collections.abc import Callable
+from typing import ClassVar
+
+from PySide6.QtCore import QObject, QTimer, Slot
+
+from src.common.database import ConnectionManager
+from src.common.repository import MaintenanceRunsRepository
+from src.common.schemas import MaintenanceRun
+from src.common.utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Rows sampled per index by ANALYZE, keeps it fast whatever the library size
+ANALYSIS_LIMIT = 1000
+
+
+class MaintenanceService(QObject):
+    """Keeps the database fast and compact with periodic maintenance tasks.
+
+    - checkpoint: copies the WAL into the database file (PASSIVE, it never
+      waits for readers or writers), so that the WAL does not keep growing.
+    - optimize: refreshes the statistics of the query planner (ANALYZE the
+      first time, PRAGMA optimize afterwards) as the library grows.
+    - incremental_vacuum: gives the pages freed by prunes back to the file
+      system, a few pages per transaction.
+    - quick_check: checks the database file for corruption, on a read-only
+      connection so that it does not hold back writes.
+
+    Every `interval` seconds, the tasks that are due run one after the other
+    within a time budget. Tasks are skipped while `is_busy` returns True (e.g.
+    during a scan). The incremental vacuum stops when the budget runs out and
+    resumes at the next check. The last run of each task is recorded in the
+    maintenance_runs table, so schedules survive restarts.
+
+    Lives in the backend worker thread: writes go through the writer
+    connection and never run on the GUI connection.
+
+    Attributes:
+        intervals: Seconds between two runs of each task, in order of execution.
+        _connections: Provides the writer and read-only connections.
+        _interval: Seconds between two checks for due tasks.
+        _time_budget: Seconds of maintenance per check.
+        _vacuum_pages: Pages freed per incremental vacuum transaction.
+        _is_busy: Returns True when maintenance should wait.
+        _get_time: Returns the current time (UNIX time).
+        _timer: Check timer, created in the worker thread by start.
+    """
+
+    intervals: ClassVar[dict[str, float]] = {
+        "checkpoint": 5 * 60,
+        "optimize": 60 * 60,
+        "incremental_vacuum": 60 * 60,
+        "quick_check": 24 * 60 * 60,
+    }
+
+    def __init__(
+        self,
+        connections: ConnectionManager,
+        interval: float | None = None,
+        time_budget: float | None = None,
+        vacuum_pages: int | None = None,
+        is_busy: Callable[[], bool] | None = None,
+        get_time: Callable[[], float] = time.time,
+    ):
+        """Initializes the MaintenanceService.
+
+        Args:
+            connections: Provides the writer and read-only connections.
+            interval: Seconds between two checks for due tasks.
+                Defaults to settings.maintenance_interval.
+            time_budget: Seconds of maintenance per check.
+                Defaults to settings.maintenance_time_budget.
+            vacuum_pages: Pages freed per incremental vacuum transaction.
+                Defaults to settings.maintenance_vacuum_pages.
+            is_busy: Returns True when maintenance should wait, e.g. during a scan.
+            get_time: Returns the current time (UNIX time).
+        """
+        super().__init__()
+        self._connections = connections
+        self._interval = settings.maintenance_interval if interval is None else interval
+        self._time_budget = (
+            settings.maintenance_time_budget if time_budget is None else time_budget
+        )
+        self._vacuum_pages = vacuum_pages or settings.maintenance_vacuum_pages
+        self._is_busy = is_busy or (lambda: False)
+        self._get_time = get_time
+        self._timer: QTimer | None = None
+
+    @Slot()
+    def start(self):
+        """Starts checking for due tasks periodically, from the current thread."""
+        if self._timer is None:
+            self._timer = QTimer(self)
+            self._timer.timeout.connect(self.run_due)
+        self._timer.start(int(self._interval * 1000))
+        logger.info(f"Database maintenance checked every {self._interval}s")
+
+    @Slot()
+    def stop(self):
+        """Stops checking for due tasks."""
+        if self._timer is not None:
+            self._timer.stop()
+
+    def due_tasks(self) -> list[str]:
+        """Returns the tasks whose interval went by since their last run."""
+        with self._connections.reader() as connection:
+            last_runs = MaintenanceRunsRepository(connection).last_runs()
+        now = self._get_time()
+        due = []
+        for task, interval in self.intervals.items():
+            run = last_runs.get(task)
+            if run is None or not run.complete or now - run.started_at >= interval:
+                due.append(task)
+        return due
+
+    @Slot()
+    def run_due(self) -> list[MaintenanceRun]:
+        """Runs the due tasks until the time budget runs out.
+
+        Returns:
+            The runs of the tasks that ran.
+        """
+        if self._is_busy():
+            logger.debug("Database maintenance postponed, the backend is busy")
+            return []
+        deadline = time.monotonic() + self._time_budget
+        runs = []
+        try:
+            for task in self.due_tasks():
+                if time.monotonic() >= deadline:
+                    break
+                runs.append(self.run_task(task, deadline))
+        except Exception:
+            logger.exception("Database maintenance failed")
+        return runs
+
+    def run_task(self, task: str, deadline: float | None = None) -> MaintenanceRun:
+        """Runs a task and records its run.
+
+        Args:
+            task: One of intervals.
+            deadline: time.monotonic() value after which incremental tasks stop.
+                Defaults to the time budget from now.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self._time_budget
+        started_at = self._get_time()
+        start = time.perf_counter()
+        complete, result = getattr(self, f"_{task}")(deadline)
+        run = MaintenanceRun(
+            task=task,
+            started_at=started_at,
+            duration=time.perf_counter() - start,
+            complete=complete,
+            result=result,
+        )
+        with self._connections.writer() as connection:
+            MaintenanceRunsRepository(connection).record(run)
+        logger.info(f"Database maintenance {task} took {run.duration:.3f}s: {result}")
+        return run
+
+    def _checkpoint(self, deadline: float) -> tuple[bool, str]:
+        with self._connections.writer() as connection:
+            busy, log_pages, checkpointed = connection.execute(
+                "PRAGMA wal_checkpoint(PASSIVE)"
+            ).fetchone()
+        if log_pages == -1:
+            return True, "not in WAL mode"
+        return True, f"{checkpointed} of {log_pages} WAL pages checkpointed" + (
+            " (busy)" if busy else ""
+        )
+
+    def _optimize(self, deadline: float) -> tuple[bool, str]:
+        with self._connections.writer() as connection:
+            connection.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+            analyzed = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            ).fetchone()
+            if analyzed is None:
+                connection.execute("ANALYZE")
+                return True, "analyzed"
+            connection.execute("PRAGMA optimize")
+        return True, "optimized"
+
+    def _incremental_vacuum(self, deadline: float) -> tuple[bool, str]:
+        with self._connections.reader() as connection:
+            auto_vacuum = connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if auto_vacuum != 2:
+            return True, "auto_vacuum is not incremental"
+        freed = 0
+        while True:
+            # One transaction per step, so that other writes are not held back
+            with self._connections.writer() as connection:
+                free_pages = connection.execute("PRAGMA freelist_count").fetchone()[0]
+                if free_pages == 0:
+                    return True, f"{freed} pages freed"
+                if time.monotonic() >= deadline:
+                    return False, f"{freed} pages freed, {free_pages} left"
+                connection.execute(
+                    f"PRAGMA incremental_vacuum({self._vacuum_pages})"
+                ).fetchall()
+                freed += min(free_pages, self._vacuum_pages)
+
+    def _quick_check(self, deadline: float) -> tuple[bool, str]:
+        with self._connections.reader() as connection:
+            rows = connection.execute("PRAGMA quick_check").fetchall()
+        errors = [row[0] for row in rows if row[0] != "ok"]
+        if errors:
+            logger.error(f"Database quick check failed: {errors}")
+            return True, "; ".join(errors[:10])
+        return True, "ok"
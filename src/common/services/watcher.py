@@ -0,0 +1,246 @@
+# src.common.services.watcher
+import logging
+import os
+import time
+from pathlib import Path
+
+from PySide6.QtCore import QFileSystemWatcher, QObject, QTimer, Signal, Slot
+
+from src.common.database import ConnectionManager
+from src.common.utils.settings import settings
+from src.features.library.repository import SongsRepository
+from src.features.library.schemas import ScanSummary
+from src.features.library.services.library import LibraryServices
+from src.features.library.utils.walker import LibraryWalker
+
+logger = logging.getLogger(__name__)
+
+
+class LibraryWatcher(QObject):
+    """Keeps the songs table in sync with the library directories.
+
+    Every directory of the library is watched with a QFileSystemWatcher, which
+    relies on inotify on Linux. Change notifications are coalesced per directory
+    and debounced: a directory is synced once no event came in for `delay`
+    seconds, or at the latest `max_delay` seconds after its first event, so that
+    copying an album results in a single update.
+
+    Syncing a directory only looks at its direct children: new and modified
+    files are parsed, missing ones are deleted, new subdirectories are watched
+    and scanned entirely, and removed subdirectories have their songs deleted.
+    Files moved within a library root keep their song, see LibraryServices.
+
+    Note that files rewritten in place (without a rename) do not trigger any
+    directory notification, they are picked up by the next library scan.
+
+    Lives in the backend worker thread, it uses the connection of that thread.
+
+    Signals:
+        libraryChanged: Emitted after changes were applied (ScanSummary: counts).
+
+    Attributes:
+        _connections: Provides the connection of the worker thread.
+        _watcher: The file system watcher.
+        _timer: Debounce timer.
+        _pending: Directories with unprocessed notifications, and the time of
+            their first notification.
+        _repository: The songs repository, created in the worker thread.
+        _walkers: Walker of each watched library root, used for their exclusion
+            patterns.
+    """
+
+    libraryChanged = Signal(object)
+
+    def __init__(
+        self,
+        connections: ConnectionManager,
+        delay: float | None = None,
+        max_delay: float | None = None,
+    ):
+        """Initializes the LibraryWatcher.
+
+        Args:
+            connections: Provides the connection of the worker thread.
+            delay: Seconds without events before a directory is synced.
+                Defaults to settings.library_watch_delay.
+            max_delay: Maximum seconds between the first event and the sync.
+                Defaults to settings.library_watch_max_delay.
+        """
+        super().__init__()
+        self._connections = connections
+        self._delay = settings.library_watch_delay if delay is None else delay
+        self._max_delay = (
+            settings.library_watch_max_delay if max_delay is None else max_delay
+        )
+        self._watcher: QFileSystemWatcher | None = None
+        self._timer: QTimer | None = None
+        self._pending: dict[str, float] = {}
+        self._repository: SongsRepository | None = None
+        self._walkers: dict[Path, LibraryWalker] = {}
+
+    def _setup(self):
+        """Creates Qt objects and the connection in the current (worker) thread."""
+        if self._watcher is not None:
+            return
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._process_pending)
+        self._repository = SongsRepository(self._connections.connection())
+
+    @Slot(object)  # type: ignore
+    def watch(self, library_roots: list[Path]):
+        """Starts watching every directory of the library roots.
+
+        Can be called again (e.g. after a scan) to pick up new directories.
+
+        Args:
+            library_roots: The directories of the music library.
+        """
+        self._setup()
+        assert self._watcher is not None
+
+        if set(self._walkers) != set(library_roots):
+            self.stop()
+
+        for root in library_roots:
+            walker = LibraryWalker(root, exclude=settings.library_exclude)
+            self._walkers[root] = walker
+            self._add_directories(list(walker.iter_directories()))
+        logger.info(
+            f"Watching {len(self._watcher.directories())} directories "
+            f"of {len(library_roots)} library roots"
+        )
+
+    @Slot()
+    def stop(self):
+        """Stops watching the library."""
+        if self._watcher is not None and self._watcher.directories():
+            self._watcher.removePaths(self._watcher.directories())
+        if self._timer is not None:
+            self._timer.stop()
+        self._pending.clear()
+        self._walkers = {}
+
+    def _add_directories(self, directories: list[str]):
+        assert self._watcher is not None
+        watched = set(self._watcher.directories())
+        new_directories = [d for d in directories if d not in watched]
+        if not new_directories:
+            return
+        failed = self._watcher.addPaths(new_directories)
+        if failed:
+            logger.warning(
+                f"Could not watch {len(failed)} directories, the inotify watch limit "
+                "(fs.inotify.max_user_watches) may be too low"
+            )
+
+    @Slot(str)  # type: ignore
+    def _on_directory_changed(self, directory: str):
+        """Records a notification and (re)starts the debounce timer."""
+        assert self._timer is not None
+        now = time.monotonic()
+        self._pending.setdefault(directory, now)
+
+        # Restarting the timer postpones the sync, unless it waited long enough
+        oldest_event = min(self._pending.values())
+        remaining = max(0.0, self._max_delay - (now - oldest_event))
+        self._timer.start(int(min(self._delay, remaining) * 1000))
+
+    @Slot()
+    def _process_pending(self):
+        """Syncs every directory that received notifications."""
+        pending = sorted(self._pending)
+        self._pending.clear()
+
+        summary = ScanSummary()
+        # New files are handled before vanished ones are pruned, so that files
+        # moved between two directories keep their song
+        for prune in (False, True):
+            for directory in pending:
+                try:
+                    summary.merge(self._sync_directory(Path(directory), prune))
+                except Exception:
+                    logger.exception(f"Failed to sync {directory}")
+
+        if summary.added or summary.updated or summary.moved or summary.removed:
+            logger.info(
+                f"Library changes applied: {summary.added} added, "
+                f"{summary.updated} updated, {summary.moved} moved, "
+                f"{summary.removed} removed"
+            )
+            self.libraryChanged.emit(summary)
+
+    def _sync_directory(self, directory: Path, prune: bool) -> ScanSummary:
+        """Applies the changes of a single directory to the songs table.
+
+        Args:
+            directory: The directory that received notifications.
+            prune: If True, songs whose file is missing are deleted. Otherwise
+                only new and modified files are handled.
+        """
+        assert self._repository is not None and self._watcher is not None
+        root, root_walker = next(
+            (
+                (root, walker)
+                for root, walker in self._walkers.items()
+                if directory.is_relative_to(root)
+            ),
+            (None, None),
+        )
+        if root is None or root_walker is None:
+            return ScanSummary()
+
+        if not directory.is_dir():
+            if not prune:
+                return ScanSummary()
+            # Removed or moved away, along with its subdirectories
+            known_files = self._repository.get_file_index(directory)
+            with self._connections.writer() as connection:
+                pruned = SongsRepository(connection).delete_songs(
+                    known.id for known in known_files.values()
+                )
+            return ScanSummary(removed=len(pruned), pruned=pruned)
+
+        # Direct children only, the directory and its files are already known.
+        # Exclusion patterns stay relative to the library root
+        services = LibraryServices(
+            directory,
+            self._repository,
+            recursive=False,
+            move_scope=root,
+            write_connection=self._connections.writer,
+            exclusion_root=root,
+        )
+        error_paths = services.populate_database(incremental=True, prune=prune)
+        for path, error in error_paths:
+            logger.error(f"Failed to scan: {path} - {error}")
+        summary = services.get_summary()
+
+        # New subdirectories are watched and scanned entirely
+        watched = set(self._watcher.directories())
+        with os.scandir(directory) as entries:
+            new_subdirectories = [
+                Path(entry.path)
+                for entry in entries
+                if entry.is_dir()
+                and entry.path not in watched
+                and not root_walker.is_excluded(entry.path)
+            ]
+        for subdirectory in new_subdirectories:
+            subdirectory_walker = LibraryWalker(
+                subdirectory, exclude=settings.library_exclude, exclusion_root=root
+            )
+            self._add_directories(list(subdirectory_walker.iter_directories()))
+            services = LibraryServices(
+                subdirectory,
+                self._repository,
+                move_scope=root,
+                write_connection=self._connections.writer,
+                exclusion_root=root,
+            )
+            services.populate_database(incremental=True, prune=prune)
+            summary.merge(services.get_summary())
+
+        return summary
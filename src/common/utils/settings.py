@@ -1,5 +1,6 @@
 # src.common.utils.settings
 import logging
+from typing import Literal
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -12,6 +13,35 @@ class Settings(BaseSettings):
     qt_style: str = Field("Basic", alias="application_theme")
     database_filename: str = Field("pworks.db")
     database_echo: bool = Field(False)
+    database_profile: bool = Field(False)
+    database_profile_limit: int = Field(20, gt=0)
+    database_promoted_columns: bool = Field(True)
+    database_journal_mode: Literal[
+        "delete", "truncate", "persist", "memory", "wal", "off"
+    ] = Field("wal")
+    database_synchronous: Literal["off", "normal", "full", "extra"] = Field("normal")
+    database_mmap_size: int = Field(256 * 1024 * 1024, ge=0)
+    database_cache_size: int = Field(-64 * 1024)
+    database_temp_store: Literal["default", "file", "memory"] = Field("memory")
+    database_busy_timeout: float = Field(5.0, ge=0)
+    database_read_pool_size: int = Field(4, gt=0)
+    scan_flush_size: int = Field(500, gt=0)
+    scan_flush_interval: float = Field(2.0, ge=0)
+    scan_executor: Literal["serial", "thread", "process"] = Field("thread")
+    scan_workers: int | None = Field(None, gt=0)
+    scan_batch_size: int = Field(32, gt=0)
+    scan_progress_interval: float = Field(0.25, ge=0)
+    scan_max_roots: int | None = Field(None, gt=0)
+    scan_max_per_device: int = Field(1, gt=0)
+    library_exclude: list[str] = Field(default_factory=list)
+    library_watch: bool = Field(True)
+    library_watch_delay: float = Field(1.5, ge=0)
+    library_watch_max_delay: float = Field(10.0, ge=0)
+    play_events_flush_interval: float = Field(30.0, gt=0)
+    maintenance_enabled: bool = Field(True)
+    maintenance_interval: float = Field(60.0, gt=0)
+    maintenance_time_budget: float = Field(2.0, gt=0)
+    maintenance_vacuum_pages: int = Field(256, gt=0)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -19,6 +49,18 @@ class Settings(BaseSettings):
         logger.debug(f"Log Level: {self.log_level}")
         logger.debug(f"Application Theme: {self.qt_style}")
         logger.debug(f"Database File: {self.database_filename}")
+        logger.debug(
+            f"Database Profile: journal_mode={self.database_journal_mode}, "
+            f"synchronous={self.database_synchronous}, "
+            f"mmap_size={self.database_mmap_size}, "
+            f"cache_size={self.database_cache_size}, "
+            f"temp_store={self.database_temp_store}, "
+            f"busy_timeout={self.database_busy_timeout}s"
+        )
+        logger.debug(
+            f"Scan Flush: {self.scan_flush_size} songs / {self.scan_flush_interval}s"
+        )
+        logger.debug(f"Scan Executor: {self.scan_executor} ({self.scan_workers})")
         logger.debug("#" * 10)
 
 
@@ -13,7 +13,7 @@ from PySide6.QtCore import (
     Slot,
 )
 
-from src.features.library.repository import Song, SongsRepository
+from src.features.library.repository import PlayEventBuffer, Song, SongsRepository
 from src.features.library.schemas import Playlist, PlaylistSong
 from src.features.playlists.repository import (
     PlaylistSongRepository,
@@ -660,11 +660,14 @@ class MusicLibrary(QObject):
         songs_repository: SongsRepository,
         playlists_repository: PlaylistsRepository,
         playlist_song_repository: PlaylistSongRepository,
+        play_events: PlayEventBuffer,
     ):
         super().__init__()
         self._song_repository = songs_repository
         self._playlists_repository = playlists_repository
         self._playlist_song_repository = playlist_song_repository
+        # Plays are buffered, the owner of the buffer writes them in the background
+        self._play_events = play_events
 
         # Initialize models
         self._playlist_model = PlaylistModel(playlists_repository)
@@ -855,7 +858,11 @@ class MusicLibrary(QObject):
 
     @Slot(int)  # type: ignore
     def incrementPlayCount(self, song_id: int):
-        self._song_repository.update_song_playcount(song_id)
+        self._play_events.record(song_id, "play")
+
+    @Slot(int)  # type: ignore
+    def incrementSkipCount(self, song_id: int):
+        self._play_events.record(song_id, "skip")
 
     @Slot(QModelIndex)  # type: ignore
     def clearSelection(self, index: QModelIndex):
@@ -878,3 +885,10 @@ class MusicLibrary(QObject):
         if index.isValid():
             return self._current_song_model.data(index, Qt.UserRole + 4)  # type: ignore
         return None
+
+    def getCurrentSongId(self) -> int | None:
+        index = self._current_selection_model.currentIndex()
+        if index.isValid():
+            song_id = self._current_song_model.data(index, Qt.UserRole + 5)  # type: ignore
+            return int(song_id) if song_id not in (None, "None") else None
+        return None
@@ -1,22 +1,97 @@
 # src.features.library.repository
 import logging
+import os
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import AbstractContextManager, nullcontext
+from pathlib import Path
+from typing import Literal, NamedTuple, Self
 
+from src.common.database import (
+    FINGERPRINT_EXPRESSION,
+    PROMOTED_COLUMNS,
+    SIGNATURE_EXPRESSION,
+    get_promoted_columns,
+    has_full_text_index,
+    has_tag_index,
+    play_history_rollups,
+)
 from src.common.repository import DatabaseRepository
-from src.features.library.schemas import Song
+from src.features.library.schemas import (
+    DuplicateCluster,
+    LibraryRoot,
+    PlayEvent,
+    ScanCheckpoint,
+    Song,
+)
 from src.features.library.services.query import QueryLexer, QueryParser, SQLGenerator
 
 logger = logging.getLogger(__name__)
 
+# Provides a connection for a write transaction, e.g. ConnectionManager.writer
+WriteConnection = Callable[[], AbstractContextManager[sqlite3.Connection]]
+
+
+class FileIndexEntry(NamedTuple):
+    """What scans need to know about a song file, see SongsRepository.get_file_index."""
+
+    id: int
+    size: int
+    mtime: float
+    fingerprint: str | None
+
 
 class SongsRepository(DatabaseRepository):
     """
     Repository for performing database queries on songs.
     """
 
+    _UPDATE_FILE_QUERY = """
+        UPDATE songs
+        SET path = ?, fileprops = json_set(fileprops, '$.mtime', ?, '$.fingerprint', ?)
+        WHERE id = ?
+    """
+
     def __init__(self, connection: sqlite3.Connection):
         super().__init__(connection, Song, "songs")
+        self.promoted_columns = get_promoted_columns(connection)
+        self.full_text = has_full_text_index(connection)
+        self.tag_index = has_tag_index(connection)
+        # Current time of the play history query fields, e.g. plays_month
+        self.get_time: Callable[[], float] = time.time
+        # Album order, walking idx_songs_album when the columns are promoted
+        self.default_sort = [
+            (
+                column
+                if column in self.promoted_columns
+                else PROMOTED_COLUMNS[column][1],
+                "ASC",
+            )
+            for column in ("album", "disc_number", "track_number")
+        ] + [("id", "ASC")]
+
+    def _search_query(self, query: str) -> tuple[str, tuple]:
+        """Parses a search query into SQL, see search_songs."""
+        # Parse the query into an expression tree
+        lexer = QueryLexer(query)
+        parser = QueryParser(lexer)
+        expression = parser.parse()
+
+        # Generate SQL from the expression tree
+        sql_generator = SQLGenerator(
+            self.promoted_columns,
+            full_text=self.full_text,
+            tag_index=self.tag_index,
+            get_time=self.get_time,
+        )
+        where_clause, params = sql_generator.generate(expression)
+
+        sql = f"SELECT {self.select_columns} FROM songs WHERE {where_clause}"
+        logger.debug(f"sql: {sql}")
+        logger.debug(f"params: {params}")
+        return sql, tuple(params)
 
     def search_songs(self, query: str) -> list[Song]:
         """
@@ -27,35 +102,652 @@ class SongsRepository(DatabaseRepository):
             return self.find_many()
 
         try:
-            # Parse the query into an expression tree
-            lexer = QueryLexer(query)
-            parser = QueryParser(lexer)
-            expression = parser.parse()
-
-            # Generate SQL from the expression tree
-            sql_generator = SQLGenerator()
-            where_clause, params = sql_generator.generate(expression)
-
-            # Execute the query
-            sql = f"SELECT * FROM songs WHERE {where_clause}"
-            logger.debug(f"sql: {sql}")
-            logger.debug(f"params: {params}")
-            rows = self._execute_select_query(sql, tuple(params))
+            sql, params = self._search_query(query)
+            rows = self._execute_select_query(sql, params)
             logger.debug(f"rows empty: {rows == []}")
-            return [self._row_to_model(row) for row in rows] if rows else []  # type: ignore
+            return self._rows_to_models(rows)  # type: ignore
         except sqlite3.Error:
             logger.exception("Query parsing error", stack_info=True)
             # On error, return all songs (or could return empty list)
             return self.find_many()
 
-    def update_song_playcount(self, song_id):
-        """Update a song's play count and last played timestamp."""
-        self.conn.execute(
+    def iter_search(self, query: str, batch_size: int = 500) -> Iterator[Song]:
+        """
+        Yield the songs matching a search query, reading batch_size rows at a time.
+        Unlike search_songs, memory use does not grow with the number of songs.
+        Errors are raised instead of falling back to every song.
+        """
+        if not query or query.strip() == "":
+            return self.iter_many(batch_size=batch_size)
+        sql, params = self._search_query(query)
+        return self._iter_models(sql, params, batch_size)
+
+    def get_file_index(
+        self, root: Path | str | None = None
+    ) -> dict[str, FileIndexEntry]:
+        """
+        Map the path of every known song to its id, size, mtime and fingerprint.
+        Used by scans to detect new or changed files without re-reading them.
+        When a root is given, only songs under that directory are returned.
+        """
+        query = """
+            SELECT
+                id,
+                path,
+                json_extract(fileprops, '$.size') AS size,
+                json_extract(fileprops, '$.mtime') AS mtime,
+                json_extract(fileprops, '$.fingerprint') AS fingerprint
+            FROM songs
+        """
+        params: tuple = ()
+        if root is not None:
+            # Range over the path index instead of a LIKE scan
+            prefix = os.path.join(Path(root).absolute(), "")
+            upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            query += " WHERE path >= ? AND path < ?"
+            params = (prefix, upper_bound)
+
+        rows = self._execute_select_query(query, params)
+        return (
+            {
+                row["path"]: FileIndexEntry(  # type: ignore
+                    row["id"], row["size"], row["mtime"], row["fingerprint"]
+                )
+                for row in rows  # type: ignore
+            }
+            if rows
+            else {}
+        )
+
+    def find_songs_by_size(self, size: int) -> list[tuple[int, str, str | None]]:
+        """
+        Return the (id, path, fingerprint) of the songs whose file has the given size.
+        Used to look for the previous location of a file that looks new, the size
+        index making this cheap enough to be done for every new file.
+        """
+        rows = self._execute_select_query(
+            """
+            SELECT id, path, json_extract(fileprops, '$.fingerprint') AS fingerprint
+            FROM songs
+            WHERE json_extract(fileprops, '$.size') = ?
+            """,
+            (size,),
+        )
+        return (
+            [(row["id"], row["path"], row["fingerprint"]) for row in rows]  # type: ignore
+            if rows
+            else []
+        )
+
+    def find_duplicate_clusters(
+        self,
+        by: Literal["fingerprint", "signature"] = "fingerprint",
+        min_size: int = 2,
+        limit: int | None = None,
+    ) -> list[DuplicateCluster]:
+        """
+        Return groups of songs that are likely the same track, largest first.
+        By fingerprint, the files have the same content (see get_fingerprint).
+        By signature, they have the same first artist and title (case-insensitive)
+        and the same length to the second, e.g. rips of a track in two formats.
+        Songs missing one of these are ignored.
+        The grouping walks the matching expression index, so only the clusters
+        are held in memory, never the songs themselves.
+        """
+        expression = (
+            FINGERPRINT_EXPRESSION if by == "fingerprint" else SIGNATURE_EXPRESSION
+        )
+        query = f"""
+            SELECT {expression} AS key, count(*) AS size, group_concat(id) AS ids
+            FROM songs
+            WHERE {expression} IS NOT NULL
+            GROUP BY {expression}
+            HAVING count(*) >= ?
+            ORDER BY size DESC, key
+        """
+        params: tuple = (max(min_size, 2),)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+
+        rows = self._execute_select_query(query, params)
+        return (
+            [
+                DuplicateCluster(
+                    key=row["key"],
+                    song_ids=[int(song_id) for song_id in row["ids"].split(",")],
+                )
+                for row in rows  # type: ignore
+            ]
+            if rows
+            else []
+        )
+
+    def upsert_songs(self, songs: Iterable[Song], chunk_size: int | None = None) -> int:
+        """
+        Insert songs, or refresh the file properties and tags of the songs with
+        the same path. Application data of existing songs is left untouched.
+        """
+        return self.upsert_many(songs, ("path",), ("app_data",), chunk_size)
+
+    def write_batch(
+        self,
+        inserts: list[Song],
+        updates: list[tuple[int, Song]],
+        before_commit: Callable[[], None] | None = None,
+        file_updates: list[tuple[int, str, float, str]] | None = None,
+    ) -> None:
+        """
+        Insert new songs and refresh changed ones in a single transaction.
+        New and changed songs are written by one upsert statement on their path,
+        which keeps the app_data (play count, rating...) of existing songs, even
+        of a song another connection inserted meanwhile.
+        `file_updates` are (id, path, mtime, fingerprint) tuples of songs whose
+        file moved or was merely fingerprinted: tags and app_data are kept.
+        `before_commit` runs inside the transaction, after the songs are written,
+        so that its own statements are committed (or rolled back) along with them.
+        """
+        songs = inserts + [song for _, song in updates]
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                if songs:
+                    rows = [self._model_to_row(song) for song in songs]
+                    cursor.executemany(
+                        self._upsert_query(list(rows[0]), ("path",), ("app_data",)),
+                        [tuple(row.values()) for row in rows],
+                    )
+                if file_updates:
+                    cursor.executemany(
+                        self._UPDATE_FILE_QUERY,
+                        [
+                            (path, mtime, fingerprint, song_id)
+                            for song_id, path, mtime, fingerprint in file_updates
+                        ],
+                    )
+                if before_commit is not None:
+                    before_commit()
+        except sqlite3.Error:
+            self.logger.exception("Failed to write song batch", stack_info=True)
+            raise
+
+    def delete_songs(self, song_ids: Iterable[int]) -> list[str]:
+        """
+        Delete songs along with their playlist entries and play events, in a
+        single transaction.
+        The IDs are loaded into a temporary table so that each table is pruned
+        with one set-based statement, whatever the number of songs.
+        Returns the paths of the deleted songs.
+        """
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                cursor.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS pruned_song_ids (id INTEGER PRIMARY KEY)"
+                )
+                cursor.execute("DELETE FROM temp.pruned_song_ids")
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO temp.pruned_song_ids (id) VALUES (?)",
+                    ((song_id,) for song_id in song_ids),
+                )
+                cursor.execute(
+                    """
+                    DELETE FROM playlist_songs
+                    WHERE song_id IN (SELECT id FROM temp.pruned_song_ids)
+                    """
+                )
+                for table in ("play_events", "song_plays_daily", "song_plays_weekly"):
+                    cursor.execute(
+                        f"""
+                        DELETE FROM {table}
+                        WHERE song_id IN (SELECT id FROM temp.pruned_song_ids)
+                        """
+                    )
+                cursor.execute(
+                    """
+                    DELETE FROM songs
+                    WHERE id IN (SELECT id FROM temp.pruned_song_ids)
+                    RETURNING path
+                    """
+                )
+                deleted_paths = [row[0] for row in cursor.fetchall()]
+                cursor.execute("DELETE FROM temp.pruned_song_ids")
+        except sqlite3.Error:
+            self.logger.exception("Failed to delete songs", stack_info=True)
+            raise
+        return deleted_paths
+
+    def find_songs_outside(self, roots: Iterable[Path | str]) -> list[int]:
+        """
+        Return the IDs of songs that are not under any of the given directories,
+        e.g. songs of a directory removed from the library.
+        """
+        conditions = []
+        params: list[str] = []
+        for root in roots:
+            prefix = os.path.join(Path(root).absolute(), "")
+            conditions.append("(path >= ? AND path < ?)")
+            params.extend((prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+
+        query = "SELECT id FROM songs"
+        if conditions:
+            query += f" WHERE NOT ({' OR '.join(conditions)})"
+        rows = self._execute_select_query(query, tuple(params))
+        return [row["id"] for row in rows] if rows else []  # type: ignore
+
+    def bulk_writer(
+        self,
+        flush_size: int = 500,
+        flush_interval: float = 2.0,
+        on_flush: Callable[[sqlite3.Connection], None] | None = None,
+        write_connection: WriteConnection | None = None,
+    ) -> "SongsBulkWriter":
+        """Returns a buffered writer for ingesting many songs, see SongsBulkWriter."""
+        return SongsBulkWriter(
+            self,
+            flush_size,
+            flush_interval,
+            on_flush=on_flush,
+            write_connection=write_connection,
+        )
+
+    def set_rating(self, song_id: int, rating: float | None) -> bool:
+        """Set the rating of a song (None to clear it), without rewriting its other data."""
+        if rating is not None and not 0 <= rating <= 5:
+            raise ValueError(f"Rating out of range [0, 5]: {rating}")
+        return self.update_fields(song_id, {"app_data.rating": rating})
+
+    def update_song_playcount(self, song_id: int, timestamp: float | None = None):
+        """
+        Update a song's play count and last played timestamp right away.
+        Plays of the player are recorded as play events instead, see PlayEventBuffer.
+        """
+        self._execute_query(
             """
             UPDATE songs
-            SET app_data = json_set(app_data, '$.play_count', json_extract(app_data, '$.play_count') + 1)
+            SET app_data = json_set(
+                app_data,
+                '$.play_count', coalesce(json_extract(app_data, '$.play_count'), 0) + 1,
+                '$.last_played', ?
+            )
             WHERE id = ?
-        """,
-            (datetime.now(), song_id),
+            """,
+            (time.time() if timestamp is None else timestamp, song_id),
         )
-        self.conn.commit()
+
+
+class SongsBulkWriter:
+    """
+    Buffers scanned songs and writes them in batches.
+    Each flush is a single transaction using executemany, instead of one
+    transaction (and one fsync) per song. A flush happens when `flush_size`
+    songs are buffered or when `flush_interval` seconds went by since the last one.
+    Use as a context manager so remaining songs are flushed on exit.
+    When given, `on_flush` runs within each flush transaction (even one without
+    songs) with its connection, which is how scans commit their checkpoint along
+    with the songs.
+    When given, `write_connection` provides the connection of each flush (e.g.
+    ConnectionManager.writer, which serializes the writers of the application),
+    otherwise the connection of the repository is used.
+    """
+
+    def __init__(
+        self,
+        repository: SongsRepository,
+        flush_size: int = 500,
+        flush_interval: float = 2.0,
+        get_time: Callable[[], float] = time.monotonic,
+        on_flush: Callable[[sqlite3.Connection], None] | None = None,
+        write_connection: WriteConnection | None = None,
+    ):
+        self._repository = repository
+        self._flush_size = max(1, flush_size)
+        self._flush_interval = flush_interval
+        self._get_time = get_time
+        self._on_flush = on_flush
+        self._write_connection = write_connection
+        self._inserts: list[Song] = []
+        self._updates: list[tuple[int, Song]] = []
+        self._file_updates: list[tuple[int, str, float, str]] = []
+        self._last_flush = self._get_time()
+        self.written = 0
+        self.batches = 0
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._inserts) + len(self._updates) + len(self._file_updates)
+
+    def add(self, song: Song) -> None:
+        """Buffer a new song for insertion."""
+        self._inserts.append(song)
+        self.maybe_flush()
+
+    def add_update(self, song_id: int, song: Song) -> None:
+        """Buffer a metadata refresh for an existing song."""
+        self._updates.append((song_id, song))
+        self.maybe_flush()
+
+    def add_file_update(
+        self, song_id: int, path: str, mtime: float, fingerprint: str
+    ) -> None:
+        """Buffer a new location or fingerprint for an existing song, without its tags."""
+        self._file_updates.append((song_id, path, mtime, fingerprint))
+        self.maybe_flush()
+
+    def maybe_flush(self) -> None:
+        """Flush if enough songs are buffered or the flush interval went by."""
+        if (
+            len(self) >= self._flush_size
+            or self._get_time() - self._last_flush >= self._flush_interval
+        ):
+            self.flush()
+
+    def flush(self) -> int:
+        """Write buffered songs in one transaction, returns how many were written."""
+        count = len(self)
+        if count or self._on_flush is not None:
+            self.batches += 1
+            with (
+                nullcontext(self._repository.conn)
+                if self._write_connection is None
+                else self._write_connection()
+            ) as connection:
+                repository = (
+                    self._repository
+                    if connection is self._repository.conn
+                    else SongsRepository(connection)
+                )
+                on_flush = self._on_flush
+                repository.write_batch(
+                    self._inserts,
+                    self._updates,
+                    None if on_flush is None else lambda: on_flush(connection),
+                    self._file_updates,
+                )
+            self._inserts = []
+            self._updates = []
+            self._file_updates = []
+            self.written += count
+            logger.debug(f"Flushed {count} songs to database")
+        self._last_flush = self._get_time()
+        return count
+
+
+class PlayEventsRepository(DatabaseRepository):
+    """
+    Repository for the append-only log of plays and skips.
+    Events are not applied to songs one by one: rollup folds every event logged
+    since the previous rollup into the play_count, skip_count and last_played of
+    the songs with a single set-based UPDATE.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        super().__init__(connection, PlayEvent, "play_events")
+
+    def append(self, events: list[PlayEvent]) -> int:
+        """Log events in a single transaction, returns how many were logged."""
+        if not events:
+            return 0
+        return self.insert_many(events)
+
+    def rollup(self, now: float | None = None) -> int:
+        """
+        Apply the events logged since the last rollup to the app_data of their
+        songs and to the play history tables, in a single transaction. The ID of the last applied event is kept
+        in play_events_rollup, so each event is counted exactly once.
+        Returns the number of updated songs.
+        """
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                last_event_id = cursor.execute(
+                    "SELECT last_event_id FROM play_events_rollup WHERE id = 1"
+                ).fetchone()[0]
+                max_event_id = cursor.execute(
+                    "SELECT coalesce(max(id), 0) FROM play_events"
+                ).fetchone()[0]
+                if max_event_id <= last_event_id:
+                    return 0
+                cursor.execute(
+                    """
+                    UPDATE songs
+                    SET app_data = json_set(
+                        app_data,
+                        '$.play_count', coalesce(json_extract(app_data, '$.play_count'), 0) + e.plays,
+                        '$.skip_count', coalesce(json_extract(app_data, '$.skip_count'), 0) + e.skips,
+                        '$.last_played', CASE
+                            WHEN e.last_played IS NULL THEN json_extract(app_data, '$.last_played')
+                            ELSE max(e.last_played, coalesce(json_extract(app_data, '$.last_played'), 0))
+                        END
+                    )
+                    FROM (
+                        SELECT
+                            song_id,
+                            sum(event = 'play') AS plays,
+                            sum(event = 'skip') AS skips,
+                            max(CASE WHEN event = 'play' THEN timestamp END) AS last_played
+                        FROM play_events
+                        WHERE id > ? AND id <= ?
+                        GROUP BY song_id
+                    ) AS e
+                    WHERE songs.id = e.song_id
+                    """,
+                    (last_event_id, max_event_id),
+                )
+                updated = cursor.rowcount
+                for statement in play_history_rollups():
+                    cursor.execute(statement, (last_event_id, max_event_id))
+                cursor.execute(
+                    """
+                    UPDATE play_events_rollup SET last_event_id = ?, updated_at = ?
+                    WHERE id = 1
+                    """,
+                    (max_event_id, time.time() if now is None else now),
+                )
+        except sqlite3.Error:
+            self.logger.exception("Failed to roll up play events", stack_info=True)
+            raise
+        logger.debug(
+            f"Rolled up play events {last_event_id + 1} to {max_event_id} "
+            f"into {updated} songs"
+        )
+        return updated
+
+
+class PlayEventBuffer:
+    """
+    Buffers plays and skips in memory until they are flushed to play_events.
+    Recording an event does not touch the database, so the player never waits
+    for a commit: flushes run periodically from the worker thread, see
+    BackendWorker.flush_play_events. Thread-safe, events are recorded from the
+    player threads and flushed from the worker thread.
+    """
+
+    def __init__(self, get_time: Callable[[], float] = time.time):
+        self._get_time = get_time
+        self._events: list[PlayEvent] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def record(
+        self,
+        song_id: int,
+        event: Literal["play", "skip"] = "play",
+        timestamp: float | None = None,
+    ) -> None:
+        """Buffer a play or a skip of a song."""
+        play_event = PlayEvent(
+            song_id=song_id,
+            event=event,
+            timestamp=self._get_time() if timestamp is None else timestamp,
+        )
+        with self._lock:
+            self._events.append(play_event)
+
+    def drain(self) -> list[PlayEvent]:
+        """Remove and return the buffered events, oldest first."""
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+    def flush(self, repository: PlayEventsRepository) -> int:
+        """
+        Log the buffered events in one transaction, returns how many were logged.
+        On failure, the events are buffered again for the next flush.
+        """
+        events = self.drain()
+        try:
+            repository.append(events)
+        except sqlite3.Error:
+            with self._lock:
+                self._events[:0] = events
+            raise
+        if events:
+            logger.debug(f"Flushed {len(events)} play events to database")
+        return len(events)
+
+
+class ScanCheckpointsRepository(DatabaseRepository):
+    """
+    Repository for the checkpoints of interrupted library scans.
+    A checkpoint records the directories whose files were all committed, so that
+    a later scan of the same root can skip them instead of starting over.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        super().__init__(connection, ScanCheckpoint, "scan_checkpoints")
+
+    def begin(self, root: Path | str, now: float) -> tuple[ScanCheckpoint, set[str]]:
+        """
+        Return the checkpoint of a scan of `root` along with its completed
+        directories, creating an empty checkpoint if there is none.
+        """
+        root = str(Path(root).absolute())
+        checkpoint = self.find_one({"root": root})
+        if checkpoint is None:
+            checkpoint = ScanCheckpoint(root=root, started_at=now, updated_at=now)
+            checkpoint.id = self.insert(checkpoint)
+            return checkpoint, set()
+
+        rows = self._execute_select_query(
+            "SELECT directory FROM scan_checkpoint_directories WHERE checkpoint_id = ?",
+            (checkpoint.id,),
+        )
+        return checkpoint, {row["directory"] for row in rows} if rows else set()  # type: ignore
+
+    def record_progress(
+        self, checkpoint_id: int, directories: list[str], batch: int, now: float
+    ) -> None:
+        """
+        Add completed directories to a checkpoint and store the last batch number.
+        Does not commit: meant to run within the transaction of the song batch
+        it belongs to, see SongsBulkWriter.
+        """
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO scan_checkpoint_directories (checkpoint_id, directory) VALUES (?, ?)",
+            [(checkpoint_id, directory) for directory in directories],
+        )
+        cursor.execute(
+            "UPDATE scan_checkpoints SET last_batch = ?, updated_at = ? WHERE id = ?",
+            (batch, now, checkpoint_id),
+        )
+
+    def clear(self, root: Path | str) -> None:
+        """Delete the checkpoint of `root`, once its scan completed."""
+        root = str(Path(root).absolute())
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                cursor.execute(
+                    """
+                    DELETE FROM scan_checkpoint_directories WHERE checkpoint_id IN (
+                        SELECT id FROM scan_checkpoints WHERE root = ?
+                    )
+                    """,
+                    (root,),
+                )
+                cursor.execute("DELETE FROM scan_checkpoints WHERE root = ?", (root,))
+        except sqlite3.Error:
+            self.logger.exception("Failed to clear scan checkpoint", stack_info=True)
+            raise
+
+
+class LibraryRootsRepository(DatabaseRepository):
+    """
+    Repository for the directories making up the music library.
+    Roots never overlap: a directory inside a root is not a root itself.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        super().__init__(connection, LibraryRoot, "library_roots")
+
+    def get_roots(self) -> list[Path]:
+        """Return the path of every library root, sorted."""
+        return sorted(Path(root.path) for root in self.find_many())
+
+    def add_root(self, path: Path | str, now: float) -> LibraryRoot:
+        """
+        Add a directory to the library.
+        Roots inside the new directory are replaced by it.
+        Raises ValueError if the directory is already part of a root.
+        """
+        path = Path(path).absolute()
+        for root in self.find_many():
+            root_path = Path(root.path)
+            if path.is_relative_to(root_path):
+                raise ValueError(
+                    f"{path} is already part of the library root {root_path}"
+                )
+
+        root = LibraryRoot(path=str(path), added_date=now)
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                # Nested roots are merged into the new one
+                prefix = os.path.join(path, "")
+                upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+                cursor.execute(
+                    "DELETE FROM library_roots WHERE path >= ? AND path < ?",
+                    (prefix, upper_bound),
+                )
+                cursor.execute(
+                    "INSERT INTO library_roots (path, added_date) VALUES (?, ?)",
+                    (root.path, root.added_date),
+                )
+                root.id = cursor.lastrowid
+        except sqlite3.Error:
+            self.logger.exception("Failed to add library root", stack_info=True)
+            raise
+        return root
+
+    def replace_roots(self, path: Path | str, now: float) -> LibraryRoot:
+        """Make a directory the only library root, its songs are left untouched."""
+        root = LibraryRoot(path=str(Path(path).absolute()), added_date=now)
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                cursor.execute("DELETE FROM library_roots")
+                cursor.execute(
+                    "INSERT INTO library_roots (path, added_date) VALUES (?, ?)",
+                    (root.path, root.added_date),
+                )
+                root.id = cursor.lastrowid
+        except sqlite3.Error:
+            self.logger.exception("Failed to replace library roots", stack_info=True)
+            raise
+        return root
+
+    def remove_root(self, path: Path | str) -> bool:
+        """Remove a directory from the library, its songs are left untouched."""
+        root = self.find_one({"path": str(Path(path).absolute())})
+        if root is None or root.id is None:
+            return False
+        return self.delete(root.id)
@@ -1,8 +1,10 @@
 # src.features.library.schemas
-from typing import Any
-from pydantic import BaseModel, Field, field_validator
+from typing import Any, Literal
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
 from pathlib import Path
 
+from src.common.repository import is_trusted
+
 
 class FileProperties(BaseModel):
     """File properties (not from tags)"""
@@ -13,6 +15,10 @@ class FileProperties(BaseModel):
     channels: int = Field(description="Number of audio channels")
     length: float = Field(description="Song length in seconds")
     mtime: float = Field(description="Last modification time of the file (UNIX time)")
+    fingerprint: str | None = Field(
+        default=None,
+        description="Hash of the size, first and last bytes of the file, see get_fingerprint",
+    )
 
 
 class AppData(BaseModel):
@@ -38,8 +44,10 @@ class Song(BaseModel):
 
     @field_validator("path")
     @classmethod
-    def normalize_path(cls, v: str) -> str:
-        """Ensure path is an absolute path and normalized"""
+    def normalize_path(cls, v: str, info: ValidationInfo) -> str:
+        """Ensure path is an absolute path and normalized (already done for stored songs)"""
+        if is_trusted(info):
+            return v
         return str(Path(v).absolute())
 
     # Helper methods for access
@@ -65,6 +73,74 @@ class Song(BaseModel):
         return ", ".join(values)
 
 
+class ScanSummary(BaseModel):
+    """Outcome of a library scan"""
+
+    added: int = Field(default=0, description="Files inserted as new songs")
+    updated: int = Field(default=0, description="Known files re-parsed after a change")
+    unchanged: int = Field(
+        default=0, description="Known files skipped since size and mtime matched"
+    )
+    removed: int = Field(
+        default=0,
+        description="Known songs whose file was not found anymore (deleted when pruning)",
+    )
+    failed: int = Field(default=0, description="Files that could not be parsed")
+    moved: int = Field(
+        default=0, description="Known songs whose file was moved, updated in place"
+    )
+    pruned: list[str] = Field(
+        default_factory=list, description="Paths of the songs deleted by the scan"
+    )
+
+    def merge(self, other: "ScanSummary") -> None:
+        """Add the counts and pruned paths of another summary to this one"""
+        for name in ScanSummary.model_fields:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+class LibraryRoot(BaseModel):
+    """A directory of the music library"""
+
+    id: int | None = Field(default=None)
+    path: str = Field(description="Absolute path of the directory")
+    added_date: float = Field(description="Date added (UNIX time)")
+
+    @field_validator("path")
+    @classmethod
+    def normalize_path(cls, v: str) -> str:
+        """Ensure path is an absolute path and normalized"""
+        return str(Path(v).absolute())
+
+
+class ScanCheckpoint(BaseModel):
+    """Persisted state of an interrupted library scan"""
+
+    id: int | None = Field(default=None)
+    root: str = Field(description="Absolute path of the scanned directory")
+    started_at: float = Field(description="Start time of the scan (UNIX time)")
+    updated_at: float = Field(
+        description="Time of the last committed batch (UNIX time)"
+    )
+    last_batch: int = Field(default=0, description="Number of committed batches")
+
+
+class PlayEvent(BaseModel):
+    """A play or a skip of a song, see PlayEventsRepository"""
+
+    id: int | None = Field(default=None)
+    song_id: int = Field(description="ID of the played song")
+    event: Literal["play", "skip"] = Field(description="Played to the end or skipped")
+    timestamp: float = Field(description="Time of the event (UNIX time)")
+
+
+class DuplicateCluster(BaseModel):
+    """Songs sharing a fingerprint or a signature"""
+
+    key: str = Field(description="The shared fingerprint or signature")
+    song_ids: list[int] = Field(description="IDs of the songs, at least two")
+
+
 class Playlist(BaseModel):
     id: int | None = Field(default=None, description="Playlist ID")
     name: str = Field(description="Name of the playlist")
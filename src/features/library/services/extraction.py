@@ -0,0 +1,147 @@
+# src.features.library.services.extraction
+import logging
+import multiprocessing
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from itertools import islice
+from pathlib import Path
+from typing import Literal, Self
+
+from src.features.library.schemas import Song
+from src.features.library.utils.metadata import read_song
+
+logger = logging.getLogger(__name__)
+
+ExecutorKind = Literal["serial", "thread", "process"]
+ExtractionResult = tuple[Path, Song | None, Exception | None]
+
+
+def extract_songs(paths: list[Path], added_date: float) -> list[ExtractionResult]:
+    """
+    Read a batch of audio files.
+    Runs inside executor workers, so it must stay a picklable module-level function.
+    Args:
+        paths: The audio file paths.
+        added_date: Date the songs are added to the library (UNIX time).
+    Returns:
+        One (path, song, error) tuple per path. song is None for files that are
+        not audio files or that failed to be parsed, in which case error is set.
+    """
+    results: list[ExtractionResult] = []
+    for path in paths:
+        try:
+            results.append((path, read_song(path, added_date), None))
+        except Exception as e:  # noqa: BLE001 - reported with its file
+            results.append((path, None, e))
+    return results
+
+
+class MetadataExtractor:
+    """Reads audio file metadata in parallel and streams the results back in batches.
+
+    Paths are grouped in batches which are fanned out to an executor. Only a
+    bounded number of batches are in flight at a time so that the (possibly huge)
+    path iterator is consumed lazily. Results are yielded in completion order to
+    the caller thread, which stays the single database writer.
+
+    Executor kinds:
+        serial: Batches are read in the caller thread.
+        thread: Thread pool, suited to I/O-bound libraries (NFS, SMB mounts...).
+        process: Process pool, suited to CPU-bound tag parsing on local disks.
+
+    Attributes:
+        _kind: The executor kind.
+        _max_workers: Number of workers of the pool.
+        _batch_size: Number of paths per task.
+        _executor: The executor, created on context entry.
+    """
+
+    def __init__(
+        self,
+        kind: ExecutorKind = "thread",
+        max_workers: int | None = None,
+        batch_size: int = 32,
+    ):
+        """Initializes the MetadataExtractor.
+
+        Args:
+            kind: The executor kind.
+            max_workers: Number of workers of the pool. Defaults to the number
+                of CPUs for processes, and to a few more than that for threads.
+            batch_size: Number of paths per task.
+        """
+        cpu_count = os.cpu_count() or 1
+        if max_workers is None:
+            max_workers = cpu_count if kind == "process" else min(32, cpu_count + 4)
+        self._kind = kind
+        self._max_workers = max(1, max_workers)
+        self._batch_size = max(1, batch_size)
+        self._executor: Executor | None = None
+
+    def __enter__(self) -> Self:
+        if self._kind == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="metadata"
+            )
+        elif self._kind == "process":
+            # Forking a process that runs Qt threads is unsafe, spawn fresh workers
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        logger.debug(
+            f"Metadata extraction using {self._kind} executor "
+            f"({self._max_workers} workers, batches of {self._batch_size})"
+        )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def extract(
+        self, paths: Iterable[Path], added_date: float
+    ) -> Iterator[list[ExtractionResult]]:
+        """Reads the given audio files, yielding results batch by batch.
+
+        Args:
+            paths: The audio file paths, consumed lazily.
+            added_date: Date the songs are added to the library (UNIX time).
+
+        Yields:
+            Lists of (path, song, error) tuples, see extract_songs.
+        """
+        paths_iter = iter(paths)
+
+        if self._executor is None:
+            while batch := list(islice(paths_iter, self._batch_size)):
+                yield extract_songs(batch, added_date)
+            return
+
+        max_in_flight = self._max_workers * 2
+        in_flight: set[Future] = set()
+        exhausted = False
+
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < max_in_flight:
+                batch = list(islice(paths_iter, self._batch_size))
+                if not batch:
+                    exhausted = True
+                    break
+                in_flight.add(self._executor.submit(extract_songs, batch, added_date))
+
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
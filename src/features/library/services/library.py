@@ -1,20 +1,29 @@
 # src.features.library.services.library
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
 import logging
+import os
 from pathlib import Path
+import sqlite3
+import threading
 import time
-from typing import Callable
+from typing import Any
 
 from PySide6.QtCore import QObject
-from mutagen._file import File, FileType
-from mutagen._util import MutagenError
 
-from src.features.library.schemas import (
-    AppData,
-    Song,
+from src.features.library.schemas import ScanSummary
+from src.common.utils.settings import settings
+from src.features.library.repository import (
+    FileIndexEntry,
+    ScanCheckpointsRepository,
+    SongsBulkWriter,
+    SongsRepository,
+    WriteConnection,
 )
-from src.features.library.repository import SongsRepository
-from src.features.library.utils.metadata import get_audio_properties, get_tags
+from src.features.library.services.extraction import ExecutorKind, MetadataExtractor
+from src.features.library.services.progress import ScanProgressTracker
+from src.features.library.utils.metadata import get_fingerprint
+from src.features.library.utils.walker import LibraryWalker
 
 logger = logging.getLogger(__name__)
 
@@ -26,10 +35,31 @@ class LibraryServices(QObject):
         _library_path: The path to the music library.
         _repository: The songs repository.
         _get_time: A function that returns the current time.
-        _paths: An iterator for traversing the library path.
-        _loaded_audio_file: The currently loaded audio file.
+        _recursive: If False, subdirectories of the library path are not scanned.
+        _walker: Walks the library path, yielding audio files only.
         _current_file_path: The path to the current file.
         _audio_file_count: The number of audio files found.
+        _summary: Counts of added/updated/unchanged/removed songs for the last scan.
+        _flush_size: Number of songs written per database transaction.
+        _flush_interval: Maximum number of seconds between two transactions.
+        _executor_kind: Executor used for metadata extraction (serial, thread, process).
+        _max_workers: Number of metadata extraction workers.
+        _batch_size: Number of files per extraction task.
+        _progress_callback: Called with progress reports during scans.
+        _progress: Progress of the running scan.
+        _checkpoints: If set, scans are checkpointed and can be resumed.
+        _cancel_event: Set to cancel the running scan.
+        _checkpoint_id: ID of the checkpoint of the running scan.
+        _pending_counts: Number of files handed to the extractor and not written
+            yet, per directory.
+        _listed_directories: Directories whose files were all handed to the extractor.
+        _completed_directories: Directories done since the last flush, recorded in
+            the checkpoint with the next batch.
+        _writer: Writer of the running scan.
+        _move_scope: Directory where the previous location of moved files is looked for.
+        _moved_ids: IDs of the songs found at a new location by the running scan.
+        _write_connection: Provides the connection of each write transaction,
+            the connection of the repository is used if None.
     """
 
     def __init__(
@@ -37,6 +67,18 @@ class LibraryServices(QObject):
         library_path: Path,
         repository: SongsRepository,
         get_time: Callable[[], float] = time.time,
+        flush_size: int | None = None,
+        flush_interval: float | None = None,
+        executor_kind: ExecutorKind | None = None,
+        max_workers: int | None = None,
+        batch_size: int | None = None,
+        recursive: bool = True,
+        progress_callback: Callable[[dict[str, Any]], None] | None = None,
+        checkpoints: ScanCheckpointsRepository | None = None,
+        cancel_event: threading.Event | None = None,
+        move_scope: Path | None = None,
+        write_connection: WriteConnection | None = None,
+        exclusion_root: Path | None = None,
     ) -> None:
         """Initializes the LibraryServices.
 
@@ -45,21 +87,298 @@ class LibraryServices(QObject):
             repository: The songs repository.
             get_time: A function that returns the current time.
                 Defaults to time.time.
+            flush_size: Number of songs written per database transaction.
+                Defaults to settings.scan_flush_size.
+            flush_interval: Maximum number of seconds between two transactions.
+                Defaults to settings.scan_flush_interval.
+            executor_kind: Executor used for metadata extraction.
+                Defaults to settings.scan_executor.
+            max_workers: Number of metadata extraction workers.
+                Defaults to settings.scan_workers.
+            batch_size: Number of files per extraction task.
+                Defaults to settings.scan_batch_size.
+            recursive: If False, only the files directly inside the library
+                path are scanned, subdirectories are left untouched.
+            progress_callback: Called with progress reports during scans, at most
+                every settings.scan_progress_interval seconds.
+                See ScanProgressTracker for their content.
+            checkpoints: If set, scans record the directories they completed,
+                so an interrupted scan can be resumed. It must share the
+                connection of the songs repository, writes go through
+                write_connection when set.
+            cancel_event: Event to cancel scans from another thread, see cancel.
+            move_scope: Songs under this directory whose file vanished can be
+                matched with new files, see _find_moved_song. Defaults to the
+                library path.
+            write_connection: Provides the connection of each write transaction,
+                e.g. ConnectionManager.writer so that scans share the single
+                serialized writer of the application. Reads still use the
+                connection of the repository. If None, writes use it as well.
+            exclusion_root: The directory settings.library_exclude patterns are
+                relative to, see LibraryWalker. Defaults to the library path.
         """
         super().__init__()
         self._library_path = library_path
         self._repository = repository
         self._get_time = get_time
-        self._paths: Iterator[Path] = self._library_path.rglob("*")
-        self._loaded_audio_file: FileType | None = None
+        self._recursive = recursive
+        self._walker = LibraryWalker(
+            self._library_path,
+            exclude=settings.library_exclude,
+            recursive=recursive,
+            exclusion_root=exclusion_root,
+        )
         self._current_file_path: Path | None = None
         self._audio_file_count: int = 0
+        self._summary: ScanSummary = ScanSummary()
+        self._flush_size = flush_size or settings.scan_flush_size
+        self._flush_interval = (
+            settings.scan_flush_interval if flush_interval is None else flush_interval
+        )
+        self._executor_kind: ExecutorKind = executor_kind or settings.scan_executor
+        self._max_workers = max_workers or settings.scan_workers
+        self._batch_size = batch_size or settings.scan_batch_size
+        self._progress_callback = progress_callback
+        self._progress: ScanProgressTracker | None = None
+        self._checkpoints = checkpoints
+        # A shared event is cleared by its owner, before scans start
+        self._owns_cancel_event = cancel_event is None
+        self._cancel_event = cancel_event or threading.Event()
+        self._checkpoint_id: int | None = None
+        self._pending_counts: dict[str, int] = {}
+        self._listed_directories: set[str] = set()
+        self._completed_directories: list[str] = []
+        self._writer: SongsBulkWriter | None = None
+        self._move_scope = os.path.join((move_scope or library_path).absolute(), "")
+        self._moved_ids: set[int] = set()
+        self._write_connection = write_connection
 
-    def populate_database(self) -> list[tuple[Path, Exception]]:
+    @contextmanager
+    def _writes(self) -> Iterator[sqlite3.Connection]:
+        """Provides the connection of a write transaction, see write_connection."""
+        with (
+            nullcontext(self._repository.conn)
+            if self._write_connection is None
+            else self._write_connection()
+        ) as connection:
+            yield connection
+
+    def cancel(self) -> None:
+        """Requests the running scan to stop, can be called from any thread.
+
+        Files already parsed are written before populate_database returns.
+        """
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        """Returns True if the last scan was cancelled."""
+        return self._cancel_event.is_set()
+
+    def get_summary(self) -> ScanSummary:
+        """Returns the counts gathered by the last call to populate_database."""
+        return self._summary
+
+    def _iter_pending_files(
+        self,
+        known_files: dict[str, FileIndexEntry],
+        seen_paths: set[str],
+        incremental: bool,
+        skipped_directories: set[str],
+    ) -> Iterator[Path]:
+        """Yields the files of the library that need to be (re-)parsed.
+
+        New files that are a known song moved to another location, and unchanged
+        files missing a fingerprint, are written directly without being parsed.
+        Stops when the scan is cancelled.
+
+        Args:
+            known_files: Index of known songs, see SongsRepository.get_file_index.
+            seen_paths: Filled with the path of every file found.
+            incremental: If True, known files with unchanged size and mtime are skipped.
+            skipped_directories: Directories completed by an interrupted scan,
+                their files are not looked at again.
+        """
+        assert self._progress is not None
+        for directory, entries in self._walker.walk():
+            if self._cancel_event.is_set():
+                return
+
+            if directory in skipped_directories:
+                # Still listed, since their subdirectories may not be complete
+                for entry in entries:
+                    seen_paths.add(entry.path)
+                    self._progress.file_discovered(directory)
+                    self._progress.file_skipped()
+                self._summary.unchanged += len(entries)
+                continue
+
+            for entry in entries:
+                self._current_file_path = Path(entry.path)
+                self._progress.file_discovered(directory)
+                path_key = entry.path
+                seen_paths.add(path_key)
+                known = known_files.get(path_key)
+
+                if known is None:
+                    if self._find_moved_song(entry):
+                        self._summary.moved += 1
+                        self._progress.file_skipped()
+                        continue
+                elif incremental:
+                    # Cached by the directory entry when it was followed
+                    stats = entry.stat()
+                    if stats.st_size == known.size and stats.st_mtime == known.mtime:
+                        if known.fingerprint is None:
+                            # Scanned before fingerprints existed
+                            self._write_file_update(known.id, entry)
+                        self._summary.unchanged += 1
+                        self._progress.file_skipped()
+                        continue
+
+                self._pending_counts[directory] = (
+                    self._pending_counts.get(directory, 0) + 1
+                )
+                yield self._current_file_path
+
+            self._listed_directories.add(directory)
+            if not self._pending_counts.get(directory):
+                self._directory_completed(directory)
+
+    def _write_file_update(
+        self, song_id: int, entry: os.DirEntry, fingerprint: str | None = None
+    ) -> None:
+        """Buffers the location, mtime and fingerprint of a song file."""
+        assert self._writer is not None
+        stats = entry.stat()
+        self._writer.add_file_update(
+            song_id,
+            entry.path,
+            stats.st_mtime,
+            fingerprint or get_fingerprint(entry.path, stats.st_size),
+        )
+
+    def _find_moved_song(self, entry: os.DirEntry) -> bool:
+        """Checks if a new file is a known song that was moved, and if so moves it.
+
+        Known songs with the same size whose file vanished are compared to the
+        file by fingerprint. The size lookup is indexed, and no file is read
+        unless there is such a candidate, so scanning a new library costs
+        nothing more. The moved song keeps its tags and application data.
+
+        Returns:
+            True if the file was recognized as a moved song.
+        """
+        stats = entry.stat()
+        candidates = [
+            (song_id, path, fingerprint)
+            for song_id, path, fingerprint in self._repository.find_songs_by_size(
+                stats.st_size
+            )
+            if fingerprint is not None
+            and song_id not in self._moved_ids
+            and path.startswith(self._move_scope)
+            and not os.path.exists(path)
+        ]
+        if not candidates:
+            return False
+
+        fingerprint = get_fingerprint(entry.path, stats.st_size)
+        for song_id, path, candidate_fingerprint in candidates:
+            if candidate_fingerprint == fingerprint:
+                logger.debug(f"Moved: {path} -> {entry.path}")
+                self._moved_ids.add(song_id)
+                self._write_file_update(song_id, entry, fingerprint)
+                return True
+        return False
+
+    def _file_done(self, path: Path) -> None:
+        """Records that a file handed to the extractor was processed."""
+        directory = os.path.dirname(path)
+        self._pending_counts[directory] -= 1
+        if (
+            not self._pending_counts[directory]
+            and directory in self._listed_directories
+        ):
+            self._directory_completed(directory)
+
+    def _directory_completed(self, directory: str) -> None:
+        """Queues a directory for the checkpoint, once all its files are buffered."""
+        self._pending_counts.pop(directory, None)
+        self._listed_directories.discard(directory)
+        if self._checkpoint_id is None:
+            return
+        self._completed_directories.append(directory)
+        if self._writer is not None:
+            self._writer.maybe_flush()
+
+    def _record_checkpoint(self, connection: sqlite3.Connection) -> None:
+        """Records completed directories, within the transaction of a song batch."""
+        if self._checkpoints is None or self._checkpoint_id is None:
+            return
+        assert self._writer is not None
+        ScanCheckpointsRepository(connection).record_progress(
+            self._checkpoint_id,
+            self._completed_directories,
+            self._writer.batches,
+            self._get_time(),
+        )
+        self._completed_directories = []
+
+    def _get_known_files(self) -> dict[str, FileIndexEntry]:
+        """Loads the index of songs known under the library path."""
+        known_files = self._repository.get_file_index(self._library_path)
+        if not self._recursive:
+            directory = str(self._library_path.absolute())
+            known_files = {
+                path: known
+                for path, known in known_files.items()
+                if os.path.dirname(path) == directory
+            }
+        return known_files
+
+    def _find_removed_songs(
+        self, known_files: dict[str, FileIndexEntry], seen_paths: set[str]
+    ) -> list[int]:
+        """Returns the IDs of known songs whose file was not found by the walk.
+
+        Songs under directories that could not be read, and songs found at
+        another location, are not considered removed.
+        """
+        unreadable = tuple(
+            os.path.join(directory, "") for directory, _ in self._walker.errors
+        )
+        return [
+            known.id
+            for path, known in known_files.items()
+            if path not in seen_paths
+            and not path.startswith(unreadable)
+            and known.id not in self._moved_ids
+        ]
+
+    def populate_database(
+        self, incremental: bool = True, prune: bool = True, resume: bool = True
+    ) -> list[tuple[Path, Exception]]:
         """Scans the library path and populates the database with song information.
 
         Iterates through all files in the library path, extracts metadata
         from audio files, and inserts song information into the database.
+        Files already known are updated in place rather than inserted again.
+
+        When checkpoints are enabled, directories are recorded as completed in
+        the same transaction as their songs. A scan that was cancelled, failed or
+        killed leaves its checkpoint behind, and the next scan skips the files of
+        completed directories. The checkpoint is deleted once a scan completes.
+
+        Args:
+            incremental: If True, known files whose size and mtime did not change
+                since the last scan are skipped without being re-parsed.
+            prune: If True, songs whose file was not found are deleted along
+                with their playlist entries, see ScanSummary.pruned. Nothing is
+                deleted if the scan is cancelled, if the directory holding the
+                file could not be read, or if a recursive scan found no file at
+                all (e.g. an unmounted disk).
+            resume: If False, an existing checkpoint is discarded and the scan
+                starts over.
 
         Returns:
             A list of tuples. Each tuple contains the Path of a file
@@ -67,29 +386,115 @@ class LibraryServices(QObject):
         """
         logger.info("Populating metadata database")
         error_paths: list[tuple[Path, Exception]] = []
+        self._summary = ScanSummary()
+        if self._owns_cancel_event:
+            self._cancel_event.clear()
+        self._pending_counts = {}
+        self._listed_directories = set()
+        self._completed_directories = []
+        self._moved_ids = set()
 
-        for path in self._paths:
-            if path.is_file():
-                try:
-                    self._loaded_audio_file = File(path)
-                except MutagenError as e:
-                    error_paths.append((path, e))
-
-                if self._loaded_audio_file is not None:
-                    self._audio_file_count += 1
-
-                    fileprops = get_audio_properties(self._loaded_audio_file, path)
-                    tags = get_tags(self._loaded_audio_file)
-                    app_data = AppData(added_date=time.time())
-                    song: Song = Song(
-                        path=str(path),
-                        fileprops=fileprops,
-                        tags=tags,
-                        app_data=app_data,
-                    )
-                    self._repository.insert(song)
+        skipped_directories: set[str] = set()
+        if self._checkpoints is not None:
+            with self._writes() as connection:
+                checkpoints = ScanCheckpointsRepository(connection)
+                if not resume:
+                    checkpoints.clear(self._library_path)
+                checkpoint, skipped_directories = checkpoints.begin(
+                    self._library_path, self._get_time()
+                )
+            self._checkpoint_id = checkpoint.id
+            if skipped_directories:
+                logger.info(
+                    f"Resuming scan of {self._library_path}, "
+                    f"{len(skipped_directories)} directories already done "
+                    f"({checkpoint.last_batch} batches committed)"
+                )
+
+        # Loaded once, files are then compared against it with a single stat
+        known_files = self._get_known_files()
+        seen_paths: set[str] = set()
+        self._progress = ScanProgressTracker(
+            self._progress_callback or (lambda progress: None),
+            settings.scan_progress_interval,
+            expected_total=len(known_files),
+        )
+        pending_files = self._iter_pending_files(
+            known_files, seen_paths, incremental, skipped_directories
+        )
+
+        try:
+            with (
+                self._repository.bulk_writer(
+                    self._flush_size,
+                    self._flush_interval,
+                    self._record_checkpoint if self._checkpoints is not None else None,
+                    self._write_connection,
+                ) as writer,
+                MetadataExtractor(
+                    self._executor_kind, self._max_workers, self._batch_size
+                ) as extractor,
+            ):
+                self._writer = writer
+                # Parsing is fanned out, results are written from this thread only
+                for results in extractor.extract(pending_files, self._get_time()):
+                    for path, song, error in results:
+                        self._progress.file_parsed(song.fileprops.size if song else 0)
+                        if error is not None:
+                            error_paths.append((path, error))
+                            self._summary.failed += 1
+                        elif song is not None:
+                            self._audio_file_count += 1
+                            known = known_files.get(song.path)
+                            if known is not None:
+                                writer.add_update(known.id, song)
+                                self._summary.updated += 1
+                            else:
+                                writer.add(song)
+                                self._summary.added += 1
+                        self._file_done(path)
+                    self._progress.report()
+                    if self._cancel_event.is_set():
+                        break
+        finally:
+            self._writer = None
+            self._checkpoint_id = None
+
+        self._progress.report(force=True)
+        error_paths.extend(self._walker.errors)
+
+        if self._cancel_event.is_set():
+            logger.info(
+                f"Scan of {self._library_path} cancelled: {self._summary.added} added, "
+                f"{self._summary.updated} updated, {self._summary.unchanged} unchanged"
+            )
+            return error_paths
+
+        removed_ids = self._find_removed_songs(known_files, seen_paths)
+        if prune and removed_ids:
+            if not seen_paths and self._recursive:
+                # Most likely an unmounted disk rather than an emptied directory
+                logger.warning(
+                    f"No files found in {self._library_path}, "
+                    f"its {len(removed_ids)} songs are kept"
+                )
             else:
-                continue
+                with self._writes() as connection:
+                    self._summary.pruned = SongsRepository(connection).delete_songs(
+                        removed_ids
+                    )
+                for path in self._summary.pruned:
+                    logger.debug(f"Pruned missing file: {path}")
+        self._summary.removed = len(self._summary.pruned) if prune else len(removed_ids)
+        if self._checkpoints is not None:
+            with self._writes() as connection:
+                ScanCheckpointsRepository(connection).clear(self._library_path)
 
         logger.debug(f"Audio files found {self._audio_file_count}")
+        logger.info(
+            f"Scan of {self._library_path} done: {self._summary.added} added, "
+            f"{self._summary.updated} updated, {self._summary.unchanged} unchanged, "
+            f"{self._summary.moved} moved, {self._summary.removed} removed, "
+            f"{self._summary.failed} failed"
+        )
         return error_paths
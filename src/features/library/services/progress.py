@@ -0,0 +1,101 @@
+# src.features.library.services.progress
+import time
+from collections.abc import Callable
+from typing import Any
+
+
+class ScanProgressTracker:
+    """Tracks the progress of a library scan and reports it at a bounded rate.
+
+    Reports are dictionaries with the following keys:
+        files_discovered: Audio files found by the walk so far.
+        files_processed: Files handled so far (parsed, unchanged or failed).
+        files_parsed: Files whose metadata were read.
+        files_per_second: Processing throughput since the start of the scan.
+        bytes_per_second: Parsing throughput since the start of the scan.
+        current_directory: The directory being walked.
+        eta_seconds: Estimated remaining time, None while it can't be estimated.
+
+    The total used for the ETA is the number of files discovered, or the number
+    of songs already known under the library if larger, since the walk runs
+    concurrently with parsing.
+
+    Attributes:
+        _callback: Called with each report.
+        _min_interval: Minimum number of seconds between two reports.
+        _get_time: A function that returns a monotonic time.
+        _expected_total: Number of files the scan is expected to process.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[dict[str, Any]], None],
+        min_interval: float = 0.25,
+        expected_total: int = 0,
+        get_time: Callable[[], float] = time.monotonic,
+    ):
+        """Initializes the ScanProgressTracker.
+
+        Args:
+            callback: Called with each report.
+            min_interval: Minimum number of seconds between two reports.
+            expected_total: Number of files the scan is expected to process.
+            get_time: A function that returns a monotonic time.
+        """
+        self._callback = callback
+        self._min_interval = min_interval
+        self._expected_total = expected_total
+        self._get_time = get_time
+        self._started = self._get_time()
+        self._last_report = float("-inf")
+        self.files_discovered = 0
+        self.files_processed = 0
+        self.files_parsed = 0
+        self.bytes_parsed = 0
+        self.current_directory: str | None = None
+
+    def file_discovered(self, directory: str | None = None) -> None:
+        """Records a file found by the walk."""
+        self.files_discovered += 1
+        self.current_directory = directory
+
+    def file_skipped(self) -> None:
+        """Records a file processed without being parsed."""
+        self.files_processed += 1
+        self.report()
+
+    def file_parsed(self, size: int = 0) -> None:
+        """Records a parsed (or failed) file of the given size in bytes."""
+        self.files_processed += 1
+        self.files_parsed += 1
+        self.bytes_parsed += size
+
+    def snapshot(self) -> dict[str, Any]:
+        """Returns the current progress report."""
+        elapsed = max(self._get_time() - self._started, 1e-6)
+        files_per_second = self.files_processed / elapsed
+        total = max(self.files_discovered, self._expected_total)
+        remaining = max(total - self.files_processed, 0)
+        eta_seconds = remaining / files_per_second if files_per_second > 0 else None
+
+        return {
+            "files_discovered": self.files_discovered,
+            "files_processed": self.files_processed,
+            "files_parsed": self.files_parsed,
+            "files_per_second": round(files_per_second, 1),
+            "bytes_per_second": round(self.bytes_parsed / elapsed),
+            "current_directory": self.current_directory or "",
+            "eta_seconds": round(eta_seconds) if eta_seconds is not None else None,
+        }
+
+    def report(self, force: bool = False) -> None:
+        """Calls back with the current progress, at most once per interval.
+
+        Args:
+            force: If True, report even if the last report is too recent.
+        """
+        now = self._get_time()
+        if not force and now - self._last_report < self._min_interval:
+            return
+        self._last_report = now
+        self._callback(self.snapshot())
@@ -1,5 +1,16 @@
 # src.features.library.services.query
 import logging
+import operator as operators
+import time
+from collections.abc import Callable, Iterable
+from typing import Any, ClassVar
+
+from src.common.database import (
+    PLAY_HISTORY_TABLES,
+    PROMOTED_COLUMNS,
+    play_day,
+    play_week,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -291,7 +302,70 @@ class QueryParser:
 class SQLGenerator:
     """Converts a parsed expression tree into SQL WHERE clause."""
 
-    def __init__(self):
+    # Query fields stored in promoted columns when present, see PROMOTED_COLUMNS
+    # Format: {lowercase_query_field: column}
+    promoted_fields: ClassVar[dict[str, str]] = {
+        "title": "title",
+        "artist": "artist",
+        "album": "album",
+        "albumartist": "album_artist",
+        "album_artist": "album_artist",
+        "genre": "genre",
+        "year": "year",
+        "track_number": "track_number",
+        "disc_number": "disc_number",
+        "length": "length",
+        "bitrate": "bitrate",
+    }
+
+    # Query fields answered from the play history rollups, see PLAY_HISTORY_TABLES
+    # Format: {lowercase_query_field: (table, counted column, number of periods)}
+    # The window ends with the current period: the last 7 days, 30 days or 52 weeks
+    history_fields: ClassVar[dict[str, tuple[str, str, int]]] = {
+        "plays_week": ("song_plays_daily", "plays", 7),
+        "plays_month": ("song_plays_daily", "plays", 30),
+        "plays_year": ("song_plays_weekly", "plays", 52),
+        "skips_week": ("song_plays_daily", "skips", 7),
+        "skips_month": ("song_plays_daily", "skips", 30),
+        "skips_year": ("song_plays_weekly", "skips", 52),
+        "artist_plays_week": ("artist_plays_daily", "plays", 7),
+        "artist_plays_month": ("artist_plays_daily", "plays", 30),
+        "artist_plays_year": ("artist_plays_weekly", "plays", 52),
+    }
+
+    _comparisons: ClassVar[dict[str, Callable[[Any, Any], bool]]] = {
+        "=": operators.eq,
+        "!=": operators.ne,
+        "<": operators.lt,
+        "<=": operators.le,
+        ">": operators.gt,
+        ">=": operators.ge,
+    }
+
+    def __init__(
+        self,
+        promoted_columns: Iterable[str] = (),
+        full_text: bool = False,
+        tag_index: bool = False,
+        get_time: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            promoted_columns: Generated columns of the songs table, fields
+                stored in one of them are queried through the column and its
+                index rather than with json_extract.
+            full_text: True if the songs_fts full-text table exists, simple
+                terms are then matched with it instead of LIKE scans.
+            tag_index: True if the song_tags table exists, fields without
+                mapping and text matches on tags are then queried through its
+                indexes.
+            get_time: Returns the current time (UNIX time), which ends the
+                windows of the play history fields.
+        """
+        self.promoted_columns = frozenset(promoted_columns)
+        self.full_text = full_text
+        self.tag_index = tag_index
+        self.get_time = get_time
         # Field mappings to handle specific JSON fields efficiently
         # Format: {lowercase_query_field: (json_container, json_key, field_type)}
         self.field_mappings = {
@@ -301,6 +375,10 @@ class SQLGenerator:
             "album": ("tags", "ALBUM", "text"),
             "genre": ("tags", "GENRE", "text"),
             "albumartist": ("tags", "ALBUM_ARTIST", "text"),
+            "album_artist": ("tags", "ALBUM_ARTIST", "text"),
+            "year": ("tags", "RELEASE_TIME", "numeric"),
+            "track_number": ("tags", "TRACK_NUM", "numeric"),
+            "disc_number": ("tags", "DISC_NUM", "numeric"),
             # App data fields
             "play_count": ("app_data", "play_count", "numeric"),
             "rating": ("app_data", "rating", "numeric"),
@@ -328,6 +406,103 @@ class SQLGenerator:
         # Handle cases where generation might return empty string if root node is invalid
         return sql if sql else "1=1", params
 
+    def _generate_column(self, column, field_type, operator, value):
+        """
+        Generate SQL comparing a promoted column, for comparisons other than
+        text matches (see _generate_node).
+        Columns are typed, so values are compared without casts and the column
+        index can serve the comparison.
+        """
+        if field_type == "text":
+            return f"{column} {operator} ?", [value]
+
+        try:
+            num_value = float(value) if "." in value else int(value)
+        except ValueError:
+            logger.warning(
+                f"Invalid numeric value '{value}' for field '{column}'. Query part ignored."
+            )
+            return "1=0", []
+        return f"{column} {operator} ?", [num_value]
+
+    def _generate_tag(self, key, operator, value, is_numeric):
+        """
+        Generate SQL matching songs with a tag value through the song_tags table.
+        Any value of the tag can match, the lookup reads only the index entries
+        of the key.
+        """
+        tag_query = "SELECT song_id FROM song_tags WHERE key = ?"
+        if is_numeric:
+            try:
+                num_value = float(value) if "." in value else int(value)
+            except ValueError:
+                logger.warning(
+                    f"Invalid numeric value '{value}' for tag '{key}'. Query part ignored."
+                )
+                return "1=0", []
+            return f"id IN ({tag_query} AND value_num {operator} ?)", [key, num_value]
+
+        if operator in ["=", "LIKE"]:
+            return f"id IN ({tag_query} AND value LIKE ?)", [key, f"%{value}%"]
+        if operator in ["!=", "NOT LIKE"]:
+            # Songs having the tag, without any value matching
+            return (
+                f"(id IN ({tag_query}) AND id NOT IN ({tag_query} AND value LIKE ?))",
+                [key, key, f"%{value}%"],
+            )
+        return f"id IN ({tag_query} AND value {operator} ?)", [key, value]
+
+    def _generate_history(self, field, operator, value):
+        """
+        Generate SQL comparing the plays or skips of a song (or of its artist)
+        within a time window, summed from the rows of the window in a rollup.
+        Songs without any play in the window count 0: when 0 matches the
+        comparison, songs are matched by excluding the ones whose total does not.
+        """
+        table, counted, periods = self.history_fields[field]
+        subject, period, _ = PLAY_HISTORY_TABLES[table]
+        operator = {"LIKE": "=", "NOT LIKE": "!="}.get(operator, operator)
+        try:
+            num_value = float(value) if "." in value else int(value)
+        except ValueError:
+            logger.warning(
+                f"Invalid numeric value '{value}' for field '{field}'. Query part ignored."
+            )
+            return "1=0", []
+
+        now = self.get_time()
+        current = play_day(now) if period == "day" else play_week(now)
+        having = f"sum({counted}) {operator} ?"
+        if self._comparisons[operator](0, num_value):
+            having = f"NOT ({having})"
+            membership = "NOT IN"
+        else:
+            membership = "IN"
+        if subject == "song_id":
+            song_expr = "id"
+        elif "artist" in self.promoted_columns:
+            song_expr = "coalesce(artist, '')"
+        else:
+            song_expr = f"coalesce({PROMOTED_COLUMNS['artist'][1]}, '')"
+        # Grouping by +subject keeps SQLite from walking the whole table in
+        # subject order: the primary key range of the window is read instead
+        return (
+            (
+                f"{song_expr} {membership} (SELECT {subject} FROM {table} "
+                f"WHERE {period} > ? GROUP BY +{subject} HAVING {having})"
+            ),
+            [current - periods, num_value],
+        )
+
+    @staticmethod
+    def _full_text_query(value):
+        """
+        Build an FTS5 query matching the words of value, the last one as a prefix.
+        The value is quoted as a phrase so that FTS5 operators and special
+        characters in it are matched literally.
+        """
+        return '"' + value.replace('"', '""') + '"*'
+
     def _generate_node(self, node):
         """
         Recursively generate SQL for a node in the expression tree.
@@ -374,10 +549,28 @@ class SQLGenerator:
             operator = node["operator"]
             is_numeric_hint = node["is_numeric"]
 
+            if field in self.history_fields:
+                return self._generate_history(field, operator, value)
+
             # Handle knwon fields
             if field in self.field_mappings:
                 json_container, json_key, field_type = self.field_mappings[field]
 
+                # Promoted columns hold the first value of a tag only, and a
+                # LIKE '%...%' match cannot use their index anyway: text matches
+                # look at every value of the tag instead
+                is_text_match = field_type == "text" and operator in [
+                    "=",
+                    "LIKE",
+                    "!=",
+                    "NOT LIKE",
+                ]
+                column = self.promoted_fields.get(field)
+                if column in self.promoted_columns and not is_text_match:
+                    return self._generate_column(column, field_type, operator, value)
+                if is_text_match and json_container == "tags" and self.tag_index:
+                    return self._generate_tag(json_key, operator, value, False)
+
                 # Conditional [0] for tags + numeric
                 json_path = f"$.{json_key}"
                 is_tags_numeric = json_container == "tags" and field_type == "numeric"
@@ -417,6 +610,10 @@ class SQLGenerator:
                         return "1=0", []
 
             # Handle unknown fields
+            elif self.tag_index:
+                return self._generate_tag(
+                    field.upper(), operator, value, is_numeric_hint
+                )
             else:
                 logger.debug(
                     f"Field '{field}' not in explicit mappings, using fallback logic."
@@ -487,6 +684,12 @@ class SQLGenerator:
         elif node_type == "TERM":
             # Simple term searches across predefined text fields
             value = node["value"]
+            if self.full_text and value.strip():
+                return (
+                    "id IN (SELECT rowid FROM songs_fts WHERE songs_fts MATCH ?)",
+                    [self._full_text_query(value)],
+                )
+
             sql_parts = []
             params = []
 
@@ -0,0 +1,214 @@
+# src.features.library.services.scheduler
+import logging
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from pathlib import Path
+from typing import Any
+
+from src.common.database import ConnectionManager
+from src.common.utils.settings import settings
+from src.features.library.repository import ScanCheckpointsRepository, SongsRepository
+from src.features.library.schemas import ScanSummary
+from src.features.library.services.library import LibraryServices
+
+logger = logging.getLogger(__name__)
+
+
+class ScanScheduler:
+    """Scans several library roots concurrently, one thread per root.
+
+    Each root is scanned by its own LibraryServices, reading with the connection
+    of its scan thread, so a slow mount does not hold back the other roots.
+    Batches are written through ConnectionManager.writer: scan threads take
+    turns on the single writer connection instead of contending for the
+    database lock. Roots on
+    the same device (same st_dev) share a semaphore limiting how many of them
+    are walked at once, since concurrent walks of a single spinning disk are
+    slower than sequential ones.
+
+    Progress reports of the roots are combined: counters and throughputs are
+    summed and the ETA is the one of the slowest root.
+
+    Attributes:
+        _connections: Provides the connection of each scan thread.
+        _max_roots: Maximum number of roots scanned at once.
+        _max_per_device: Maximum number of roots of a single device scanned at once.
+        _progress_callback: Called with combined progress reports.
+        _cancel_event: Set to cancel the running scan of every root.
+        _reports: Last progress report of each root.
+        _lock: Protects the reports, which are sent from every scan thread.
+    """
+
+    def __init__(
+        self,
+        connections: ConnectionManager,
+        max_roots: int | None = None,
+        max_per_device: int | None = None,
+        progress_callback: Callable[[dict[str, Any]], None] | None = None,
+        cancel_event: threading.Event | None = None,
+    ):
+        """Initializes the ScanScheduler.
+
+        Args:
+            connections: Provides the connection of each scan thread, released
+                once its root is scanned since scan threads are not reused.
+            max_roots: Maximum number of roots scanned at once.
+                Defaults to settings.scan_max_roots, or every root if unset.
+            max_per_device: Maximum number of roots of a single device scanned
+                at once. Defaults to settings.scan_max_per_device.
+            progress_callback: Called with combined progress reports.
+            cancel_event: Event to cancel scans from another thread.
+        """
+        self._connections = connections
+        self._max_roots = max_roots or settings.scan_max_roots
+        self._max_per_device = max_per_device or settings.scan_max_per_device
+        self._progress_callback = progress_callback
+        self._cancel_event = cancel_event or threading.Event()
+        self._reports: dict[Path, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def is_cancelled(self) -> bool:
+        """Returns True if the last scan was cancelled."""
+        return self._cancel_event.is_set()
+
+    def _on_progress(self, root: Path, report: dict[str, Any]) -> None:
+        """Combines the report of a root with the last report of the others."""
+        with self._lock:
+            self._reports[root] = report
+            reports = list(self._reports.values())
+            etas = [r["eta_seconds"] for r in reports]
+            combined = {
+                key: sum(r[key] for r in reports)
+                for key in (
+                    "files_discovered",
+                    "files_processed",
+                    "files_parsed",
+                    "files_per_second",
+                    "bytes_per_second",
+                )
+            }
+            combined["files_per_second"] = round(combined["files_per_second"], 1)
+            combined["current_directory"] = report["current_directory"]
+            combined["eta_seconds"] = None if None in etas else max(etas)
+            if self._progress_callback is not None:
+                self._progress_callback(combined)
+
+    def _scan_root(
+        self, root: Path, device_semaphore: threading.Semaphore, prune: bool
+    ) -> tuple[list[tuple[Path, Exception]], ScanSummary]:
+        """Scans a single root, once its device allows it."""
+        with device_semaphore:
+            if self._cancel_event.is_set():
+                return [], ScanSummary()
+
+            connection = self._connections.connection()
+            try:
+                songs_repository = SongsRepository(connection)
+                services = LibraryServices(
+                    root,
+                    songs_repository,
+                    progress_callback=lambda report: self._on_progress(root, report),
+                    checkpoints=ScanCheckpointsRepository(connection),
+                    cancel_event=self._cancel_event,
+                    write_connection=self._connections.writer,
+                )
+                error_paths = services.populate_database(prune=prune)
+                return error_paths, services.get_summary()
+            finally:
+                self._connections.release()
+
+    def prune_outside(self, roots: list[Path]) -> list[str]:
+        """Deletes the songs that are not under any library root.
+
+        Their playlist entries and play history are deleted as well. Scans never
+        do this, so that songs of a removed library folder are only deleted on
+        request of the user.
+
+        Returns:
+            The paths of the deleted songs.
+        """
+        with self._connections.reader() as connection:
+            orphan_ids = SongsRepository(connection).find_songs_outside(roots)
+        if not orphan_ids:
+            return []
+        with self._connections.writer() as connection:
+            return SongsRepository(connection).delete_songs(orphan_ids)
+
+    def scan(
+        self, roots: list[Path], prune: bool = True
+    ) -> tuple[list[tuple[Path, Exception]], ScanSummary]:
+        """Scans every root, returning once all of them are done.
+
+        Roots that are not available (e.g. an unmounted disk) are reported as
+        errors and left untouched.
+
+        Args:
+            roots: The library roots to scan.
+            prune: If True, songs whose file disappeared from a root are deleted,
+                see LibraryServices.populate_database. Songs outside of every
+                root are kept, see prune_outside.
+
+        Returns:
+            The files that failed to be processed with the corresponding
+            Exception, and the summary of every root combined.
+        """
+        self._reports = {}
+        error_paths: list[tuple[Path, Exception]] = []
+        summary = ScanSummary()
+
+        device_semaphores: dict[int, threading.Semaphore] = {}
+        roots_by_device: dict[int, list[tuple[Path, threading.Semaphore]]] = {}
+        for root in roots:
+            try:
+                device = os.stat(root).st_dev
+            except OSError as e:
+                logger.warning(f"Library root not available, skipped: {root} - {e}")
+                error_paths.append((root, e))
+                continue
+            if not root.is_dir():
+                error_paths.append((root, NotADirectoryError(root)))
+                continue
+            semaphore = device_semaphores.setdefault(
+                device, threading.Semaphore(self._max_per_device)
+            )
+            roots_by_device.setdefault(device, []).append((root, semaphore))
+
+        # Interleaved, so that roots waiting for their device are not queued
+        # ahead of roots of an idle device
+        scheduled = [
+            item
+            for items in zip_longest(*roots_by_device.values())
+            for item in items
+            if item is not None
+        ]
+        if not scheduled:
+            return error_paths, summary
+
+        logger.info(
+            f"Scanning {len(scheduled)} library roots "
+            f"on {len(device_semaphores)} devices"
+        )
+        max_workers = min(self._max_roots or len(scheduled), len(scheduled))
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="scan"
+        ) as executor:
+            futures = {
+                executor.submit(self._scan_root, root, semaphore, prune): root
+                for root, semaphore in scheduled
+            }
+            for future, root in futures.items():
+                try:
+                    root_errors, root_summary = future.result()
+                except Exception as e:
+                    logger.exception(f"Failed to scan {root}")
+                    error_paths.append((root, e))
+                    continue
+                error_paths.extend(root_errors)
+                summary.merge(root_summary)
+
+        if summary.pruned:
+            logger.info(f"Pruned {len(summary.pruned)} songs whose file disappeared")
+        return error_paths, summary
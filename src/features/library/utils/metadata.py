@@ -1,12 +1,39 @@
 # src.features.songs.utils.metadata
+import hashlib
+import os
 from pathlib import Path
 from typing import Any
-from mutagen._file import FileType
+from mutagen._file import File, FileType
 from mutagen.id3 import ID3
 from mutagen.mp4 import MP4Tags
 
 from src.core.types import AppleKeys, ID3Keys
-from src.features.library.schemas import FileProperties
+from src.features.library.schemas import AppData, FileProperties, Song
+
+FINGERPRINT_CHUNK_SIZE = 4096
+
+
+def get_fingerprint(audio_file_path: Path | str, size: int | None = None) -> str:
+    """
+    Compute a cheap content fingerprint of a file, used to recognize moved files.
+    Only the size and the first and last FINGERPRINT_CHUNK_SIZE bytes are hashed,
+    which covers the tag headers as well as the end of the audio stream.
+    Args:
+        audio_file_path: The audio file path.
+        size: The file size in bytes, read from the file if not given.
+    Returns:
+        The hexadecimal digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(audio_file_path, "rb") as audio_file:
+        if size is None:
+            size = os.fstat(audio_file.fileno()).st_size
+        digest.update(size.to_bytes(8, "little"))
+        digest.update(audio_file.read(FINGERPRINT_CHUNK_SIZE))
+        if size > FINGERPRINT_CHUNK_SIZE:
+            audio_file.seek(max(size - FINGERPRINT_CHUNK_SIZE, FINGERPRINT_CHUNK_SIZE))
+            digest.update(audio_file.read(FINGERPRINT_CHUNK_SIZE))
+    return digest.hexdigest()
 
 
 def get_audio_properties(audio_file: FileType, audio_file_path: Path) -> FileProperties:
@@ -28,6 +55,7 @@ def get_audio_properties(audio_file: FileType, audio_file_path: Path) -> FilePro
         channels=info.channels,
         length=info.length,
         mtime=stats.st_mtime,
+        fingerprint=get_fingerprint(audio_file_path, stats.st_size),
     )
 
 
@@ -66,3 +94,26 @@ def get_tags(audio_file: FileType) -> dict[str, list[Any]]:
         pass
 
     return tags
+
+
+def read_song(audio_file_path: Path, added_date: float) -> Song | None:
+    """
+    Read an audio file and build the corresponding song.
+    Args:
+        audio_file_path: The audio file path.
+        added_date: Date the song is added to the library (UNIX time).
+    Returns:
+        The song, or None if the file is not a supported audio file.
+    Raises:
+        MutagenError: If the file could not be parsed.
+    """
+    audio_file = File(audio_file_path)
+    if audio_file is None:
+        return None
+
+    return Song(
+        path=str(audio_file_path),
+        fileprops=get_audio_properties(audio_file, audio_file_path),
+        tags=get_tags(audio_file),
+        app_data=AppData(added_date=added_date),
+    )
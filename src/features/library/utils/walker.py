@@ -0,0 +1,197 @@
+# src.features.library.utils.walker
+import fnmatch
+import logging
+import os
+import re
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from src.core.types import AUDIO_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+
+def compile_exclusions(patterns: Iterable[str]) -> re.Pattern | None:
+    """
+    Compile glob patterns into a single regular expression.
+    Args:
+        patterns: Glob patterns, e.g. '*.part' or '*/Podcasts'.
+    Returns:
+        The compiled expression, or None if there are no patterns.
+    """
+    translated = [fnmatch.translate(pattern) for pattern in patterns if pattern]
+    if not translated:
+        return None
+    return re.compile("|".join(f"(?:{pattern})" for pattern in translated))
+
+
+class LibraryWalker:
+    """Walks a library directory tree, yielding audio files only.
+
+    Built on os.scandir so file types come from the cached directory entries
+    instead of one stat per path, and files are filtered by extension before
+    anything opens them. Directories and files are identified by (device, inode)
+    so symlink loops and hard links or symlinks to already visited files are
+    skipped.
+
+    Exclusion patterns are matched against the entry name and against its path
+    relative to the root (with '/' separators), e.g. '.*', '*.part', 'Podcasts/*'.
+    When a subdirectory of a library root is walked, exclusion_root keeps the
+    patterns relative to the library root.
+
+    Attributes:
+        root: The directory to walk.
+        extensions: Lowercase file extensions to yield, including the dot.
+        follow_symlinks: If True, symlinked files and directories are followed.
+        recursive: If False, only the files directly inside the root are yielded.
+        exclusion_root: The directory exclusion patterns are relative to.
+        current_directory: The directory being walked.
+        directory_count: Number of directories walked so far.
+        errors: Directories that could not be read and the corresponding error.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        extensions: Iterable[str] = AUDIO_EXTENSIONS,
+        exclude: Iterable[str] = (),
+        follow_symlinks: bool = True,
+        recursive: bool = True,
+        exclusion_root: Path | None = None,
+    ):
+        """Initializes the LibraryWalker.
+
+        Args:
+            root: The directory to walk.
+            extensions: File extensions to yield. Defaults to AUDIO_EXTENSIONS.
+            exclude: Glob patterns of files and directories to skip.
+            follow_symlinks: If True, symlinked files and directories are followed.
+            recursive: If False, only the files directly inside the root are yielded.
+            exclusion_root: The directory exclusion patterns are relative to,
+                e.g. the library root when walking one of its subdirectories.
+                Defaults to the root.
+        """
+        self.root = Path(root).absolute()
+        self.extensions = frozenset(extension.lower() for extension in extensions)
+        self.follow_symlinks = follow_symlinks
+        self.recursive = recursive
+        self.exclusion_root = (
+            self.root if exclusion_root is None else Path(exclusion_root).absolute()
+        )
+        self.current_directory: str | None = None
+        self.directory_count = 0
+        self.errors: list[tuple[Path, Exception]] = []
+        self._exclusions = compile_exclusions(exclude)
+        self._exclusion_prefix_length = len(os.path.join(str(self.exclusion_root), ""))
+
+    def is_excluded(self, path: str) -> bool:
+        """Returns True if a path matches an exclusion pattern, see exclusion_root."""
+        if self._exclusions is None:
+            return False
+        relative_path = path[self._exclusion_prefix_length :].replace(os.sep, "/")
+        return bool(
+            self._exclusions.match(os.path.basename(path))
+            or self._exclusions.match(relative_path)
+        )
+
+    def _list_directory(
+        self,
+        directory: str,
+        device: int,
+        visited_directories: set[tuple[int, int]],
+        visited_files: set[tuple[int, int]],
+    ) -> tuple[list[os.DirEntry], list[tuple[str, int]]]:
+        """Reads a directory, returning its audio files and its subdirectories.
+
+        The listing is read entirely before anything is yielded so that the
+        directory handle is not held open while the caller processes files.
+        """
+        files: list[os.DirEntry] = []
+        subdirectories: list[tuple[str, int]] = []
+
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    is_symlink = entry.is_symlink()
+                    if is_symlink and not self.follow_symlinks:
+                        continue
+
+                    if entry.is_dir():
+                        if self.is_excluded(entry.path):
+                            continue
+                        # Directories are stat'ed once, to detect loops
+                        stats = entry.stat()
+                        key = (stats.st_dev, stats.st_ino)
+                        if key in visited_directories:
+                            logger.debug(f"Skipping visited directory: {entry.path}")
+                            continue
+                        visited_directories.add(key)
+                        subdirectories.append((entry.path, stats.st_dev))
+                        continue
+
+                    extension = os.path.splitext(entry.name)[1].lower()
+                    if extension not in self.extensions or not entry.is_file():
+                        continue
+                    if self.is_excluded(entry.path):
+                        continue
+
+                    # inode() is free for plain files, symlinks need a stat
+                    if is_symlink:
+                        stats = entry.stat()
+                        key = (stats.st_dev, stats.st_ino)
+                    else:
+                        key = (device, entry.inode())
+                    if key in visited_files:
+                        continue
+                    visited_files.add(key)
+                    files.append(entry)
+                except OSError as e:
+                    # Broken symlinks and entries removed while walking
+                    logger.debug(f"Skipping {entry.path}: {e}")
+
+        return files, subdirectories
+
+    def walk(self) -> Iterator[tuple[str, list[os.DirEntry]]]:
+        """Yields each walked directory with its audio files, depth first."""
+        try:
+            root_stat = self.root.stat()
+        except OSError as e:
+            logger.warning(f"Cannot walk {self.root}: {e}")
+            self.errors.append((self.root, e))
+            return
+
+        visited_directories = {(root_stat.st_dev, root_stat.st_ino)}
+        visited_files: set[tuple[int, int]] = set()
+        # (directory path, device) pairs, the device is needed for inode keys
+        stack: list[tuple[str, int]] = [(str(self.root), root_stat.st_dev)]
+
+        while stack:
+            directory, device = stack.pop()
+            self.current_directory = directory
+            self.directory_count += 1
+
+            try:
+                files, subdirectories = self._list_directory(
+                    directory, device, visited_directories, visited_files
+                )
+            except OSError as e:
+                logger.warning(f"Cannot read directory {directory}: {e}")
+                self.errors.append((Path(directory), e))
+                continue
+
+            yield directory, files
+            if self.recursive:
+                # Reversed so that subdirectories are walked in listing order
+                stack.extend(reversed(subdirectories))
+
+        self.current_directory = None
+
+    def __iter__(self) -> Iterator[os.DirEntry]:
+        """Yields the directory entry of every audio file under the root."""
+        for _, files in self.walk():
+            yield from files
+
+    def iter_directories(self) -> Iterator[str]:
+        """Yields the path of every directory under the root, root included."""
+        for directory, _ in self.walk():
+            yield directory
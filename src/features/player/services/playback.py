@@ -80,6 +80,7 @@ class PlaybackService(QObject):
         bus.connect("message", self._on_bus_message)
 
         self._current_song_path = ""
+        self._current_song_id: int | None = None
         self._playback_state = Gst.State.NULL
 
         # Shuffle and repeat mode properties
@@ -108,6 +109,18 @@ class PlaybackService(QObject):
         # NEW: Connect to selection model changes
         self._library.songSelectionModelChanged.connect(self._on_selection_changed)
 
+    def _record_play_event(self, event: str):
+        """Records a play or a skip of the current song, see MusicLibrary.incrementPlayCount.
+
+        Only buffered in memory, the database is not written from playback threads.
+        """
+        if self._current_song_id is None:
+            return
+        if event == "play":
+            self._library.incrementPlayCount(self._current_song_id)
+        else:
+            self._library.incrementSkipCount(self._current_song_id)
+
     def get_current_song_path(self):
         return self._current_song_path
 
@@ -294,6 +307,7 @@ class PlaybackService(QObject):
         t = message.type
 
         if t == Gst.MessageType.EOS:
+            self._record_play_event("play")
             # End of stream - handle according to repeat mode
             if self._repeat_mode == self.REPEAT_TRACK:
                 # Repeat the current track
@@ -520,6 +534,11 @@ class PlaybackService(QObject):
                     or self._playback_state == Gst.State.NULL
                 ):
                     self.set_current_song_path(path)
+                    self._current_song_id = (
+                        self._library.getCurrentSongId()
+                        if self._library.getCurrentSongPath() == path
+                        else None
+                    )
                     # Stop current playback before loading new file
                     self.player.set_state(Gst.State.NULL)
                     # Set the URI
@@ -616,10 +635,14 @@ class PlaybackService(QObject):
             self._repeat_mode == self.REPEAT_TRACK
             and self._playback_state == Gst.State.PLAYING
         ):
+            self._record_play_event("skip")
             self.seek(0)
             logger.info("Restarting current track (repeat track mode)")
             return
 
+        if self._playback_state in (Gst.State.PLAYING, Gst.State.PAUSED):
+            self._record_play_event("skip")
+
         if not current_index.isValid():
             # No song selected, select first song
             if self._library.get_current_song_model().rowCount() > 0:
@@ -72,11 +72,7 @@ class PlaylistSongRepository(DatabaseRepository):
                 ORDER BY ps.position
                 """
                 rows = self._execute_select_query(select_query, (playlist_id,))
-                return (
-                    [self._songs_repository._row_to_model(row) for row in rows]
-                    if rows
-                    else []
-                )  # type: ignore
+                return self._songs_repository._rows_to_models(rows)  # type: ignore
         return []
 
     def remove_song_from_playlist(self, playlist_id: int, song_id: int):
@@ -2,7 +2,7 @@
 import logging
 import sys
 
-from src.common.database import get_db_connection, initialize_database
+from src.common.database import ConnectionManager, initialize_database
 from src.common.services.backend import BackendServices
 from src.common.services.gui import GuiServices
 from src.common.utils.settings import settings
@@ -17,10 +17,12 @@ logger.addHandler(console_handler)
 
 
 def main():
+    connections = ConnectionManager()
+    backend = None
     try:
-        connection = get_db_connection()
+        connection = connections.connection()
         initialize_database(connection)
-        backend = BackendServices(connection)
+        backend = BackendServices(connection, connections)
         gui = GuiServices(backend)
 
         gui.run()
@@ -28,6 +30,10 @@ def main():
     except Exception as e:
         logger.exception(f"An error occurred: {e}")
         sys.exit(1)
+    finally:
+        if backend is not None:
+            backend.close()
+        connections.close_all()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+# tests.common.services.test_maintenance
+from unittest.mock import patch
+
+from src.common.database import ConnectionManager, initialize_database
+from src.common.services.maintenance import MaintenanceService
+from src.common.utils.settings import settings
+
+
+def test_maintenance_service(tmp_path):
+    """Test that due maintenance tasks run, resume when incomplete, and are recorded."""
+    profile = settings.model_copy(
+        update={"database_filename": str(tmp_path / "maintenance.db")}
+    )
+    with patch("src.common.database.settings", profile):
+        connections = ConnectionManager()
+        initialize_database(connections.connection())
+        with connections.writer() as writer:
+            writer.executemany(
+                "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, '{}', ?, '{}')",
+                [
+                    (f"/music/{i}.mp3", f'{{"COMMENT": ["{"x" * 2000}"]}}')
+                    for i in range(500)
+                ],
+            )
+            writer.execute("DELETE FROM songs")
+
+        now = [1_000_000.0]
+        busy = [True]
+        maintenance = MaintenanceService(
+            connections,
+            time_budget=60,
+            vacuum_pages=8,
+            is_busy=lambda: busy[0],
+            get_time=lambda: now[0],
+        )
+        assert maintenance.run_due() == []
+
+        busy[0] = False
+        runs = {run.task: run for run in maintenance.run_due()}
+        assert list(runs) == list(MaintenanceService.intervals)
+        assert runs["optimize"].result == "analyzed"
+        assert runs["quick_check"].result == "ok"
+        assert runs["incremental_vacuum"].complete
+        with connections.reader() as reader:
+            assert reader.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        assert maintenance.due_tasks() == []
+
+        now[0] += MaintenanceService.intervals["checkpoint"]
+        assert maintenance.due_tasks() == ["checkpoint"]
+
+        # Out of time, the vacuum stays due until it completes
+        with connections.writer() as writer:
+            writer.execute(
+                "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, '{}', ?, '{}')",
+                ("/music/big.mp3", '{"COMMENT": ["' + "x" * 100_000 + '"]}'),
+            )
+            writer.execute("DELETE FROM songs")
+        run = maintenance.run_task("incremental_vacuum", deadline=0)
+        assert not run.complete
+        assert "incremental_vacuum" in maintenance.due_tasks()
+        connections.close_all()
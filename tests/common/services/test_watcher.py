@@ -0,0 +1,86 @@
+# tests.common.services.test_watcher
+import shutil
+import wave
+from unittest.mock import patch
+
+import pytest
+from PySide6.QtCore import QCoreApplication
+
+from src.common.database import ConnectionManager, initialize_database
+from src.common.services.watcher import LibraryWatcher
+from src.common.utils.settings import settings
+from src.features.library.repository import SongsRepository
+
+
+def write_song(path, seed=0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with wave.open(str(path), "wb") as audio_file:
+        audio_file.setnchannels(1)
+        audio_file.setsampwidth(2)
+        audio_file.setframerate(8000)
+        audio_file.writeframes(bytes([seed]) * 2000)
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    """Create a watcher of the library directory tmp_path/music."""
+    app = QCoreApplication.instance() or QCoreApplication([])
+    profile = settings.model_copy(
+        update={
+            "database_filename": str(tmp_path / "library.db"),
+            "library_exclude": ["new/skip"],
+            "scan_executor": "serial",
+        }
+    )
+    with (
+        patch("src.common.database.settings", profile),
+        patch("src.common.services.watcher.settings", profile),
+        patch("src.features.library.services.library.settings", profile),
+    ):
+        connections = ConnectionManager()
+        initialize_database(connections.connection())
+        library_watcher = LibraryWatcher(connections, delay=0, max_delay=0)
+        yield library_watcher
+        library_watcher.stop()
+        connections.close_all()
+    assert app is not None
+
+
+def test_sync_directory(watcher, tmp_path):
+    """Test that syncing a directory applies new, moved and missing files."""
+    root = tmp_path / "music"
+    write_song(root / "a/1.wav", seed=1)
+    write_song(root / "b/2.wav", seed=2)
+    watcher.watch([root])
+    for directory in (root, root / "a", root / "b"):
+        watcher._sync_directory(directory, prune=True)
+    repository = SongsRepository(watcher._connections.connection())
+
+    def known_paths():
+        return sorted(repository.get_file_index(root))
+
+    assert known_paths() == [str(root / "a/1.wav"), str(root / "b/2.wav")]
+
+    # New subdirectories are scanned with root-relative exclusions
+    write_song(root / "new/3.wav", seed=3)
+    write_song(root / "new/skip/4.wav", seed=4)
+    (root / "a/1.wav").rename(root / "new/1.wav")
+    summary = watcher._sync_directory(root, prune=False)
+    assert (summary.added, summary.moved) == (1, 1)
+    assert str(root / "new") in watcher._watcher.directories()
+    assert str(root / "new/skip") not in watcher._watcher.directories()
+    assert known_paths() == [
+        str(root / "b/2.wav"),
+        str(root / "new/1.wav"),
+        str(root / "new/3.wav"),
+    ]
+
+    # Vanished files and directories are pruned
+    assert watcher._sync_directory(root / "a", prune=True).removed == 0
+    shutil.rmtree(root / "b")
+    summary = watcher._sync_directory(root / "b", prune=True)
+    assert summary.pruned == [str(root / "b/2.wav")]
+    assert known_paths() == [str(root / "new/1.wav"), str(root / "new/3.wav")]
+
+    # Directories outside of the library are ignored
+    assert watcher._sync_directory(tmp_path, prune=True).removed == 0
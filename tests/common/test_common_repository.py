@@ -6,7 +6,7 @@ import pytest
 from typing import Any
 from pydantic import BaseModel, Field
 
-from src.common.repository import DatabaseRepository
+from src.common.repository import REMOVED, DatabaseRepository, diff_fields
 
 
 class SampleItem(BaseModel):
@@ -70,6 +70,21 @@ def test_insert(test_repository):
     assert retrieved_item.app_data == {"key": "value"}
 
 
+def test_insert_many(test_repository):
+    """Test inserting records in chunked transactions."""
+    items = [SampleItem(name=f"Bulk {i}", app_data={"index": i}) for i in range(7)]
+
+    inserted = test_repository.insert_many(items, chunk_size=3)
+    assert inserted == 7
+    assert test_repository.count() == 7
+
+    retrieved_item = test_repository.find_one({"name": "Bulk 6"})
+    assert retrieved_item is not None
+    assert retrieved_item.app_data == {"index": 6}
+
+    assert test_repository.insert_many([]) == 0
+
+
 def test_find_by_id(test_repository):
     """Test finding a record by ID."""
     item = SampleItem(name="Find by ID Test", app_data={"test": True})
@@ -205,6 +220,74 @@ def test_upsert(test_repository):
     assert retrieved_updated_item.app_data == {"updated": True}
 
 
+def test_upsert_on_conflict(test_repository, db_connection):
+    """Test native upserts, keeping the excluded columns of existing records."""
+    db_connection.execute("CREATE UNIQUE INDEX idx_test_items_name ON test_items(name)")
+    item = SampleItem(name="Unique", description="Original", app_data={"plays": 3})
+    item_id = test_repository.upsert_on_conflict(item, ("name",), ("app_data",))
+
+    updated = SampleItem(name="Unique", description="Updated", app_data={})
+    assert (
+        test_repository.upsert_on_conflict(updated, ("name",), ("app_data",)) == item_id
+    )
+    retrieved = test_repository.find_by_id(item_id)
+    assert retrieved.description == "Updated"
+    assert retrieved.app_data == {"plays": 3}
+
+    items = [
+        SampleItem(name="Unique", description="Bulk"),
+        SampleItem(name="New", description="Bulk"),
+        SampleItem(name="Other", description="Bulk"),
+    ]
+    assert test_repository.upsert_many(items, ("name",), ("app_data",), 2) == 3
+    assert test_repository.count() == 3
+    assert test_repository.find_by_id(item_id).app_data == {"plays": 3}
+    assert {item.description for item in test_repository.find_many()} == {"Bulk"}
+
+
+def test_update_fields(test_repository):
+    """Test partial updates, of columns and of paths inside JSON columns."""
+    item = SampleItem(name="Partial", app_data={"rating": 3, "plays": 2, "old": 1})
+    item_id = test_repository.insert(item)
+
+    changed = SampleItem(
+        name="Partial",
+        description="New",
+        app_data={"rating": 4, "plays": 2, "tags": ["a"]},
+    )
+    assert diff_fields(item, changed) == {
+        "description": "New",
+        "app_data.rating": 4,
+        "app_data.tags": ["a"],
+        "app_data.old": REMOVED,
+    }
+    assert test_repository.update_changed(item_id, item, changed)
+    assert test_repository.find_by_id(item_id) == changed.model_copy(
+        update={"id": item_id}
+    )
+    assert not test_repository.update_changed(item_id, changed, changed)
+
+    assert test_repository.update_fields(item_id, {"app_data.nested.key": None}) is True
+    assert test_repository.find_by_id(item_id).app_data["nested"] == {"key": None}
+    assert test_repository.update_fields(999, {"name": "Missing"}) is False
+    with pytest.raises(ValueError):
+        test_repository.update_fields(item_id, {"unknown": 1})
+    with pytest.raises(ValueError):
+        test_repository.update_fields(item_id, {"name.key": 1})
+    with pytest.raises(ValueError):
+        test_repository.update_fields(item_id, {'app_data.a"b': 1})
+    with pytest.raises(ValueError):
+        test_repository.update_fields(item_id, {"app_data.a\\b": 1})
+
+    # Keys that cannot be written as a path replace the whole document
+    unusual = changed.model_copy(
+        update={"app_data": {**changed.app_data, 'a"b.c\\d': 1}}
+    )
+    assert diff_fields(changed, unusual) == {"app_data": unusual.app_data}
+    assert test_repository.update_changed(item_id, changed, unusual)
+    assert test_repository.find_by_id(item_id).app_data == unusual.app_data
+
+
 def test_delete_many(test_repository):
     """Test deleting multiple records."""
     item1 = SampleItem(
@@ -287,3 +370,89 @@ def test_query_with_expression(test_repository):
     # Test count with filtering
     filtered_count = test_repository.count({"name": "Query Test 1"})
     assert filtered_count == 1
+
+
+class NestedData(BaseModel):
+    count: int = 0
+    label: str | None = None
+
+
+class NestedItem(BaseModel):
+    id: int | None = None
+    name: str
+    active: bool = False
+    app_data: NestedData = Field(default_factory=NestedData)
+
+
+def test_trusted_reads_match_validated_reads(db_connection):
+    """Test that trusted reads build the same models as fully validated reads."""
+    db_connection.execute(
+        "CREATE TABLE nested_items (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "name TEXT NOT NULL, active INTEGER, app_data TEXT, extra TEXT)"
+    )
+    repository = DatabaseRepository(db_connection, NestedItem, "nested_items")
+    repository.insert(
+        NestedItem(name="item", active=True, app_data=NestedData(count=3))
+    )
+
+    trusted = repository.find_many()[0]
+    repository.validate_reads = True
+    validated = repository.find_many()[0]
+
+    assert trusted == validated
+    assert trusted.active is True
+    assert isinstance(trusted.app_data, NestedData)
+    assert trusted.app_data.count == 3
+
+
+@pytest.mark.parametrize(
+    "sort",
+    [
+        None,
+        [("json_extract(app_data, '$.group')", "ASC"), ("name", "DESC")],
+        [("json_extract(app_data, '$.group')", "DESC"), ("name", "ASC")],
+    ],
+)
+def test_find_page(test_repository, sort):
+    """Test that keyset pages walk every record once, in order, NULLs included."""
+    for i in range(7):
+        # Every third item has no group, its sort key is NULL
+        app_data = {"group": i % 2} if i % 3 else {}
+        test_repository.insert(SampleItem(name=f"Item {i % 4}", app_data=app_data))
+
+    order = (sort or []) + [("id", "ASC")]
+    expected = [item.id for item in test_repository.find_many(sort=order)]
+
+    seen = []
+    cursor = None
+    while True:
+        page = test_repository.find_page(sort=sort, cursor=cursor, limit=2)
+        assert len(page.items) <= 2
+        seen.extend(item.id for item in page.items)
+        cursor = page.cursor
+        if cursor is None:
+            break
+    assert seen == expected
+
+    first_page = test_repository.find_page(sort=sort, limit=2)
+    with pytest.raises(ValueError):
+        test_repository.find_page(sort=[("name", "ASC")], cursor=first_page.cursor)
+
+
+def test_iter_many(test_repository):
+    """Test that iter_many yields every matching record, fetching in batches."""
+    test_repository.insert_many(
+        SampleItem(name=f"Item {i}", description="Even" if i % 2 == 0 else "Odd")
+        for i in range(10)
+    )
+
+    batches = list(
+        test_repository._iter_select_query("SELECT * FROM test_items", (), 4)
+    )
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+
+    items = test_repository.iter_many(
+        {"description": "Even"}, sort=[("id", "DESC")], batch_size=3
+    )
+    assert not isinstance(items, list)
+    assert [item.name for item in items] == [f"Item {i}" for i in (8, 6, 4, 2, 0)]
@@ -1,13 +1,23 @@
 # tests.common.test_database
 import re
 import sqlite3
+import threading
 import pytest
 from unittest.mock import patch
 from src.common.database import (
+    ConnectionManager,
+    FINGERPRINT_EXPRESSION,
+    PROMOTED_COLUMNS,
+    SIGNATURE_EXPRESSION,
     get_db_connection,
+    get_promoted_columns,
+    has_full_text_index,
+    has_tag_index,
     initialize_database,
     close_db_connection,
 )
+from src.common.profiler import QueryProfiler, profiler
+from src.common.utils.settings import settings
 
 
 @pytest.fixture
@@ -55,6 +65,150 @@ def test_get_db_connection():
     conn.close()
 
 
+def test_get_db_connection_profile(tmp_path):
+    """Test that get_db_connection applies the connection profile of the settings."""
+    profile = settings.model_copy(
+        update={
+            "database_filename": str(tmp_path / "profile.db"),
+            "database_journal_mode": "wal",
+            "database_synchronous": "normal",
+            "database_mmap_size": 1024 * 1024,
+            "database_cache_size": -2048,
+            "database_temp_store": "memory",
+            "database_busy_timeout": 2.5,
+        }
+    )
+    with patch("src.common.database.settings", profile):
+        conn = get_db_connection()
+
+    def pragma(name):
+        return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+    assert pragma("journal_mode") == "wal"
+    assert pragma("synchronous") == 1  # NORMAL
+    assert pragma("mmap_size") == 1024 * 1024
+    assert pragma("cache_size") == -2048
+    assert pragma("temp_store") == 2  # MEMORY
+    assert pragma("busy_timeout") == 2500
+    conn.close()
+
+
+def test_get_db_connection_profiled(tmp_path):
+    """Test that profiled connections record statements grouped by shape."""
+    profile = settings.model_copy(
+        update={
+            "database_filename": str(tmp_path / "profile.db"),
+            "database_profile": True,
+        }
+    )
+    profiler.reset()
+    with (
+        patch("src.common.database.settings", profile),
+        patch("src.common.database.atexit"),
+    ):
+        conn = get_db_connection()
+
+    conn.execute("CREATE TABLE t (value INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(10)])
+    for limit in (3, 5):
+        rows = conn.execute(f"SELECT value FROM t LIMIT {limit}").fetchall()
+        assert len(rows) == limit
+    conn.close()
+
+    stats = {s.shape: s for s in profiler.get_stats()}
+    select = stats["SELECT value FROM t LIMIT ?"]
+    assert select.count == 2
+    assert select.rows == 8
+    assert stats["INSERT INTO t VALUES (?)"].count == 1
+    assert "SELECT value FROM t LIMIT ?" in profiler.report()
+    profiler.reset()
+
+
+def test_profiler_latencies_are_bounded():
+    """Test that totals cover every execution while few latencies are kept."""
+    query_profiler = QueryProfiler()
+    for i in range(1, 3001):
+        stats = query_profiler.record("SELECT 1", i / 1000)
+    query_profiler.add_fetch(stats, 1.0, 5)
+
+    assert stats.count == 3000
+    assert stats.rows == 5
+    assert len(stats.latencies) == 1000
+    assert stats.total == pytest.approx(sum(range(1, 3001)) / 1000 + 1.0)
+    assert stats.fetch_total == pytest.approx(1.0)
+    assert stats.max_latency == pytest.approx(3.0)
+    assert stats.percentile(0) == pytest.approx(2.001)
+
+
+def test_connection_manager(tmp_path):
+    """Test thread-affine, pooled read-only and writer connections of the manager."""
+    profile = settings.model_copy(
+        update={"database_filename": str(tmp_path / "manager.db")}
+    )
+    with patch("src.common.database.settings", profile):
+        connections = ConnectionManager(read_pool_size=1)
+        conn = connections.connection()
+        assert connections.connection() is conn
+
+        other_thread = []
+        thread = threading.Thread(
+            target=lambda: other_thread.append(connections.connection())
+        )
+        thread.start()
+        thread.join()
+        assert other_thread[0] is not conn
+
+        with connections.writer() as writer:
+            writer.execute("CREATE TABLE t (value INTEGER)")
+            writer.execute("INSERT INTO t VALUES (1)")
+
+        with connections.reader() as reader:
+            assert reader.execute("SELECT value FROM t").fetchone()[0] == 1
+            with pytest.raises(sqlite3.OperationalError):
+                reader.execute("INSERT INTO t VALUES (2)")
+        with connections.reader() as second_reader:
+            assert second_reader is reader
+
+        connections.close_all()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+
+
+def test_connection_manager_close_while_reading(tmp_path):
+    """Test that a reader closed by close_all while borrowed is not pooled again."""
+    profile = settings.model_copy(
+        update={"database_filename": str(tmp_path / "manager.db")}
+    )
+    with patch("src.common.database.settings", profile):
+        connections = ConnectionManager(read_pool_size=1)
+        with connections.reader() as closed_reader:
+            connections.close_all()
+        with connections.reader() as reader:
+            assert reader is not closed_reader
+            assert reader.execute("SELECT 1").fetchone()[0] == 1
+        connections.close_all()
+
+
+def test_connection_manager_failed_open(tmp_path):
+    """Test that a reader which failed to open does not take a slot of the pool."""
+    profile = settings.model_copy(
+        update={"database_filename": str(tmp_path / "manager.db")}
+    )
+    with patch("src.common.database.settings", profile):
+        connections = ConnectionManager(read_pool_size=1)
+        with connections.writer() as writer:
+            writer.execute("CREATE TABLE t (value INTEGER)")
+        with patch.object(
+            connections, "_open", side_effect=sqlite3.OperationalError("locked")
+        ):
+            for _ in range(2):
+                with pytest.raises(sqlite3.OperationalError), connections.reader():
+                    pass
+        with connections.reader() as reader:
+            assert reader.execute("SELECT 1").fetchone()[0] == 1
+        connections.close_all()
+
+
 def test_get_db_connection_error():
     """Test that get_db_connection handles errors properly."""
     with patch("src.common.database.settings") as mock_settings:
@@ -125,6 +279,134 @@ def test_initialize_database(db_connection):
     assert "idx_app_data_rating" in indexes
 
 
+def test_initialize_database_promoted_columns(db_connection):
+    """Test that promoted columns are added to new and existing songs tables."""
+    db_connection.execute(
+        "CREATE TABLE songs (id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE NOT NULL, "
+        "fileprops TEXT NOT NULL, tags TEXT NOT NULL, app_data TEXT NOT NULL)"
+    )
+    db_connection.execute(
+        "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, ?, ?, ?)",
+        (
+            "/music/song.mp3",
+            '{"length": 215.5, "bitrate": 320}',
+            '{"TITLE": ["Song"], "TRACK_NUM": ["3/12"], "RELEASE_TIME": ["1999-05-01"]}',
+            "{}",
+        ),
+    )
+
+    initialize_database(db_connection)
+
+    assert get_promoted_columns(db_connection) == set(PROMOTED_COLUMNS)
+    row = db_connection.execute(
+        "SELECT title, track_number, year, length, bitrate FROM songs"
+    ).fetchone()
+    assert tuple(row) == ("Song", 3, 1999, 215.5, 320)
+
+    plan = db_connection.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM songs WHERE year > 1990"
+    ).fetchall()
+    assert any("idx_songs_year" in row["detail"] for row in plan)
+
+
+def test_full_text_index_follows_songs(db_connection):
+    """Test that songs_fts indexes existing songs and follows later changes."""
+    db_connection.execute(
+        "CREATE TABLE songs (id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE NOT NULL, "
+        "fileprops TEXT NOT NULL, tags TEXT NOT NULL, app_data TEXT NOT NULL)"
+    )
+    db_connection.execute(
+        "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, ?, ?, ?)",
+        ("/music/a.mp3", "{}", '{"ARTIST": ["Björk", "Thom Yorke"]}', "{}"),
+    )
+    initialize_database(db_connection)
+    assert has_full_text_index(db_connection)
+
+    def match(query):
+        rows = db_connection.execute(
+            "SELECT rowid FROM songs_fts WHERE songs_fts MATCH ? ORDER BY rowid",
+            (query,),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    assert match("bjork") == [1]
+    assert match("yor*") == [1]
+
+    db_connection.execute(
+        "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, ?, ?, ?)",
+        ("/music/b.mp3", "{}", '{"TITLE": ["Jóga"], "GENRE": ["Pop"]}', "{}"),
+    )
+    assert match("joga") == [2]
+
+    db_connection.execute(
+        'UPDATE songs SET tags = \'{"TITLE": ["Hyperballad"]}\' WHERE id = 2'
+    )
+    assert match("joga") == []
+    assert match("hyper*") == [2]
+
+    db_connection.execute("DELETE FROM songs WHERE id = 1")
+    assert match("bjork") == []
+
+
+def test_tag_index_follows_songs(db_connection):
+    """Test that song_tags holds every tag value of the songs, with numeric values."""
+    initialize_database(db_connection)
+    assert has_tag_index(db_connection)
+    db_connection.execute(
+        "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, ?, ?, ?)",
+        (
+            "/music/a.mp3",
+            "{}",
+            '{"mood": ["Happy", "Calm"], "TRACK_NUM": ["3/12"], "TRACK_NUMBER": [[4, 12]]}',
+            "{}",
+        ),
+    )
+
+    def tags():
+        rows = db_connection.execute(
+            "SELECT key, value, value_num FROM song_tags ORDER BY key, value"
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    assert tags() == [
+        ("MOOD", "Calm", None),
+        ("MOOD", "Happy", None),
+        ("TRACK_NUM", "3/12", 3.0),
+        ("TRACK_NUMBER", "[4,12]", 4),
+    ]
+
+    db_connection.execute('UPDATE songs SET tags = \'{"LABEL": ["Warp"]}\'')
+    assert tags() == [("LABEL", "Warp", None)]
+
+    plan = db_connection.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM songs WHERE id IN "
+        "(SELECT song_id FROM song_tags WHERE key = 'LABEL' AND value LIKE '%arp%')"
+    ).fetchall()
+    assert any("idx_song_tags_key_value" in row["detail"] for row in plan)
+
+    db_connection.execute("DELETE FROM songs")
+    assert tags() == []
+
+
+@pytest.mark.parametrize(
+    "expression, index",
+    [
+        (FINGERPRINT_EXPRESSION, "idx_fileprops_fingerprint"),
+        (SIGNATURE_EXPRESSION, "idx_songs_signature"),
+    ],
+)
+def test_duplicate_grouping_uses_index(db_connection, expression, index):
+    """Test that grouping songs by a duplicate key walks its expression index."""
+    initialize_database(db_connection)
+
+    plan = db_connection.execute(
+        f"EXPLAIN QUERY PLAN SELECT {expression}, group_concat(id) FROM songs "
+        f"WHERE {expression} IS NOT NULL GROUP BY {expression}"
+    ).fetchall()
+
+    assert any(index in row["detail"] for row in plan)
+
+
 def test_close_db_connection():
     """Test that close_db_connection properly closes a connection."""
     conn = sqlite3.connect(":memory:")
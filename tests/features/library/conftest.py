@@ -0,0 +1,53 @@
+# tests.features.library.conftest
+import re
+import sqlite3
+import wave
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.common.database import ConnectionManager, initialize_database
+from src.common.utils.settings import settings
+
+
+@pytest.fixture
+def db_connection():
+    """Create an initialized in-memory SQLite database connection."""
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.create_function(
+        "REGEXP", 2, lambda x, y: re.search(y, x, re.IGNORECASE) is not None
+    )
+    initialize_database(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def connections(tmp_path):
+    """Create a connection manager of an initialized database file."""
+    profile = settings.model_copy(
+        update={"database_filename": str(tmp_path / "library.db")}
+    )
+    with patch("src.common.database.settings", profile):
+        manager = ConnectionManager()
+        initialize_database(manager.connection())
+        yield manager
+        manager.close_all()
+
+
+@pytest.fixture
+def write_song():
+    """Return a function writing a small WAV file, its content depends on `seed`."""
+
+    def write(path: Path, seed: int = 0, frames: int = 1000) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with wave.open(str(path), "wb") as audio_file:
+            audio_file.setnchannels(1)
+            audio_file.setsampwidth(2)
+            audio_file.setframerate(8000)
+            audio_file.writeframes(bytes([seed % 256]) * frames * 2)
+        return path
+
+    return write
@@ -0,0 +1,35 @@
+# tests.features.library.test_extraction
+import pytest
+
+from src.features.library.services.extraction import MetadataExtractor
+
+
+def extract(paths, kind, batch_size):
+    with MetadataExtractor(kind, max_workers=2, batch_size=batch_size) as extractor:
+        batches = list(extractor.extract(iter(paths), added_date=100.0))
+    assert all(len(batch) <= batch_size for batch in batches)
+    return sorted(
+        (str(path), song.model_dump() if song else None, repr(error))
+        for batch in batches
+        for path, song, error in batch
+    )
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_extractor_kinds_read_the_same_songs(tmp_path, write_song, batch_size):
+    """Test that thread workers read the same songs and errors as a serial read."""
+    paths = [write_song(tmp_path / f"{i}.wav", seed=i) for i in range(7)]
+    broken = tmp_path / "broken.wav"
+    broken.write_bytes(b"not a wav file")
+    paths.append(broken)
+
+    serial = extract(paths, "serial", batch_size)
+    assert extract(paths, "thread", batch_size) == serial
+
+    assert len(serial) == 8
+    songs = [song for _, song, _ in serial if song is not None]
+    assert len(songs) == 7
+    assert all(song["app_data"]["added_date"] == 100.0 for song in songs)
+    assert len({song["fileprops"]["fingerprint"] for song in songs}) == 7
+    _, song, error = next(result for result in serial if result[0] == str(broken))
+    assert song is None and error != "None"
@@ -0,0 +1,27 @@
+# tests.features.library.test_library_roots
+import pytest
+
+from src.features.library.repository import LibraryRootsRepository
+
+
+def test_add_root(db_connection, tmp_path):
+    """Test that nested roots are merged and roots cannot be added twice."""
+    repository = LibraryRootsRepository(db_connection)
+    repository.add_root(tmp_path / "music/rock", 1.0)
+    repository.add_root(tmp_path / "podcasts", 2.0)
+    repository.add_root(tmp_path / "music", 3.0)
+    assert repository.get_roots() == [tmp_path / "music", tmp_path / "podcasts"]
+
+    with pytest.raises(ValueError, match="already part of the library"):
+        repository.add_root(tmp_path / "music/jazz", 4.0)
+
+
+def test_replace_roots(db_connection, tmp_path):
+    """Test that a replaced library keeps a single root, even one inside the old ones."""
+    repository = LibraryRootsRepository(db_connection)
+    repository.add_root(tmp_path / "music", 1.0)
+    repository.add_root(tmp_path / "podcasts", 2.0)
+
+    root = repository.replace_roots(tmp_path / "music/rock", 3.0)
+    assert root.id is not None
+    assert repository.get_roots() == [tmp_path / "music/rock"]
@@ -0,0 +1,120 @@
+# tests.features.library.test_library_services
+import os
+from unittest.mock import patch
+
+from src.common.utils.settings import settings
+from src.features.library.repository import ScanCheckpointsRepository, SongsRepository
+from src.features.library.services.library import LibraryServices
+
+
+def scan(db_connection, library_path, **kwargs):
+    services = LibraryServices(
+        library_path,
+        SongsRepository(db_connection),
+        executor_kind="serial",
+        **kwargs,
+    )
+    errors = services.populate_database()
+    assert errors == []
+    return services.get_summary()
+
+
+def test_rescan_counts(db_connection, tmp_path, write_song):
+    """Test that a rescan skips unchanged files and re-parses changed ones."""
+    paths = [write_song(tmp_path / f"a/{i}.wav", seed=i) for i in range(3)]
+
+    summary = scan(db_connection, tmp_path)
+    assert (summary.added, summary.unchanged, summary.updated) == (3, 0, 0)
+
+    summary = scan(db_connection, tmp_path)
+    assert (summary.added, summary.unchanged, summary.updated) == (0, 3, 0)
+
+    write_song(paths[0], seed=9, frames=2000)
+    os.utime(paths[0], (1_000_000, 1_000_000))
+    paths[1].unlink()
+    summary = scan(db_connection, tmp_path)
+    assert (summary.added, summary.unchanged, summary.updated) == (0, 1, 1)
+    assert summary.removed == 1
+    assert summary.pruned == [str(paths[1])]
+
+    index = SongsRepository(db_connection).get_file_index(tmp_path)
+    assert sorted(index) == [str(paths[0]), str(paths[2])]
+    assert index[str(paths[0])].mtime == 1_000_000
+
+
+def test_moved_song_keeps_its_data(db_connection, tmp_path, write_song):
+    """Test that a file moved to another directory keeps its song."""
+    write_song(tmp_path / "a/1.wav", seed=1)
+    write_song(tmp_path / "a/2.wav", seed=2)
+    scan(db_connection, tmp_path)
+    repository = SongsRepository(db_connection)
+    song_id = repository.get_file_index(tmp_path)[str(tmp_path / "a/1.wav")].id
+    repository.set_rating(song_id, 4.0)
+
+    (tmp_path / "b").mkdir()
+    os.rename(tmp_path / "a/1.wav", tmp_path / "b/1.wav")
+    # Same size, another content: a new song
+    write_song(tmp_path / "b/3.wav", seed=3)
+
+    summary = scan(db_connection, tmp_path)
+    assert (summary.moved, summary.added, summary.removed) == (1, 1, 0)
+    index = repository.get_file_index(tmp_path)
+    assert index[str(tmp_path / "b/1.wav")].id == song_id
+    assert str(tmp_path / "a/1.wav") not in index
+    assert repository.find_by_id(song_id).app_data.rating == 4.0
+
+
+def test_moved_song_outside_scope(db_connection, tmp_path, write_song):
+    """Test that songs outside of the move scope are not matched with new files."""
+    write_song(tmp_path / "a/1.wav", seed=1)
+    scan(db_connection, tmp_path / "a")
+    os.rename(tmp_path / "a/1.wav", tmp_path / "1.wav")
+
+    summary = scan(db_connection, tmp_path, move_scope=tmp_path / "b")
+    assert (summary.moved, summary.added) == (0, 1)
+
+
+def test_cancelled_scan_resumes(db_connection, tmp_path, write_song):
+    """Test that a cancelled scan commits its checkpoint and the next one resumes."""
+    for i in range(4):
+        write_song(tmp_path / f"{'ab'[i // 2]}/{i}.wav", seed=i)
+
+    def cancel_after_three(report):
+        if report["files_processed"] >= 3:
+            services.cancel()
+
+    profile = settings.model_copy(update={"scan_progress_interval": 0})
+    with patch("src.features.library.services.library.settings", profile):
+        services = LibraryServices(
+            tmp_path,
+            SongsRepository(db_connection),
+            flush_size=1,
+            executor_kind="serial",
+            batch_size=1,
+            progress_callback=cancel_after_three,
+            checkpoints=ScanCheckpointsRepository(db_connection),
+        )
+        services.populate_database()
+    assert services.is_cancelled()
+    assert services.get_summary().added == 3
+    assert services.get_summary().removed == 0
+
+    # The root (without files) and the first directory are complete, not the other
+    rows = db_connection.execute(
+        "SELECT directory FROM scan_checkpoint_directories"
+    ).fetchall()
+    directories = {row[0] for row in rows}
+    assert str(tmp_path) in directories
+    directories.discard(str(tmp_path))
+    assert len(directories) == 1
+    assert len(os.listdir(directories.pop())) == 2
+
+    summary = scan(
+        db_connection, tmp_path, checkpoints=ScanCheckpointsRepository(db_connection)
+    )
+    assert (summary.added, summary.unchanged) == (1, 3)
+    assert len(SongsRepository(db_connection).get_file_index(tmp_path)) == 4
+    assert (
+        db_connection.execute("SELECT count(*) FROM scan_checkpoints").fetchone()[0]
+        == 0
+    )
@@ -0,0 +1,40 @@
+# tests.features.library.test_play_events
+from src.features.library.repository import PlayEventBuffer, PlayEventsRepository
+
+
+def test_play_events_rollup(db_connection):
+    """Test that buffered play events are counted once into the app_data of songs."""
+    db_connection.executemany(
+        "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, '{}', '{}', ?)",
+        [
+            ("/music/a.mp3", '{"play_count": 2, "last_played": 50.0}'),
+            ("/music/b.mp3", "{}"),
+        ],
+    )
+    repository = PlayEventsRepository(db_connection)
+    buffer = PlayEventBuffer()
+    buffer.record(1, "play", 100.0)
+    buffer.record(1, "play", 200.0)
+    buffer.record(1, "skip", 300.0)
+    buffer.record(2, "skip", 400.0)
+    assert buffer.flush(repository) == 4
+    assert len(buffer) == 0
+
+    def app_data(song_id):
+        return db_connection.execute(
+            "SELECT json_extract(app_data, '$.play_count'), "
+            "json_extract(app_data, '$.skip_count'), "
+            "json_extract(app_data, '$.last_played') FROM songs WHERE id = ?",
+            (song_id,),
+        ).fetchone()
+
+    assert repository.rollup() == 2
+    assert tuple(app_data(1)) == (4, 1, 200.0)
+    assert tuple(app_data(2)) == (0, 1, None)
+    assert repository.rollup() == 0
+
+    buffer.record(2, "play", 500.0)
+    buffer.flush(repository)
+    assert repository.rollup() == 1
+    assert tuple(app_data(1)) == (4, 1, 200.0)
+    assert tuple(app_data(2)) == (1, 1, 500.0)
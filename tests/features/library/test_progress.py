@@ -0,0 +1,50 @@
+# tests.features.library.test_progress
+from src.features.library.services.progress import ScanProgressTracker
+
+
+def test_progress_reports_are_throttled():
+    """Test that reports are sent at most once per interval, unless forced."""
+    now = [0.0]
+    reports = []
+    tracker = ScanProgressTracker(reports.append, 1.0, get_time=lambda: now[0])
+
+    tracker.file_discovered("/music/a")
+    tracker.file_skipped()
+    now[0] = 0.5
+    tracker.file_discovered("/music/a")
+    tracker.file_skipped()
+    assert [report["files_processed"] for report in reports] == [1]
+
+    now[0] = 1.0
+    tracker.file_parsed(1000)
+    tracker.report()
+    tracker.report()
+    assert [report["files_processed"] for report in reports] == [1, 3]
+
+    tracker.report(force=True)
+    assert len(reports) == 3
+    assert reports[-1]["current_directory"] == "/music/a"
+
+
+def test_progress_eta():
+    """Test the ETA, based on the larger of discovered files and expected songs."""
+    now = [0.0]
+    tracker = ScanProgressTracker(
+        lambda report: None, expected_total=10, get_time=lambda: now[0]
+    )
+    for _ in range(4):
+        tracker.file_discovered()
+    assert tracker.snapshot()["eta_seconds"] is None
+
+    now[0] = 2.0
+    tracker.file_skipped()
+    tracker.file_parsed(3000)
+    snapshot = tracker.snapshot()
+    assert snapshot["files_per_second"] == 1.0
+    assert snapshot["bytes_per_second"] == 1500
+    assert snapshot["eta_seconds"] == 8
+
+    # More files than expected, the walk found new ones
+    for _ in range(16):
+        tracker.file_discovered()
+    assert tracker.snapshot()["eta_seconds"] == 18
@@ -0,0 +1,127 @@
+# tests.features.library.test_query
+import pytest
+
+from src.common.database import initialize_database, play_day, play_week
+from src.features.library.repository import (
+    PlayEventBuffer,
+    PlayEventsRepository,
+    SongsRepository,
+)
+from src.features.library.services.query import QueryLexer, QueryParser, SQLGenerator
+
+FILEPROPS = (
+    '{"size": 1, "bitrate": 320, "sample_rate": 44100, "channels": 2, '
+    '"length": 60.0, "mtime": 0.0}'
+)
+
+
+def insert_songs(connection, tags):
+    connection.executemany(
+        "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, ?, ?, ?)",
+        [
+            (f"/music/{i}.mp3", FILEPROPS, song_tags, '{"added_date": 0.0}')
+            for i, song_tags in enumerate(tags, start=1)
+        ],
+    )
+
+
+@pytest.mark.parametrize("tag_index", [True, False])
+def test_search_matches_every_tag_value(db_connection, tag_index):
+    """Test that text matches on promoted fields look past the first tag value."""
+    insert_songs(
+        db_connection,
+        [
+            '{"ARTIST": ["Björk", "Thom Yorke"], "YEAR": ["1997"]}',
+            '{"ARTIST": ["Radiohead"], "YEAR": ["2000"]}',
+        ],
+    )
+    repository = SongsRepository(db_connection)
+    repository.tag_index = tag_index
+
+    def search(query):
+        return sorted(song.id for song in repository.search_songs(query))
+
+    assert search("artist:Yorke") == [1]
+    assert search("artist:Björk") == [1]
+    assert search("artist:!=Yorke") == [2]
+    assert search("year:<1999") == [1]
+
+
+def test_play_history(db_connection):
+    """Test that play history rollups answer time-windowed query fields."""
+    db_connection.executemany(
+        "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, ?, ?, ?)",
+        [
+            (
+                f"/music/{i}.mp3",
+                FILEPROPS,
+                f'{{"ARTIST": ["{artist}"]}}',
+                '{"added_date": 0.0}',
+            )
+            for i, artist in enumerate(["A", "A", "B"], start=1)
+        ],
+    )
+    day = 86400
+    now = 1_000 * day + 3600
+    buffer = PlayEventBuffer()
+    for song_id, days_ago in [(1, 0), (1, 2), (1, 20), (2, 100), (3, 10), (3, 12)]:
+        buffer.record(song_id, "play", now - days_ago * day)
+    buffer.record(2, "skip", now)
+    events = PlayEventsRepository(db_connection)
+    buffer.flush(events)
+    events.rollup()
+
+    repository = SongsRepository(db_connection)
+    repository.get_time = lambda: now
+
+    def search(query):
+        return sorted(song.id for song in repository.search_songs(query))
+
+    assert search("plays_week:>=2") == [1]
+    assert search("plays_month:2") == [3]
+    assert search("plays_month:<2") == [2]
+    assert search("plays_year:>0") == [1, 2, 3]
+    assert search("skips_week:1") == [2]
+    assert search("artist_plays_month:3") == [1, 2]
+
+    repository.get_time = lambda: now + 25 * day
+    assert search("plays_month:>0") == [1]
+
+    # Rollups are rebuilt from the events when created on an existing database
+    db_connection.execute("DROP TABLE song_plays_weekly")
+    initialize_database(db_connection)
+    assert search("plays_year:>=3") == [1]
+
+
+def generate(query, **kwargs):
+    generator = SQLGenerator(**kwargs)
+    return generator.generate(QueryParser(QueryLexer(query)).parse())
+
+
+def test_generate_history_fields():
+    """Test that history fields compare the sum of the rows within their window."""
+    now = 1_000 * 86400 + 3600
+    day, week = play_day(now), play_week(now)
+
+    sql, params = generate("plays_month:>2", get_time=lambda: now)
+    assert sql == (
+        "id IN (SELECT song_id FROM song_plays_daily "
+        "WHERE day > ? GROUP BY +song_id HAVING sum(plays) > ?)"
+    )
+    assert params == [day - 30, 2]
+
+    # 0 matches, songs without rows in the window are kept
+    sql, params = generate("skips_year:<2", get_time=lambda: now)
+    assert sql == (
+        "id NOT IN (SELECT song_id FROM song_plays_weekly "
+        "WHERE week > ? GROUP BY +song_id HAVING NOT (sum(skips) < ?))"
+    )
+    assert params == [week - 52, 2]
+
+    sql, _ = generate("artist_plays_week:1", promoted_columns=["artist"])
+    assert sql.startswith("coalesce(artist, '') IN (SELECT artist FROM ")
+    assert "HAVING sum(plays) = ?" in sql
+    sql, _ = generate("artist_plays_week:1")
+    assert sql.startswith("coalesce(json_extract(tags, '$.ARTIST[0]'), '') IN")
+
+    assert generate("plays_week:often") == ("1=0", [])
@@ -0,0 +1,55 @@
+# tests.features.library.test_scheduler
+from src.features.library.repository import SongsRepository
+from src.features.library.services.scheduler import ScanScheduler
+
+
+def known_paths(connections):
+    with connections.reader() as reader:
+        return sorted(SongsRepository(reader).get_file_index())
+
+
+def test_scheduler_scans_every_root(connections, tmp_path, write_song):
+    """Test that roots are scanned together and songs outside of them are kept."""
+    roots = [tmp_path / "music", tmp_path / "podcasts"]
+    paths = [
+        write_song(roots[0] / "a/1.wav", seed=1),
+        write_song(roots[0] / "b/2.wav", seed=2),
+        write_song(roots[1] / "3.wav", seed=3),
+    ]
+    with connections.writer() as writer:
+        writer.execute(
+            "INSERT INTO songs (path, fileprops, tags, app_data) "
+            "VALUES ('/removed/4.wav', '{}', '{}', '{}')"
+        )
+    reports = []
+    scheduler = ScanScheduler(
+        connections, max_roots=2, progress_callback=reports.append
+    )
+
+    errors, summary = scheduler.scan(roots + [tmp_path / "missing"])
+    assert [path for path, _ in errors] == [tmp_path / "missing"]
+    assert (summary.added, summary.removed) == (3, 0)
+    assert known_paths(connections) == sorted(
+        ["/removed/4.wav"] + [str(path) for path in paths]
+    )
+    assert reports[-1]["files_processed"] == 3
+
+    # Songs of a root removed from the library
+    errors, summary = scheduler.scan(roots[:1])
+    assert errors == []
+    assert (summary.unchanged, summary.removed) == (2, 0)
+    assert len(known_paths(connections)) == 4
+
+
+def test_scheduler_prune_outside(connections, tmp_path, write_song):
+    """Test that songs outside of the roots are deleted when asked."""
+    write_song(tmp_path / "music/1.wav")
+    write_song(tmp_path / "other/2.wav")
+    scheduler = ScanScheduler(connections)
+    scheduler.scan([tmp_path / "music", tmp_path / "other"])
+
+    assert scheduler.prune_outside([tmp_path / "music", tmp_path / "other"]) == []
+    assert scheduler.prune_outside([tmp_path / "music"]) == [
+        str(tmp_path / "other/2.wav")
+    ]
+    assert known_paths(connections) == [str(tmp_path / "music/1.wav")]
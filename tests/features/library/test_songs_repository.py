@@ -0,0 +1,99 @@
+# tests.features.library.test_songs_repository
+import json
+import sqlite3
+
+from src.features.library.repository import SongsRepository
+
+
+def test_delete_songs_beyond_variable_limit(db_connection):
+    """Test that more songs than SQLite accepts variables are deleted at once."""
+    db_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 100)
+    db_connection.executemany(
+        "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, '{}', '{}', '{}')",
+        [(f"/music/{i:03d}.mp3",) for i in range(250)],
+    )
+    db_connection.execute(
+        "INSERT INTO playlists (name, is_dynamic) VALUES ('Favorites', 0)"
+    )
+    db_connection.executemany(
+        "INSERT INTO playlist_songs (playlist_id, song_id, position) VALUES (1, ?, ?)",
+        [(song_id, song_id) for song_id in (1, 200, 250)],
+    )
+
+    deleted = SongsRepository(db_connection).delete_songs(range(1, 241))
+
+    assert sorted(deleted) == [f"/music/{i:03d}.mp3" for i in range(240)]
+    assert db_connection.execute("SELECT count(*) FROM songs").fetchone()[0] == 10
+    rows = db_connection.execute("SELECT song_id FROM playlist_songs").fetchall()
+    assert [row[0] for row in rows] == [250]
+
+
+def insert_song_files(connection, songs):
+    """Insert (size, fingerprint, artist, title, length) songs, IDs start at 1."""
+    connection.executemany(
+        "INSERT INTO songs (path, fileprops, tags, app_data) VALUES (?, ?, ?, '{}')",
+        [
+            (
+                f"/music/{i}.mp3",
+                json.dumps(
+                    {"size": size, "length": length}
+                    | ({"fingerprint": fingerprint} if fingerprint else {})
+                ),
+                json.dumps({"ARTIST": [artist], "TITLE": [title]}),
+            )
+            for i, (size, fingerprint, artist, title, length) in enumerate(songs)
+        ],
+    )
+
+
+def test_find_duplicate_clusters(db_connection):
+    """Test that songs are grouped by content or signature, largest group first."""
+    insert_song_files(
+        db_connection,
+        [
+            (100, "f1", "Björk", "Jóga", 305.2),
+            (100, "f1", "björk", "jóga", 305.4),
+            (100, "f2", "Björk", "Jóga", 304.9),
+            (200, "f3", "Portishead", "Roads", 305.0),
+            (200, "f3", "Portishead", "Roads", 305.0),
+            (200, "f3", "Portishead", "Roads", 305.0),
+            (100, None, "Massive Attack", "Teardrop", 330.0),
+            (100, None, "Massive Attack", "Teardrop", 331.0),
+        ],
+    )
+    repository = SongsRepository(db_connection)
+
+    # Same size, another fingerprint: not a duplicate
+    clusters = repository.find_duplicate_clusters()
+    assert [(cluster.key, cluster.song_ids) for cluster in clusters] == [
+        ("f3", [4, 5, 6]),
+        ("f1", [1, 2]),
+    ]
+    assert [c.key for c in repository.find_duplicate_clusters(min_size=3)] == ["f3"]
+    assert [c.key for c in repository.find_duplicate_clusters(limit=1)] == ["f3"]
+
+    # Case-insensitive (ASCII only, as SQLite lower), lengths rounded to the second
+    clusters = repository.find_duplicate_clusters(by="signature")
+    assert [(cluster.key, sorted(cluster.song_ids)) for cluster in clusters] == [
+        ("björk|jóga|305", [1, 2, 3]),
+        ("portishead|roads|305", [4, 5, 6]),
+    ]
+
+
+def test_find_songs_by_size(db_connection):
+    """Test that songs are looked up by size, with their fingerprint if known."""
+    insert_song_files(
+        db_connection,
+        [
+            (100, "f1", "A", "A", 1.0),
+            (200, "f2", "B", "B", 1.0),
+            (100, None, "C", "C", 1.0),
+        ],
+    )
+    repository = SongsRepository(db_connection)
+
+    assert sorted(repository.find_songs_by_size(100)) == [
+        (1, "/music/0.mp3", "f1"),
+        (3, "/music/2.mp3", None),
+    ]
+    assert repository.find_songs_by_size(300) == []
@@ -0,0 +1,69 @@
+# tests.features.library.test_walker
+import os
+
+from src.features.library.utils.walker import LibraryWalker
+
+
+def walked(walker):
+    return sorted(os.path.relpath(entry.path, walker.root) for entry in walker)
+
+
+def test_walker_filters_extensions_and_exclusions(tmp_path):
+    """Test that only audio files outside of excluded paths are yielded."""
+    for name in [
+        "a/1.wav",
+        "a/2.MP3",
+        "a/cover.jpg",
+        "a/notes.txt",
+        ".hidden/3.wav",
+        "Podcasts/4.mp3",
+        "b/Podcasts/5.mp3",
+    ]:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).touch()
+
+    walker = LibraryWalker(tmp_path, exclude=[".*", "Podcasts/*"])
+
+    assert walked(walker) == ["a/1.wav", "a/2.MP3", "b/Podcasts/5.mp3"]
+    assert walker.errors == []
+
+
+def test_walker_exclusion_root(tmp_path):
+    """Test that exclusions stay relative to the exclusion root in subdirectories."""
+    (tmp_path / "Podcasts").mkdir()
+    (tmp_path / "Podcasts/1.mp3").touch()
+
+    subdirectory = tmp_path / "Podcasts"
+    assert walked(LibraryWalker(subdirectory, exclude=["Podcasts/*"])) == ["1.mp3"]
+    walker = LibraryWalker(
+        subdirectory, exclude=["Podcasts/*"], exclusion_root=tmp_path
+    )
+    assert walked(walker) == []
+
+
+def test_walker_skips_symlink_loops_and_duplicates(tmp_path):
+    """Test that symlinked directories and files already visited are skipped."""
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a/1.wav").touch()
+    (tmp_path / "a/loop").symlink_to(tmp_path, target_is_directory=True)
+    (tmp_path / "a/link.wav").symlink_to(tmp_path / "a/1.wav")
+    (tmp_path / "b").symlink_to(tmp_path / "a", target_is_directory=True)
+    (tmp_path / "broken.wav").symlink_to(tmp_path / "missing.wav")
+
+    walker = LibraryWalker(tmp_path)
+
+    # Whichever of the file and its link is listed first is yielded
+    entries = list(walker)
+    assert len(entries) == 1
+    assert os.path.realpath(entries[0].path) == str((tmp_path / "a/1.wav").resolve())
+    assert walker.directory_count == 2
+    assert walked(LibraryWalker(tmp_path, follow_symlinks=False)) == ["a/1.wav"]
+
+
+def test_walker_not_recursive(tmp_path):
+    """Test that a non-recursive walk yields the direct children only."""
+    (tmp_path / "a").mkdir()
+    (tmp_path / "1.wav").touch()
+    (tmp_path / "a/2.wav").touch()
+
+    assert walked(LibraryWalker(tmp_path, recursive=False)) == ["1.wav"]